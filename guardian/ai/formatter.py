@@ -1,9 +1,21 @@
 from __future__ import annotations
 
+import json
+import os
+import re
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from .redaction import sanitize_text
+
+# Streamed text is written this many characters behind the model so a secret split across
+# tokens (or a private key block) is complete before sanitize_text sees it.
+_STREAM_HOLDBACK = 400
+_PRIVATE_KEY_MARKER = re.compile(r"BEGIN\s+PRIVATE")
+# " KEY" plus the 300 characters sanitize_text drops after the marker.
+_PRIVATE_KEY_WINDOW = 320
+
 
 def _extract_list_items(text: str, limit: int = 8) -> list[str]:
     items: list[str] = []
@@ -146,19 +158,28 @@ def _agent_ready_checklist(profile_name: str) -> list[str]:
     ])
 
 
+def _profile_name(project_profile: dict[str, Any]) -> str:
+    return str((project_profile or {}).get("name") or "generic")
+
+
+def _markdown_header(model: str, provider: str, profile_name: str) -> list[str]:
+    return [
+        "# AI Analysis Report",
+        "",
+        f"- Provider: `{provider}`",
+        f"- Model: `{model}`",
+        f"- Profile: `{profile_name}`",
+        "",
+        "> Nota: Los hallazgos MEDIUM pueden ser contextuales; use `--fail-on HIGH` en CI para reducir ruido.",
+        "",
+    ]
+
+
 def render_ai_markdown(model: str, provider: str, analysis_text: str, project_profile: dict[str, Any]) -> str:
-    profile_name = str((project_profile or {}).get("name") or "generic")
+    profile_name = _profile_name(project_profile)
     checklist = _agent_ready_checklist(profile_name)
 
-    lines: list[str] = []
-    lines.append("# AI Analysis Report")
-    lines.append("")
-    lines.append(f"- Provider: `{provider}`")
-    lines.append(f"- Model: `{model}`")
-    lines.append(f"- Profile: `{profile_name}`")
-    lines.append("")
-    lines.append("> Nota: Los hallazgos MEDIUM pueden ser contextuales; use `--fail-on HIGH` en CI para reducir ruido.")
-    lines.append("")
+    lines = _markdown_header(model, provider, profile_name)
     lines.append(analysis_text.strip())
     lines.append("")
     lines.append("## Checklist para repos generados por IA / agentes")
@@ -174,6 +195,7 @@ def build_ai_json_payload(
     model: str,
     analysis_text: str,
     grouped_findings: list[dict[str, Any]],
+    performance: dict[str, Any] | None = None,
 ) -> dict:
     quick_wins = _section_items(analysis_text, ["quick wins"], limit=5)
     manual_checks = _section_items(analysis_text, ["revisar manualmente", "que revisar manualmente"], limit=5)
@@ -194,7 +216,7 @@ def build_ai_json_payload(
             "Usar --fail-on HIGH como gate.",
         ]
 
-    return {
+    payload = {
         "provider": provider,
         "model": model,
         "timestamp": datetime.now(timezone.utc).isoformat(),
@@ -207,11 +229,65 @@ def build_ai_json_payload(
         "manual_checks": manual_checks[:5],
         "ci_hardening": ci_hardening[:5],
     }
+    if performance:
+        payload["performance"] = performance
+    return payload
+
+
+class StreamingMarkdownWriter:
+    def __init__(self, out_path: Path, model: str, provider: str, project_profile: dict[str, Any]) -> None:
+        self.out_path = out_path
+        self._header = "\n".join(_markdown_header(model, provider, _profile_name(project_profile))) + "\n"
+        self._pending = ""
+        self._handle = None
+
+    def _open(self):
+        # Opened on the first token so a failed connection leaves any previous ai.md untouched.
+        if self._handle is None:
+            self.out_path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = self.out_path.open("w", encoding="utf-8")
+            self._handle.write(self._header)
+        return self._handle
+
+    def feed(self, piece: str) -> None:
+        handle = self._open()
+        self._pending += piece
+        if len(self._pending) < 2 * _STREAM_HOLDBACK:
+            return
+
+        # Only whole lines are flushed; the sanitizer patterns never span a line except the
+        # private key block, which stays pending until its redaction window fits before the cut.
+        cut = self._pending.rfind("\n", 0, len(self._pending) - _STREAM_HOLDBACK) + 1
+        for marker in _PRIVATE_KEY_MARKER.finditer(self._pending, 0, cut):
+            if marker.end() + _PRIVATE_KEY_WINDOW > cut:
+                cut = self._pending.rfind("\n", 0, marker.start()) + 1
+                break
+        if cut <= 0:
+            return
+
+        handle.write(sanitize_text(self._pending[:cut]))
+        handle.flush()
+        self._pending = self._pending[cut:]
+
+    def close(self) -> None:
+        # The final report replaces this file through write_ai_outputs.
+        if self._handle is not None:
+            self._handle.close()
+
+    def abort(self, reason: str) -> None:
+        if self._handle is None or self._handle.closed:
+            return
+        self._handle.write(sanitize_text(self._pending))
+        self._handle.write(f"\n\n> Generacion interrumpida: {reason}\n")
+        self._handle.close()
 
 
 def write_ai_outputs(out_path: Path, markdown: str, json_payload: dict) -> None:
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    out_path.write_text(markdown, encoding="utf-8")
+    # Swapped in atomically so a streamed partial ai.md is never seen truncated.
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    tmp_path.write_text(markdown, encoding="utf-8")
+    os.replace(tmp_path, out_path)
 
     json_path = out_path.with_suffix(".json")
-    json_path.write_text(__import__("json").dumps(json_payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    json_path.write_text(json.dumps(json_payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import http.client
+import statistics
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import urlsplit
+
+# Failures after which the same request can be sent again on a fresh connection.
+RETRYABLE_ERRORS = (
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    http.client.RemoteDisconnected,
+    http.client.IncompleteRead,
+)
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        base_url: str,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_idle: int = 4,
+    ) -> None:
+        if connect_timeout <= 0 or read_timeout <= 0:
+            raise ValueError("--connect-timeout y --read-timeout deben ser mayores a 0")
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"URL de provider invalida: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle = max_idle
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        factory = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        connection = factory(self.host, self.port, timeout=self.connect_timeout)
+        connection.connect()
+        # The connect timeout only covers the handshake; reads wait for the model.
+        if connection.sock is not None:
+            connection.sock.settimeout(self.read_timeout)
+        return connection
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[tuple[http.client.HTTPConnection, bool]]:
+        # Yields (connection, reused). The caller must read the response to the end before
+        # leaving the block, or mark it unusable with connection.close().
+        connection, reused = self._acquire()
+        try:
+            yield connection, reused
+        except BaseException:
+            connection.close()
+            raise
+        if connection.sock is None:
+            return
+        self._release(connection)
+
+    def path(self, endpoint: str) -> str:
+        return f"{self.base_path}{endpoint}"
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class RequestMetrics:
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.retries = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, attempts: int, reused: bool) -> None:
+        with self._lock:
+            self.latencies.append(latency_s)
+            self.retries += attempts - 1
+            self.reused += int(reused)
+
+    def summary(self) -> dict[str, float | int]:
+        with self._lock:
+            latencies = sorted(self.latencies)
+            retries, reused = self.retries, self.reused
+        if not latencies:
+            return {"requests": 0, "retries": retries}
+        p95_index = max(0, int(round(0.95 * len(latencies))) - 1)
+        return {
+            "requests": len(latencies),
+            "retries": retries,
+            "reused_connections": reused,
+            "latency_p50_s": round(statistics.median(latencies), 3),
+            "latency_p95_s": round(latencies[p95_index], 3),
+            "latency_max_s": round(latencies[-1], 3),
+        }
@@ -1,53 +1,221 @@
 from __future__ import annotations
 
+import http.client
 import json
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+import os
+import re
+import time
+from typing import Any, Callable
 
+from .http_pool import RETRYABLE_ERRORS, ConnectionPool, RequestMetrics
 from .provider import AIProviderError, AIProviderRequest, AIProviderResponse
 
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+_DURATION = re.compile(r"-?(\d+(\.\d+)?(ns|us|µs|ms|s|m|h))+")
+
+
+def keep_alive_value(value: str) -> str | int:
+    # Ollama takes seconds as a JSON number (negative keeps the model loaded) or a duration
+    # string such as "30m"; a number sent as a string is rejected.
+    text = value.strip()
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    if _DURATION.fullmatch(text):
+        return text
+    raise ValueError(f"--keep-alive invalido: {value!r} (usa segundos como 300 o -1, o una duracion como 30m)")
+
+
+def default_base_url() -> str:
+    # Same variable the Ollama CLI honours; a bare host:port gets a scheme.
+    host = os.environ.get("OLLAMA_HOST", "").strip()
+    if not host:
+        return DEFAULT_OLLAMA_URL
+    return host if "://" in host else f"http://{host}"
+
+
+def _generation_stats(payload: dict[str, Any]) -> dict[str, Any]:
+    stats: dict[str, Any] = {}
+    eval_count = payload.get("eval_count")
+    eval_duration = payload.get("eval_duration")
+    if isinstance(eval_count, int):
+        stats["eval_count"] = eval_count
+    if isinstance(payload.get("prompt_eval_count"), int):
+        stats["prompt_eval_count"] = payload["prompt_eval_count"]
+    if isinstance(eval_count, int) and isinstance(eval_duration, (int, float)) and eval_duration > 0:
+        # Ollama reports durations in nanoseconds.
+        stats["tokens_per_second"] = round(eval_count / (eval_duration / 1e9), 2)
+    if isinstance(payload.get("total_duration"), (int, float)):
+        stats["server_total_s"] = round(payload["total_duration"] / 1e9, 3)
+    return stats
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status: int) -> None:
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
 
 class OllamaProvider:
-    def __init__(self, base_url: str = "http://localhost:11434") -> None:
-        self.base_url = base_url.rstrip("/")
+    def __init__(
+        self,
+        base_url: str | None = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        retries: int = 2,
+        backoff_s: float = 0.5,
+    ) -> None:
+        if retries < 0:
+            raise ValueError("--retries no puede ser negativo")
+        self.base_url = (base_url or default_base_url()).rstrip("/")
+        # With streaming the read timeout bounds the wait for each chunk, not the whole generation.
+        self.pool = ConnectionPool(self.base_url, connect_timeout=connect_timeout, read_timeout=read_timeout)
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.metrics = RequestMetrics()
+
+    def close(self) -> None:
+        self.pool.close()
 
     def generate(self, request: AIProviderRequest) -> AIProviderResponse:
-        payload = {
+        payload: dict[str, Any] = {
             "model": request.model,
             "prompt": request.prompt,
-            "stream": False,
+            "stream": request.stream,
         }
+        if request.system:
+            payload["system"] = request.system
+        if request.keep_alive is not None:
+            payload["keep_alive"] = keep_alive_value(request.keep_alive)
+        if request.options:
+            payload["options"] = request.options
         raw = json.dumps(payload).encode("utf-8")
-        http_request = Request(
-            url=f"{self.base_url}/api/generate",
-            data=raw,
-            headers={"Content-Type": "application/json"},
-            method="POST",
-        )
+        headers = {"Content-Type": "application/json"}
 
-        try:
-            with urlopen(http_request, timeout=60) as response:
-                body = response.read().decode("utf-8")
-        except HTTPError as exc:
-            raise AIProviderError(
-                f"Ollama respondio con error HTTP {exc.code}. Verifica modelo '{request.model}' y que Ollama este activo."
-            ) from exc
-        except URLError as exc:
-            raise AIProviderError(
-                "No se pudo conectar a Ollama en http://localhost:11434. "
-                "Instala Ollama (https://ollama.com/download), inicia el servicio y descarga el modelo con: "
-                f"ollama pull {request.model}"
-            ) from exc
-        except TimeoutError as exc:
-            raise AIProviderError("Timeout al consultar Ollama. Verifica que el modelo este cargado localmente.") from exc
+        started = time.perf_counter()
+        emitted = False
+
+        def on_token(piece: str) -> None:
+            nonlocal emitted
+            emitted = True
+            if request.on_token is not None:
+                request.on_token(piece)
 
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.perf_counter()
+            reused = False
+            try:
+                with self.pool.connection() as (connection, reused):
+                    connection.request("POST", self.pool.path("/api/generate"), body=raw, headers=headers)
+                    response = connection.getresponse()
+                    latency = time.perf_counter() - attempt_started
+                    if response.status >= 400:
+                        # Fully read, so the connection goes back to the pool even on errors.
+                        response.read()
+                    elif request.stream:
+                        text, stats = self._read_stream(response, on_token, started)
+                    else:
+                        text, stats = self._read_single(response.read().decode("utf-8"))
+                if response.status >= 500:
+                    raise _RetryableStatus(response.status)
+                if response.status >= 400:
+                    raise AIProviderError(
+                        f"Ollama respondio con error HTTP {response.status}. "
+                        f"Verifica modelo '{request.model}' y que Ollama este activo."
+                    )
+                break
+            except (_RetryableStatus, *RETRYABLE_ERRORS) as exc:
+                # A keep-alive connection the server closed while idle does not count as an attempt;
+                # the pool runs out of idle connections, so this cannot loop forever.
+                if reused and not emitted and not isinstance(exc, _RetryableStatus):
+                    attempt -= 1
+                    continue
+                # Tokens already handed to the caller cannot be taken back, so a broken stream is final.
+                if emitted or attempt > self.retries:
+                    if isinstance(exc, _RetryableStatus):
+                        raise AIProviderError(
+                            f"Ollama respondio con error HTTP {exc.status}. "
+                            f"Verifica modelo '{request.model}' y que Ollama este activo."
+                        ) from exc
+                    raise AIProviderError(f"Se perdio la conexion con Ollama en {self.base_url}: {exc}") from exc
+                time.sleep(self.backoff_s * (2 ** (attempt - 1)))
+            except http.client.HTTPException as exc:
+                raise AIProviderError(f"Ollama devolvio una respuesta HTTP no valida: {exc!r}") from exc
+            except TimeoutError as exc:
+                raise AIProviderError("Timeout al consultar Ollama. Verifica que el modelo este cargado localmente.") from exc
+            except OSError as exc:
+                raise AIProviderError(
+                    f"No se pudo conectar a Ollama en {self.base_url}. "
+                    "Instala Ollama (https://ollama.com/download), inicia el servicio y descarga el modelo con: "
+                    f"ollama pull {request.model}"
+                ) from exc
+
+        self.metrics.record(latency, attempt, reused)
+
+        text = text.strip()
+        if not text:
+            raise AIProviderError("Ollama no devolvio contenido de respuesta.")
+
+        stats["stream"] = request.stream
+        stats["attempts"] = attempt
+        stats["http_latency_s"] = round(latency, 3)
+        stats["total_s"] = round(time.perf_counter() - started, 3)
+        return AIProviderResponse(text=text, stats=stats)
+
+    def _read_single(self, body: str) -> tuple[str, dict[str, Any]]:
         try:
             payload_response = json.loads(body)
         except json.JSONDecodeError as exc:
             raise AIProviderError("Ollama devolvio una respuesta no valida en JSON.") from exc
+        if not isinstance(payload_response, dict):
+            raise AIProviderError("Ollama devolvio una respuesta no valida en JSON.")
 
-        text = str(payload_response.get("response") or "").strip()
-        if not text:
-            raise AIProviderError("Ollama no devolvio contenido de respuesta.")
+        return str(payload_response.get("response") or ""), _generation_stats(payload_response)
+
+    def _read_stream(
+        self,
+        response: http.client.HTTPResponse,
+        on_token: Callable[[str], None],
+        started: float,
+    ) -> tuple[str, dict[str, Any]]:
+        parts: list[str] = []
+        stats: dict[str, Any] = {}
+        first_token_at: float | None = None
+        chunks = 0
+
+        # Ollama streams one JSON object per line; the last one has done=true and the counters.
+        for raw_line in response:
+            line = raw_line.strip()
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise AIProviderError("Ollama devolvio un fragmento de streaming no valido.") from exc
+            if not isinstance(chunk, dict):
+                raise AIProviderError("Ollama devolvio un fragmento de streaming no valido.")
+            if chunk.get("error"):
+                raise AIProviderError(f"Ollama reporto un error durante la generacion: {chunk['error']}")
+
+            piece = str(chunk.get("response") or "")
+            if piece:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunks += 1
+                parts.append(piece)
+                on_token(piece)
+            if chunk.get("done"):
+                stats = _generation_stats(chunk)
+                break
+        # Drain the chunked terminator so the connection can go back to the pool.
+        response.read()
 
-        return AIProviderResponse(text=text)
+        if first_token_at is not None:
+            stats["time_to_first_token_s"] = round(first_token_at - started, 3)
+            if "tokens_per_second" not in stats:
+                elapsed = time.perf_counter() - first_token_at
+                if elapsed > 0:
+                    # Without server counters, each streamed chunk is roughly one token.
+                    stats["tokens_per_second"] = round(chunks / elapsed, 2)
+        return "".join(parts), stats
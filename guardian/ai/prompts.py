@@ -1,102 +1,369 @@
 from __future__ import annotations
 
 import json
+from dataclasses import dataclass
 from typing import Any
 
+# Rough size estimate used to keep prompts inside the model context; about 4 characters
+# per token for mixed Spanish prose and JSON.
+CHARS_PER_TOKEN = 4
+_TRUNCATED_MARK = " [...]"
+# Below this many characters a cut partial analysis stops saying anything useful.
+_MIN_PARTIAL_CHARS = 400
+
+_INSTRUCTIONS = (
+    "Eres un asistente de seguridad para desarrolladores. "
+    "Responde SOLO en espanol. Usa EXCLUSIVAMENTE los datos JSON entregados. "
+    "No inventes hallazgos. No recomiendes explotacion ofensiva. "
+    "No muestres secretos completos. Respeta valores enmascarados."
+)
+
+_TERMINOLOGY_RULES = (
+    "Reglas de terminologia obligatorias:\n"
+    "- Usa 'hallazgos' o 'riesgos' por defecto.\n"
+    "- Usa 'vulnerabilidad' solo si existe evidencia inequivoca (HIGH/CRITICAL claros por secretos reales o CI inseguro directo).\n"
+    "- Mantener tono generalista para cualquier web/app/proyecto."
+)
+
+_NEUTRALITY = (
+    "Regla de neutralidad:\n"
+    "- No asumas dominios especificos por defecto.\n"
+    "- Solo menciona contexto de dominio si project_profile.signals lo soporta explicitamente.\n"
+    "- Si profile es generic/web/backend/mobile/infra/library sin senales de dominio, evita referencias contextuales no justificadas."
+)
+
+_SEC017_CONTEXT = (
+    "Contextualizacion obligatoria para SEC-017:\n"
+    "- Explicar que SQL versionado puede ser normal (migrations, seeds, scripts).\n"
+    "- Riesgo real solo si hay credenciales, tokens o dumps reales.\n"
+    "- Acciones concretas: buscar patrones password=, token, api_key, bearer, AKIA, ghp_, BEGIN PRIVATE KEY; "
+    "separar dumps de datos; usar .env.example y .gitignore adecuados."
+)
+
+_CI_HARDENING = (
+    "Hardening de CI (siempre incluir, aun sin hallazgos CI):\n"
+    "- permissions minimas en GitHub Actions\n"
+    "- no imprimir secrets\n"
+    "- pin de actions por SHA o version fija\n"
+    "- artifact retention + masking\n"
+    "- usar --fail-on HIGH como gate"
+)
+
+_OUTPUT_CONTRACT = (
+    "Estructura obligatoria:\n"
+    "A) Resumen ejecutivo del estado del proyecto\n"
+    "B) Priorizacion de riesgos (P0=CRITICAL, P1=HIGH, P2=MEDIUM)\n"
+    "C) Explicacion por tipo de hallazgo: que es, por que importa, cuando es riesgo real\n"
+    "D) Acciones recomendadas defensivas (pasos concretos, sin ejecutar codigo)\n"
+    "E) Hardening de CI\n"
+    "F) Quick wins (max 5, concretos y no repetidos)\n"
+    "G) Que revisar manualmente (max 5, especifico por tipo de hallazgo)"
+)
+
+_GROUPED_INSTRUCTION = (
+    "Debes priorizar grouped_findings para evitar repetir hallazgos identicos. "
+    "Usa count y ejemplos para explicar impacto agregado."
+)
+
+_OMITTED_INSTRUCTION = (
+    "omitted_findings_by_severity cuenta hallazgos de grupos que no entraron en el limite de contexto: "
+    "mencionalos en la priorizacion sin inventar detalles."
+)
+
+_MAP_CONTRACT = (
+    "Este es un analisis parcial: recibes solo una parte de los hallazgos agrupados y otro paso combinara las partes.\n"
+    "Responde de forma breve, sin resumen ejecutivo ni hardening de CI general:\n"
+    "- Riesgos de esta parte priorizados (P0=CRITICAL, P1=HIGH, P2=MEDIUM) con rule_id y count\n"
+    "- Explicacion corta por tipo de hallazgo y cuando es riesgo real\n"
+    "- Acciones recomendadas defensivas\n"
+    "- Quick wins (max 3)\n"
+    "- Que revisar manualmente (max 3)"
+)
+
+_TRUNCATED_INSTRUCTION = (
+    "Los analisis parciales que terminan en [...] se recortaron por el limite de contexto: "
+    "no completes lo que falta."
+)
+
+_REDUCE_INSTRUCTION = (
+    "Recibes analisis parciales generados sobre partes de grouped_findings. "
+    "Combinalos en un unico reporte: elimina repeticiones, conserva la priorizacion global "
+    "y usa grouped_findings (rule_id, severity, count) como referencia de impacto agregado."
+)
+
 
 def _has_domain_signals(profile: dict[str, Any]) -> bool:
     signals = [str(item).lower() for item in (profile.get("signals") or [])]
     return any("qa" in signal or "apex" in signal for signal in signals)
 
 
+@dataclass(frozen=True)
+class AIPrompt:
+    # system only holds fixed instructions, identical on every call of the same kind, so the
+    # model server can keep its processed prefix; prompt holds everything that varies.
+    system: str
+    prompt: str
+
+    @property
+    def text(self) -> str:
+        return f"{self.system}\n\n{self.prompt}"
+
+
+def _domain_notes(profile: dict[str, Any]) -> list[str]:
+    if _has_domain_signals(profile):
+        return ["Hay senales de dominio explicitas en project_profile.signals; puedes usarlas con cautela."]
+    return []
+
+
+def _compact_json(value: Any) -> str:
+    # Indentation costs prefill tokens and tells the model nothing.
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _render(system_sections: list[str], notes: list[str], title: str, input_data: dict[str, Any]) -> AIPrompt:
+    prompt = "\n\n".join(notes + [f"{title}\n{_compact_json(input_data)}\n"])
+    return AIPrompt(system="\n\n".join(system_sections), prompt=prompt)
+
+
+def approx_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _json_chars(value: Any) -> int:
+    # +1 for the separating comma inside the enclosing list or object. Budgeting adds and
+    # subtracts characters, since per-item token rounding would drift over many items.
+    return len(_compact_json(value)) + 1
+
+
+def _sample_findings(findings: list[dict[str, Any]], grouped_findings: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # A raw finding adds nothing once its group lists the file: keep one sample per group
+    # (line and masked evidence) plus anything the group examples do not mention.
+    examples = {
+        (str(group.get("rule_id")), str(group.get("severity"))): set(group.get("examples") or [])
+        for group in grouped_findings
+    }
+    sampled: set[tuple[str, str]] = set()
+    kept: list[dict[str, Any]] = []
+    for finding in findings:
+        key = (str(finding.get("id") or "UNKNOWN"), str(finding.get("severity") or "LOW"))
+        covered = key in examples and (not finding.get("file") or finding.get("file") in examples[key])
+        if covered and key in sampled:
+            continue
+        sampled.add(key)
+        kept.append(finding)
+    return kept
+
+
+def _fit_budget(input_data: dict[str, Any], budget_tokens: int) -> None:
+    budget = budget_tokens * CHARS_PER_TOKEN
+    total = _json_chars(input_data)
+    if total <= budget:
+        return
+
+    # Lowest priority goes first: raw findings (already sorted by severity), then detail of the
+    # least severe groups, then those groups themselves, keeping their counts.
+    findings = input_data["security_findings"]
+    while findings and total > budget:
+        total -= _json_chars(findings.pop())
+
+    groups = input_data["grouped_findings"]
+    for index in range(len(groups) - 1, -1, -1):
+        if total <= budget:
+            return
+        group = groups[index]
+        compact = {key: value for key, value in group.items() if key != "actions"}
+        compact["examples"] = list(group.get("examples") or [])[:1]
+        total -= _json_chars(group) - _json_chars(compact)
+        groups[index] = compact
+
+    _omit_groups(input_data, total, budget)
+
+
+def _omit_groups(input_data: dict[str, Any], total: int, budget: int) -> int:
+    # Drops the least severe groups into per-severity counts until `total` fits, keeping at
+    # least one group. Returns the new total.
+    groups = input_data["grouped_findings"]
+    if total <= budget or len(groups) <= 1:
+        return total
+    # Room for the omitted counts themselves (worst case: every severity, large counts).
+    total += _json_chars({"omitted_findings_by_severity": dict.fromkeys(("CRITICAL", "HIGH", "MEDIUM", "LOW"), 10**6)})
+    omitted: dict[str, int] = {}
+    while len(groups) > 1 and total > budget:
+        group = groups.pop()
+        total -= _json_chars(group)
+        severity = str(group.get("severity") or "LOW")
+        omitted[severity] = omitted.get(severity, 0) + int(group.get("count") or 0)
+    input_data["omitted_findings_by_severity"] = omitted
+    return total
+
+
+def _truncate_json_text(text: str, max_chars: int) -> str:
+    # Cuts `text` so its JSON encoding (escapes included) takes at most max_chars.
+    if _json_chars(text) <= max_chars:
+        return text
+    end = min(len(text), max_chars)
+    while end > 0:
+        excess = _json_chars(text[:end] + _TRUNCATED_MARK) - max_chars
+        if excess <= 0:
+            break
+        end -= excess
+    return text[: max(end, 0)].rstrip() + _TRUNCATED_MARK
+
+
+def _fit_partials(input_data: dict[str, Any], budget_tokens: int) -> bool:
+    # Returns True when some partial analysis was cut.
+    budget = budget_tokens * CHARS_PER_TOKEN
+    total = _json_chars(input_data)
+    if total <= budget:
+        return False
+
+    partials = input_data["partial_analyses"]
+    sizes = [_json_chars(partial) for partial in partials]
+    # The analyses carry the content; the counts table only gives up groups when the analyses
+    # would otherwise drop below a useful length.
+    floor = sum(min(size, _MIN_PARTIAL_CHARS) for size in sizes)
+    others = _omit_groups(input_data, total - sum(sizes) + floor, budget) - floor
+
+    # Equal share per analysis: short ones stay whole and leave their unused share to the rest.
+    room = budget - others
+    cap = None
+    remaining = len(sizes)
+    for size in sorted(sizes):
+        share = room // remaining
+        if size > share:
+            cap = max(share, _MIN_PARTIAL_CHARS // 4)
+            break
+        room -= size
+        remaining -= 1
+    if cap is None:
+        return False
+    input_data["partial_analyses"] = [_truncate_json_text(partial, cap) for partial in partials]
+    return True
+
+
 def build_ai_prompt(
     scan_payload: dict[str, Any],
     max_findings: int,
     grouped_findings: list[dict[str, Any]],
-) -> str:
-    project_summary = scan_payload.get("project_summary", {})
-    security_summary = scan_payload.get("security_summary", {})
-    ci_status = scan_payload.get("ci_status", {})
-    warnings = scan_payload.get("warnings", [])
+    max_prompt_tokens: int | None = None,
+) -> AIPrompt:
     profile = scan_payload.get("project_profile", {"name": "generic", "signals": []})
     findings = scan_payload.get("security_findings", [])[:max_findings]
+    input_data = {
+        "project_summary": scan_payload.get("project_summary", {}),
+        "project_profile": profile,
+        "security_summary": scan_payload.get("security_summary", {}),
+        "ci_status": scan_payload.get("ci_status", {}),
+        "warnings": scan_payload.get("warnings", []),
+        "grouped_findings": list(grouped_findings),
+        "security_findings": _sample_findings(findings, grouped_findings),
+    }
+    sections = [
+        _INSTRUCTIONS,
+        _TERMINOLOGY_RULES,
+        _NEUTRALITY,
+        _SEC017_CONTEXT,
+        _CI_HARDENING,
+        _OUTPUT_CONTRACT,
+        _GROUPED_INSTRUCTION,
+    ]
+    notes = _domain_notes(profile)
+    title = "Fuente unica de verdad (scan.json parcial):"
+
+    if max_prompt_tokens is not None:
+        if max_prompt_tokens <= 0:
+            raise ValueError("--max-prompt-tokens debe ser mayor a 0")
+        # +1 for the line breaks around the JSON block.
+        fixed = approx_tokens("\n\n".join(sections + notes + [_OMITTED_INSTRUCTION, title])) + 1
+        _fit_budget(input_data, max_prompt_tokens - fixed)
+        if "omitted_findings_by_severity" in input_data:
+            notes.append(_OMITTED_INSTRUCTION)
+    return _render(sections, notes, title, input_data)
 
+
+def chunk_grouped_findings(grouped_findings: list[dict[str, Any]], max_tokens: int) -> list[list[dict[str, Any]]]:
+    if max_tokens <= 0:
+        raise ValueError("--chunk-tokens debe ser mayor a 0")
+
+    # Greedy in priority order so the most severe groups land together in the first chunks.
+    chunks: list[list[dict[str, Any]]] = []
+    current: list[dict[str, Any]] = []
+    used = 0
+    for group in grouped_findings:
+        size = approx_tokens(_compact_json(group)) + 1
+        if current and used + size > max_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(group)
+        used += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_map_prompt(
+    scan_payload: dict[str, Any],
+    grouped_chunk: list[dict[str, Any]],
+    chunk_index: int,
+    chunk_count: int,
+) -> AIPrompt:
+    profile = scan_payload.get("project_profile", {"name": "generic", "signals": []})
     input_data = {
-        "project_summary": project_summary,
         "project_profile": profile,
-        "security_summary": security_summary,
-        "ci_status": ci_status,
-        "warnings": warnings,
-        "grouped_findings": grouped_findings,
-        "security_findings": findings,
+        "security_summary": scan_payload.get("security_summary", {}),
+        "part": {"index": chunk_index, "total": chunk_count},
+        "grouped_findings": grouped_chunk,
     }
+    sections = [
+        _INSTRUCTIONS,
+        _TERMINOLOGY_RULES,
+        _NEUTRALITY,
+        _SEC017_CONTEXT,
+        _MAP_CONTRACT,
+        _GROUPED_INSTRUCTION,
+    ]
+    title = f"Fuente unica de verdad (parte {chunk_index} de {chunk_count}):"
+    return _render(sections, _domain_notes(profile), title, input_data)
 
-    instructions = (
-        "Eres un asistente de seguridad para desarrolladores. "
-        "Responde SOLO en espanol. Usa EXCLUSIVAMENTE los datos JSON entregados. "
-        "No inventes hallazgos. No recomiendes explotacion ofensiva. "
-        "No muestres secretos completos. Respeta valores enmascarados."
-    )
-
-    terminology_rules = (
-        "Reglas de terminologia obligatorias:\n"
-        "- Usa 'hallazgos' o 'riesgos' por defecto.\n"
-        "- Usa 'vulnerabilidad' solo si existe evidencia inequivoca (HIGH/CRITICAL claros por secretos reales o CI inseguro directo).\n"
-        "- Mantener tono generalista para cualquier web/app/proyecto."
-    )
-
-    neutrality = (
-        "Regla de neutralidad:\n"
-        "- No asumas dominios especificos por defecto.\n"
-        "- Solo menciona contexto de dominio si project_profile.signals lo soporta explicitamente.\n"
-        "- Si profile es generic/web/backend/mobile/infra/library sin senales de dominio, evita referencias contextuales no justificadas."
-    )
-
-    sec017_context = (
-        "Contextualizacion obligatoria para SEC-017:\n"
-        "- Explicar que SQL versionado puede ser normal (migrations, seeds, scripts).\n"
-        "- Riesgo real solo si hay credenciales, tokens o dumps reales.\n"
-        "- Acciones concretas: buscar patrones password=, token, api_key, bearer, AKIA, ghp_, BEGIN PRIVATE KEY; "
-        "separar dumps de datos; usar .env.example y .gitignore adecuados."
-    )
-
-    ci_hardening = (
-        "Hardening de CI (siempre incluir, aun sin hallazgos CI):\n"
-        "- permissions minimas en GitHub Actions\n"
-        "- no imprimir secrets\n"
-        "- pin de actions por SHA o version fija\n"
-        "- artifact retention + masking\n"
-        "- usar --fail-on HIGH como gate"
-    )
-
-    output_contract = (
-        "Estructura obligatoria:\n"
-        "A) Resumen ejecutivo del estado del proyecto\n"
-        "B) Priorizacion de riesgos (P0=CRITICAL, P1=HIGH, P2=MEDIUM)\n"
-        "C) Explicacion por tipo de hallazgo: que es, por que importa, cuando es riesgo real\n"
-        "D) Acciones recomendadas defensivas (pasos concretos, sin ejecutar codigo)\n"
-        "E) Hardening de CI\n"
-        "F) Quick wins (max 5, concretos y no repetidos)\n"
-        "G) Que revisar manualmente (max 5, especifico por tipo de hallazgo)"
-    )
-
-    grouped_instruction = (
-        "Debes priorizar grouped_findings para evitar repetir hallazgos identicos. "
-        "Usa count y ejemplos para explicar impacto agregado."
-    )
-
-    domain_clause = ""
-    if _has_domain_signals(profile):
-        domain_clause = "\nHay senales de dominio explicitas en project_profile.signals; puedes usarlas con cautela."
-
-    return (
-        f"{instructions}\n\n"
-        f"{terminology_rules}\n\n"
-        f"{neutrality}{domain_clause}\n\n"
-        f"{sec017_context}\n\n"
-        f"{ci_hardening}\n\n"
-        f"{output_contract}\n\n"
-        f"{grouped_instruction}\n\n"
-        "Fuente unica de verdad (scan.json parcial):\n"
-        f"{json.dumps(input_data, indent=2, ensure_ascii=False)}\n"
-    )
+
+def build_reduce_prompt(
+    scan_payload: dict[str, Any],
+    grouped_findings: list[dict[str, Any]],
+    partial_analyses: list[str],
+    max_prompt_tokens: int | None = None,
+) -> AIPrompt:
+    profile = scan_payload.get("project_profile", {"name": "generic", "signals": []})
+    input_data = {
+        "project_summary": scan_payload.get("project_summary", {}),
+        "project_profile": profile,
+        "security_summary": scan_payload.get("security_summary", {}),
+        "ci_status": scan_payload.get("ci_status", {}),
+        "warnings": scan_payload.get("warnings", []),
+        # Examples and actions already went to the partial analyses; counts are enough here.
+        "grouped_findings": [
+            {"rule_id": group["rule_id"], "severity": group["severity"], "count": group["count"]}
+            for group in grouped_findings
+        ],
+        "partial_analyses": partial_analyses,
+    }
+    sections = [
+        _INSTRUCTIONS,
+        _TERMINOLOGY_RULES,
+        _NEUTRALITY,
+        _CI_HARDENING,
+        _OUTPUT_CONTRACT,
+        _REDUCE_INSTRUCTION,
+    ]
+    notes = _domain_notes(profile)
+    title = "Fuente unica de verdad (scan.json resumido y analisis parciales):"
+
+    if max_prompt_tokens is not None:
+        if max_prompt_tokens <= 0:
+            raise ValueError("--max-prompt-tokens debe ser mayor a 0")
+        fixed = approx_tokens("\n\n".join(sections + notes + [_OMITTED_INSTRUCTION, _TRUNCATED_INSTRUCTION, title])) + 1
+        truncated = _fit_partials(input_data, max_prompt_tokens - fixed)
+        if "omitted_findings_by_severity" in input_data:
+            notes.append(_OMITTED_INSTRUCTION)
+        if truncated:
+            notes.append(_TRUNCATED_INSTRUCTION)
+    return _render(sections, notes, title, input_data)
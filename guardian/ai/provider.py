@@ -1,18 +1,28 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Protocol
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
 
 
 @dataclass(frozen=True)
 class AIProviderRequest:
     model: str
     prompt: str
+    stream: bool = False
+    # Fixed instructions sent apart from the data so the server can reuse their processed prefix.
+    system: str | None = None
+    # How long the server keeps the model loaded after the request (e.g. "30m"); None uses its default.
+    keep_alive: str | None = None
+    # Generation options such as num_ctx and num_predict; they change the output, unlike keep_alive.
+    options: dict[str, Any] = field(default_factory=dict)
+    # Called with each text fragment as it arrives when stream is enabled.
+    on_token: Callable[[str], None] | None = None
 
 
 @dataclass(frozen=True)
 class AIProviderResponse:
     text: str
+    stats: dict[str, Any] = field(default_factory=dict)
 
 
 class AIProviderError(RuntimeError):
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from .provider import AIProviderResponse
+
+RESPONSE_CACHE_VERSION = 1
+RESPONSE_CACHE_DIRNAME = "ai-responses"
+DEFAULT_RESPONSE_CACHE_MB = 64.0
+
+
+def default_response_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "ai-dev-guardian"
+
+
+def response_cache_key(provider: str, model: str, prompt: str, options: dict[str, Any] | None = None) -> str:
+    # Everything that changes the completion is part of the key; transport settings
+    # (base URL, streaming, timeouts) are not.
+    material = {
+        "version": RESPONSE_CACHE_VERSION,
+        "provider": (provider or "").strip().lower(),
+        "model": model,
+        "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+        "options": options or {},
+    }
+    encoded = json.dumps(material, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: Path, max_bytes: int = int(DEFAULT_RESPONSE_CACHE_MB * 1024 * 1024)) -> None:
+        if max_bytes <= 0:
+            raise ValueError("--cache-max-mb debe ser mayor a 0")
+        self.directory = cache_dir / RESPONSE_CACHE_DIRNAME
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def lookup(self, key: str) -> AIProviderResponse | None:
+        path = self._entry_path(key)
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+        except OSError:
+            return None
+        except ValueError:
+            self._discard(path)
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != RESPONSE_CACHE_VERSION or payload.get("key") != key:
+            self._discard(path)
+            return None
+        text = payload.get("text")
+        if not isinstance(text, str) or not text:
+            self._discard(path)
+            return None
+
+        # mtime doubles as the LRU clock: a hit makes the entry the most recently used.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        stats = payload.get("stats")
+        return AIProviderResponse(text=text, stats=stats if isinstance(stats, dict) else {})
+
+    def store(self, key: str, response: AIProviderResponse) -> None:
+        payload = {
+            "version": RESPONSE_CACHE_VERSION,
+            "key": key,
+            "text": response.text,
+            "stats": response.stats,
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".response-", suffix=".tmp", dir=str(self.directory))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_name, self._entry_path(key))
+        except OSError:
+            self._discard(Path(tmp_name))
+            raise
+        self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> int:
+        entries: list[tuple[int, int, Path]] = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as iterator:
+                for entry in iterator:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, Path(entry.path)))
+                    total += stat.st_size
+        except OSError:
+            return 0
+
+        removed = 0
+        entries.sort(key=lambda item: item[0])
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            # The entry just written survives even if it alone exceeds the limit.
+            if keep is not None and path.name == f"{keep}.json":
+                continue
+            if self._discard(path):
+                total -= size
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _discard(path: Path) -> bool:
+        try:
+            path.unlink()
+        except OSError:
+            return False
+        return True
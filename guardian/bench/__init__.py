@@ -0,0 +1,3 @@
+from .synthetic import SyntheticSpec, generate_repo
+
+__all__ = ["SyntheticSpec", "generate_repo"]
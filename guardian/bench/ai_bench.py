@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import math
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from guardian import __version__
+
+from .fake_ollama import FakeOllamaConfig, FakeOllamaServer
+
+AI_BENCH_SCHEMA_VERSION = 1
+_SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+
+
+def synthetic_scan_payload(findings: int, rules: int = 12, seed: int = 1) -> dict[str, Any]:
+    if findings < 0 or rules <= 0:
+        raise ValueError("findings >= 0 y rules > 0")
+    items = []
+    for index in range(findings):
+        rule = (index * 7 + seed) % rules
+        items.append(
+            {
+                "id": f"SEC-{100 + rule}",
+                "severity": _SEVERITIES[rule % len(_SEVERITIES)],
+                "confidence": "HIGH",
+                "file": f"src/pkg{index % 17}/module_{index}.py",
+                "line": index % 400 + 1,
+                "evidence": "token=****" + f"{index:04d}"[-4:],
+                "recommendation": "Rotar la credencial y moverla a un gestor de secretos.",
+            }
+        )
+    summary = {severity: 0 for severity in _SEVERITIES}
+    for item in items:
+        summary[item["severity"]] += 1
+    return {
+        "tool": {"name": "ai-dev-guardian", "version": __version__},
+        "schema_version": "1.0",
+        "project_summary": {"path": "synthetic", "score": "WARN"},
+        "project_profile": {"name": "generic", "signals": []},
+        "security_summary": summary,
+        "ci_status": {"fail_on": "NONE", "max_severity": "CRITICAL" if items else "NONE", "expected_exit_code": 0},
+        "warnings": [],
+        "security_findings": items,
+    }
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        # Nearest-rank, so every reported value is an observed latency.
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+    return {
+        "p50": round(rank(0.50), 4),
+        "p90": round(rank(0.90), 4),
+        "p99": round(rank(0.99), 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.fmean(ordered), 4),
+    }
+
+
+def run_ai_benchmark(
+    config: FakeOllamaConfig,
+    requests: int = 20,
+    concurrency: int = 1,
+    findings: int = 200,
+    rules: int = 12,
+    stream: bool = True,
+    map_reduce: bool = False,
+    map_concurrency: int = 2,
+    chunk_tokens: int = 3000,
+    retries: int = 2,
+    workdir: Path | None = None,
+) -> dict[str, Any]:
+    # Imported here: guardian.cli registers the bench commands and imports this module.
+    from guardian.ai.provider import AIProviderError
+    from guardian.cli import run_ai
+
+    if requests <= 0 or concurrency <= 0:
+        raise ValueError("--requests y --concurrency deben ser mayores a 0")
+
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    errors: list[str] = []
+    lock = threading.Lock()
+
+    with tempfile.TemporaryDirectory(prefix="guardian-ai-bench-") as tmp:
+        base = workdir.resolve() if workdir is not None else Path(tmp)
+        base.mkdir(parents=True, exist_ok=True)
+        scan_path = base / "scan.json"
+        payload = synthetic_scan_payload(findings, rules=rules, seed=config.seed)
+        scan_path.write_text(json.dumps(payload), encoding="utf-8")
+
+        with FakeOllamaServer(config) as server:
+
+            def one(index: int) -> None:
+                out = base / "reports" / f"ai-{index}.md"
+                started = time.perf_counter()
+                try:
+                    # The response cache stays off: every run must reach the server.
+                    run_ai(
+                        scan_path,
+                        out,
+                        stream=stream,
+                        base_url=server.base_url,
+                        map_reduce=map_reduce,
+                        concurrency=map_concurrency,
+                        chunk_tokens=chunk_tokens,
+                        retries=retries,
+                    )
+                except AIProviderError as exc:
+                    with lock:
+                        errors.append(str(exc))
+                    return
+                elapsed = time.perf_counter() - started
+                performance = json.loads(out.with_suffix(".json").read_text(encoding="utf-8")).get("performance") or {}
+                with lock:
+                    latencies.append(elapsed)
+                    if "time_to_first_token_s" in performance:
+                        ttfts.append(float(performance["time_to_first_token_s"]))
+
+            wall_started = time.perf_counter()
+            # Progress lines from every run would interleave; the summary replaces them.
+            with contextlib.redirect_stderr(io.StringIO()):
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    list(executor.map(one, range(requests)))
+            wall = time.perf_counter() - wall_started
+            server_requests = server.requests
+            injected = server.injected_errors
+
+    return {
+        "schema_version": AI_BENCH_SCHEMA_VERSION,
+        "guardian_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "server": config.to_dict(),
+        "mode": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "findings": findings,
+            "rules": rules,
+            "stream": stream,
+            "map_reduce": map_reduce,
+            "map_concurrency": map_concurrency,
+            "chunk_tokens": chunk_tokens,
+            "retries": retries,
+        },
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:3],
+        "server_requests": server_requests,
+        "injected_errors": injected,
+        "wall_s": round(wall, 4),
+        "requests_per_s": round(len(latencies) / wall, 2) if wall > 0 else 0.0,
+        "latency_s": _percentiles(latencies),
+        "ttft_s": _percentiles(ttfts),
+    }
+
+
+def render_ai_summary(result: dict[str, Any]) -> str:
+    mode = result["mode"]
+    lines = [
+        f"requests={mode['requests']} concurrency={mode['concurrency']} findings={mode['findings']} "
+        f"stream={mode['stream']} map_reduce={mode['map_reduce']}",
+        f"ok={result['ok']} errors={result['errors']} server_requests={result['server_requests']} "
+        f"wall={result['wall_s']:.3f}s req/s={result['requests_per_s']:.2f}",
+    ]
+    for name in ("latency_s", "ttft_s"):
+        stats = result[name]
+        if stats:
+            lines.append(
+                f"  {name:<10} p50={stats['p50']:.4f} p90={stats['p90']:.4f} "
+                f"p99={stats['p99']:.4f} max={stats['max']:.4f}"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+# Shaped like a real analysis so the formatter's section parsing does the same work.
+_REPORT_LINES = (
+    "## Resumen ejecutivo",
+    "El proyecto presenta hallazgos que requieren atencion priorizada.",
+    "## Priorizacion de riesgos",
+    "- P0: rotar credenciales expuestas en el repositorio",
+    "- P1: reducir permisos de workflows de CI",
+    "## Hardening de CI",
+    "- Minimizar permissions en GitHub Actions",
+    "- Pinear actions por SHA",
+    "## Quick wins",
+    "- Mover secretos a variables seguras",
+    "- Revisar scripts que ejecutan contenido remoto",
+    "## Que revisar manualmente",
+    "- Validar si los dumps SQL contienen datos reales",
+)
+
+
+@dataclass(frozen=True)
+class FakeOllamaConfig:
+    first_token_latency_s: float = 0.05
+    tokens_per_s: float = 200.0
+    response_tokens: int = 120
+    error_rate: float = 0.0
+    error_status: int = 503
+    disconnect_rate: float = 0.0
+    seed: int = 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _response_tokens(count: int) -> list[str]:
+    words = [word for line in _REPORT_LINES for word in (line + "\n").split(" ")]
+    tokens: list[str] = []
+    while len(tokens) < count:
+        for word in words:
+            tokens.append(word if word.endswith("\n") else word + " ")
+            if len(tokens) >= count:
+                break
+    return tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 with chunked streaming, like Ollama, so clients can keep connections alive.
+    protocol_version = "HTTP/1.1"
+    server: FakeOllamaServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload: dict[str, Any]) -> None:
+        line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.rstrip("/") != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            request = json.loads(body)
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid json"})
+            return
+
+        outcome = self.server.next_outcome()
+        if outcome == "disconnect":
+            # Drop the connection without a response, as a crashed or restarted server would.
+            self.close_connection = True
+            return
+        if outcome == "error":
+            self._send_json(self.server.config.error_status, {"error": "injected failure"})
+            return
+
+        config = self.server.config
+        tokens = self.server.tokens
+        started = time.perf_counter()
+        time.sleep(config.first_token_latency_s)
+        prompt_tokens = (len(str(request.get("prompt") or "")) + len(str(request.get("system") or ""))) // 4
+
+        if not request.get("stream"):
+            time.sleep(len(tokens) / config.tokens_per_s if config.tokens_per_s > 0 else 0)
+            eval_ns = int((time.perf_counter() - started - config.first_token_latency_s) * 1e9)
+            self._send_json(
+                200,
+                {
+                    "model": request.get("model"),
+                    "response": "".join(tokens),
+                    "done": True,
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": len(tokens),
+                    "eval_duration": max(1, eval_ns),
+                    "total_duration": int((time.perf_counter() - started) * 1e9),
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        eval_started = time.perf_counter()
+        for index, token in enumerate(tokens):
+            if config.tokens_per_s > 0:
+                # Paced against the schedule, not per-sleep, so timer granularity does not add up.
+                delay = eval_started + index / config.tokens_per_s - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self._write_chunk({"model": request.get("model"), "response": token, "done": False})
+        self._write_chunk(
+            {
+                "model": request.get("model"),
+                "response": "",
+                "done": True,
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": len(tokens),
+                "eval_duration": max(1, int((time.perf_counter() - eval_started) * 1e9)),
+                "total_duration": int((time.perf_counter() - started) * 1e9),
+            }
+        )
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config: FakeOllamaConfig | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeOllamaConfig()
+        if not 0 <= self.config.error_rate <= 1 or not 0 <= self.config.disconnect_rate <= 1:
+            raise ValueError("error_rate y disconnect_rate deben estar entre 0 y 1")
+        self.tokens = _response_tokens(max(1, self.config.response_tokens))
+        self.requests = 0
+        self.injected_errors = 0
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_outcome(self) -> str:
+        with self._lock:
+            self.requests += 1
+            roll = self._rng.random()
+            if roll < self.config.disconnect_rate:
+                self.injected_errors += 1
+                return "disconnect"
+            if roll < self.config.disconnect_rate + self.config.error_rate:
+                self.injected_errors += 1
+                return "error"
+            return "ok"
+
+    def start(self) -> FakeOllamaServer:
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> FakeOllamaServer:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Stand-in for Ollama's /api/generate, for local benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=11434, help="Port (default: Ollama's 11434)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=200.0, help="Generation rate (0 = instant)")
+    parser.add_argument("--response-tokens", type=int, default=120, help="Tokens per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an HTTP error")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected errors")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of requests dropped without reply")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for error injection")
+    args = parser.parse_args(argv)
+
+    config = FakeOllamaConfig(
+        first_token_latency_s=args.latency,
+        tokens_per_s=args.tokens_per_s,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed,
+    )
+    server = FakeOllamaServer(config, host=args.host, port=args.port)
+    print(f"fake ollama escuchando en {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from guardian import __version__
+
+from .synthetic import SyntheticSpec, generate_repo
+
+BENCH_SCHEMA_VERSION = 1
+# Phases faster than this are too noisy to flag as regressions.
+PHASE_NOISE_FLOOR_S = 0.05
+
+
+def run_scan_benchmark(
+    spec: SyntheticSpec,
+    repeat: int = 3,
+    jobs: int | None = None,
+    workdir: Path | None = None,
+) -> dict[str, Any]:
+    # Imported here: guardian.cli registers the bench command and imports this module.
+    from guardian.cli import run_scan
+    from guardian.scan.timing import PhaseTimer
+
+    if repeat <= 0:
+        raise ValueError("--repeat debe ser mayor a 0")
+
+    with tempfile.TemporaryDirectory(prefix="guardian-bench-") as tmp:
+        base = workdir.resolve() if workdir is not None else Path(tmp)
+        repo = base / "repo"
+        out_dir = base / "reports"
+        repo_summary = generate_repo(repo, spec)
+
+        runs: list[tuple[float, dict[str, dict[str, float]]]] = []
+        for _ in range(repeat):
+            timer = PhaseTimer()
+            started = time.perf_counter()
+            run_scan(repo, out_dir, jobs=jobs, timer=timer)
+            runs.append((time.perf_counter() - started, timer.phases))
+
+    best_wall, best_phases = min(runs, key=lambda run: run[0])
+    megabytes = repo_summary["bytes"] / (1024 * 1024)
+    return {
+        "schema_version": BENCH_SCHEMA_VERSION,
+        "guardian_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "spec": spec.to_dict(),
+        "repo": repo_summary,
+        "repeat": repeat,
+        "jobs": jobs,
+        "wall_s": round(best_wall, 4),
+        "median_wall_s": round(statistics.median(run[0] for run in runs), 4),
+        "files_per_s": round(repo_summary["files"] / best_wall, 1) if best_wall > 0 else 0.0,
+        "mb_per_s": round(megabytes / best_wall, 2) if best_wall > 0 else 0.0,
+        "phases": {
+            name: {"wall_s": round(record["wall_s"], 4), "cpu_s": round(record["cpu_s"], 4)}
+            for name, record in best_phases.items()
+        },
+    }
+
+
+def compare_to_baseline(result: dict[str, Any], baseline: dict[str, Any], threshold: float = 0.2) -> list[str]:
+    if threshold < 0:
+        raise ValueError("--threshold no puede ser negativo")
+
+    if baseline.get("spec") != result.get("spec"):
+        raise ValueError("El baseline se genero con otros parametros de repo; la comparacion no es valida.")
+
+    regressions: list[str] = []
+
+    base_rate = float(baseline.get("files_per_s") or 0)
+    rate = float(result.get("files_per_s") or 0)
+    if base_rate > 0 and rate < base_rate * (1 - threshold):
+        regressions.append(f"files/s bajo de {base_rate:.1f} a {rate:.1f} (umbral {threshold:.0%}).")
+
+    base_phases = baseline.get("phases") or {}
+    for name, record in (result.get("phases") or {}).items():
+        base_wall = float((base_phases.get(name) or {}).get("wall_s") or 0)
+        wall = float(record.get("wall_s") or 0)
+        if base_wall >= PHASE_NOISE_FLOOR_S and wall > base_wall * (1 + threshold):
+            regressions.append(f"Fase {name}: {base_wall:.3f}s -> {wall:.3f}s (umbral {threshold:.0%}).")
+    return regressions
+
+
+def load_baseline(path: Path) -> dict[str, Any]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError as exc:
+        raise FileNotFoundError(f"No existe el baseline de benchmark: {path}") from exc
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"El baseline de benchmark no es un JSON valido: {path}") from exc
+    if not isinstance(payload, dict) or payload.get("schema_version") != BENCH_SCHEMA_VERSION:
+        raise ValueError(f"Baseline de benchmark incompatible: {path}")
+    return payload
+
+
+def render_summary(result: dict[str, Any]) -> str:
+    repo = result["repo"]
+    lines = [
+        f"files={repo['files']} bytes={repo['bytes']} secrets={repo['secrets']} repeat={result['repeat']}",
+        f"wall={result['wall_s']:.3f}s median={result['median_wall_s']:.3f}s "
+        f"files/s={result['files_per_s']:.1f} MB/s={result['mb_per_s']:.2f}",
+    ]
+    for name, record in result["phases"].items():
+        lines.append(f"  {name:<10} wall={record['wall_s']:.4f}s cpu={record['cpu_s']:.4f}s")
+    return "\n".join(lines)
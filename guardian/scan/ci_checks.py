@@ -2,50 +2,49 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from .filesystem import safe_read_text
+from .file_index import FileIndex, build_file_index
 from .rules import Finding
 
 
-def scan_ci_checks(root: Path) -> list[Finding]:
+def scan_ci_checks(root: Path, index: FileIndex | None = None) -> list[Finding]:
+    if index is None:
+        index = build_file_index(root)
     findings: list[Finding] = []
 
-    workflows = root / ".github" / "workflows"
-    if workflows.exists() and workflows.is_dir():
-        for workflow in workflows.glob("*.y*ml"):
-            content = safe_read_text(workflow)
-            if not content:
-                continue
-            relative = str(workflow.relative_to(root)).replace("\\", "/")
+    for workflow in index.files_in_dir(".github/workflows", "*.y*ml"):
+        relative = workflow.relative_path.as_posix()
+        content = index.read_text(relative)
+        if not content:
+            continue
 
-            if "pull_request_target" in content:
-                findings.append(
-                    Finding(
-                        rule_id="CI-001",
-                        severity="HIGH",
-                        confidence="HIGH",
-                        file_path=relative,
-                        line=None,
-                        evidence="Workflow usa pull_request_target",
-                        recommendation="Revisar confianza de forks y permisos del workflow.",
-                    )
+        if "pull_request_target" in content:
+            findings.append(
+                Finding(
+                    rule_id="CI-001",
+                    severity="HIGH",
+                    confidence="HIGH",
+                    file_path=relative,
+                    line=None,
+                    evidence="Workflow usa pull_request_target",
+                    recommendation="Revisar confianza de forks y permisos del workflow.",
                 )
+            )
 
-            if "write-all" in content or "contents: write" in content:
-                findings.append(
-                    Finding(
-                        rule_id="CI-002",
-                        severity="HIGH",
-                        confidence="MEDIUM",
-                        file_path=relative,
-                        line=None,
-                        evidence="Workflow define permisos de escritura amplios",
-                        recommendation="Reducir permisos de GITHUB_TOKEN al minimo necesario.",
-                    )
+        if "write-all" in content or "contents: write" in content:
+            findings.append(
+                Finding(
+                    rule_id="CI-002",
+                    severity="HIGH",
+                    confidence="MEDIUM",
+                    file_path=relative,
+                    line=None,
+                    evidence="Workflow define permisos de escritura amplios",
+                    recommendation="Reducir permisos de GITHUB_TOKEN al minimo necesario.",
                 )
+            )
 
-    gitlab = root / ".gitlab-ci.yml"
-    if gitlab.exists() and gitlab.is_file():
-        content = safe_read_text(gitlab)
+    if index.has_file(".gitlab-ci.yml"):
+        content = index.read_text(".gitlab-ci.yml")
         if "pull_request_target" in content:
             findings.append(
                 Finding(
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import fnmatch
+import os
+import stat as stat_module
+from pathlib import Path
+
+from .filesystem import FileInfo, safe_read_text, should_skip_dir
+from .git_files import list_changed_files, list_git_files
+from .path_filter import GITIGNORE_NAME, IgnoreRules, PathFilter, load_gitignore
+
+# Root-level files read as text by metrics, profile detection and CI checks.
+TEXT_CONSUMED_FILES = frozenset(
+    {
+        "package.json",
+        "pyproject.toml",
+        "Pipfile",
+        "Cargo.toml",
+        "go.mod",
+        "requirements.txt",
+        ".gitlab-ci.yml",
+    }
+)
+
+
+class FileIndex:
+    def __init__(
+        self,
+        root: Path,
+        files: list[FileInfo],
+        directories: list[str],
+        targets: set[str] | None = None,
+        path_filter: PathFilter | None = None,
+    ) -> None:
+        self.root = root
+        self.files = files
+        self.directories = directories
+        # None means every indexed file is scanned; otherwise only these relative paths are.
+        self.targets = targets
+        # Include globs narrow which files have their content scanned; manifests, lockfiles
+        # and CI files outside them still count for the profile, metrics and dependency checks.
+        self.path_filter = path_filter if path_filter is not None and path_filter.includes else None
+        self._by_path: dict[str, FileInfo] = {}
+        self._by_dir: dict[str, list[FileInfo]] = {}
+        for info in files:
+            rel = info.relative_path
+            self._by_path[rel.as_posix()] = info
+            self._by_dir.setdefault(rel.parent.as_posix(), []).append(info)
+        self._directory_set = set(directories)
+        self._text_cache: dict[str, str] = {}
+        self._scan_targets = self.files
+        if self.targets is not None or self.path_filter is not None:
+            self._scan_targets = [info for info in files if self._is_scan_target(info.relative_path.as_posix())]
+
+    def _is_scan_target(self, relative: str) -> bool:
+        if self.targets is not None and relative not in self.targets:
+            return False
+        return self.path_filter is None or self.path_filter.is_included(relative)
+
+    @property
+    def scan_targets(self) -> list[FileInfo]:
+        return self._scan_targets
+
+    @property
+    def partial(self) -> bool:
+        # True when only part of the indexed files is scanned (--changed-since or --include).
+        return self._scan_targets is not self.files
+
+    def is_target(self, relative: str) -> bool:
+        return self.targets is None or relative in self.targets
+
+    def has_file(self, relative: str) -> bool:
+        return relative in self._by_path
+
+    def has_dir(self, relative: str) -> bool:
+        return relative in self._directory_set
+
+    def exists(self, relative: str) -> bool:
+        return self.has_file(relative) or self.has_dir(relative)
+
+    def get(self, relative: str) -> FileInfo | None:
+        return self._by_path.get(relative)
+
+    def files_in_dir(self, relative_dir: str, pattern: str = "*") -> list[FileInfo]:
+        candidates = self._by_dir.get(relative_dir or ".", [])
+        return [info for info in candidates if fnmatch.fnmatchcase(info.relative_path.name, pattern)]
+
+    def match_name(self, pattern: str) -> list[FileInfo]:
+        return [info for info in self.files if fnmatch.fnmatchcase(info.relative_path.name, pattern)]
+
+    def wants_text(self, relative: str) -> bool:
+        # Files whose text later phases (metrics, profile, CI checks) read; the file scan
+        # hands their content over so they are not read a second time.
+        if relative in TEXT_CONSUMED_FILES:
+            return True
+        parent, _, name = relative.rpartition("/")
+        return parent == ".github/workflows" and fnmatch.fnmatchcase(name, "*.y*ml")
+
+    def remember_text(self, relative: str, content: str) -> None:
+        self._text_cache[relative] = content
+
+    def read_text(self, relative: str) -> str:
+        if relative in self._text_cache:
+            return self._text_cache[relative]
+        info = self._by_path.get(relative)
+        content = safe_read_text(info.path) if info is not None else ""
+        self._text_cache[relative] = content
+        return content
+
+
+def _load_ignore_file(path: Path, base: str) -> IgnoreRules | None:
+    rules = load_gitignore(safe_read_text(path), base=base)
+    return rules if rules else None
+
+
+def _walk(root: Path, files: list[FileInfo], directories: list[str], path_filter: PathFilter | None) -> None:
+    root_ignores: tuple[IgnoreRules, ...] = ()
+    if path_filter is not None and path_filter.respect_gitignore:
+        info_exclude = _load_ignore_file(root / ".git" / "info" / "exclude", "")
+        if info_exclude is not None:
+            root_ignores = (info_exclude,)
+    pending: list[tuple[str, str, tuple[IgnoreRules, ...]]] = [(str(root), "", root_ignores)]
+
+    while pending:
+        current, prefix, ignores = pending.pop()
+        try:
+            with os.scandir(current) as iterator:
+                entries = list(iterator)
+        except OSError:
+            continue
+
+        if path_filter is not None and path_filter.respect_gitignore:
+            for entry in entries:
+                if entry.name == GITIGNORE_NAME:
+                    rules = _load_ignore_file(Path(entry.path), prefix.rstrip("/"))
+                    if rules is not None:
+                        ignores = ignores + (rules,)
+                    break
+
+        for entry in entries:
+            relative = f"{prefix}{entry.name}"
+            try:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if should_skip_dir(entry.name):
+                        continue
+                    # Pruned here, so excluded subtrees are never listed or stat'ed.
+                    if path_filter is not None and path_filter.is_excluded(relative, True, ignores):
+                        continue
+                    directories.append(relative)
+                    pending.append((entry.path, f"{relative}/", ignores))
+                    continue
+                if path_filter is not None and path_filter.is_excluded(relative, False, ignores):
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+
+            files.append(
+                FileInfo(
+                    path=Path(entry.path),
+                    relative_path=Path(relative),
+                    size_bytes=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                )
+            )
+
+
+def _from_git(root: Path, files: list[FileInfo], directories: list[str], path_filter: PathFilter | None) -> None:
+    seen_dirs: set[str] = set()
+
+    for relative in list_git_files(root):
+        parts = relative.split("/")
+        if any(should_skip_dir(part) for part in parts[:-1]):
+            continue
+        if path_filter is not None and not path_filter.accepts_path(relative):
+            continue
+
+        full_path = root / relative
+        try:
+            stat = os.lstat(full_path)
+        except OSError:
+            continue
+        # Symlinks and submodule gitlinks are not regular files.
+        if not stat_module.S_ISREG(stat.st_mode):
+            continue
+
+        for depth in range(1, len(parts)):
+            parent = "/".join(parts[:depth])
+            if parent not in seen_dirs:
+                seen_dirs.add(parent)
+                directories.append(parent)
+
+        files.append(
+            FileInfo(
+                path=full_path,
+                relative_path=Path(relative),
+                size_bytes=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+            )
+        )
+
+
+def build_file_index(
+    root: Path,
+    use_git: bool = False,
+    changed_since: str | None = None,
+    path_filter: PathFilter | None = None,
+) -> FileIndex:
+    root = root.resolve()
+    files: list[FileInfo] = []
+    directories: list[str] = []
+    if use_git:
+        _from_git(root, files, directories, path_filter)
+    else:
+        _walk(root, files, directories, path_filter)
+
+    targets = set(list_changed_files(root, changed_since)) if changed_since else None
+    return FileIndex(root=root, files=files, directories=directories, targets=targets, path_filter=path_filter)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+
+from .file_index import FileIndex
+from .filesystem import FileInfo, count_buffer_lines, decode_text, is_binary_buffer, open_file_buffer
+from .rules import Finding, finding_from_row, finding_to_row
+from .ruleset import Ruleset, default_ruleset
+from .scan_cache import ScanCache, content_digest
+from .security import scan_file_buffer
+
+# Below this many files to scan, process start-up costs more than it saves.
+PARALLEL_MIN_FILES = 256
+
+_UNREADABLE = 0
+_BINARY = 1
+_TEXT = 2
+_UNCHANGED = 3
+
+# Set in each worker process by _init_worker.
+_worker_ruleset: Ruleset | None = None
+
+
+@dataclass(frozen=True)
+class FileScan:
+    info: FileInfo
+    line_count: int
+    findings: list[Finding]
+
+
+@dataclass
+class FileScanStats:
+    files_read: int = 0
+    bytes_read: int = 0
+    cache_hits: int = 0
+    binary_files: int = 0
+    skipped_large: int = 0
+    unreadable: int = 0
+
+
+def default_jobs() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return max(1, os.cpu_count() or 1)
+
+
+def _init_worker(ruleset: Ruleset) -> None:
+    global _worker_ruleset
+    _worker_ruleset = ruleset
+
+
+def _scan_one(
+    path: str,
+    relative: str,
+    size_bytes: int,
+    with_digest: bool,
+    known_digest: str,
+    want_text: bool,
+    ruleset: Ruleset | None = None,
+) -> tuple:
+    try:
+        with open_file_buffer(path, size_bytes) as buffer:
+            # Decoded the way FileIndex.read_text would, for the files later phases read.
+            text = decode_text(buffer[:]) if want_text else None
+            digest = content_digest(buffer) if with_digest else ""
+            if known_digest and digest == known_digest:
+                return (_UNCHANGED, digest, 0, [], text)
+            if is_binary_buffer(buffer):
+                return (_BINARY, digest, 0, [], text)
+            return (_TEXT, digest, count_buffer_lines(buffer), scan_file_buffer(Path(relative), buffer, ruleset), text)
+    except OSError:
+        return (_UNREADABLE, "", 0, [], None)
+
+
+def _scan_batch(batch: list[tuple[str, str, int, bool, str, bool]]) -> list[tuple]:
+    results: list[tuple] = []
+    for item in batch:
+        kind, digest, line_count, findings, text = _scan_one(*item, _worker_ruleset)
+        # Rows pickle far smaller and faster than one Finding dataclass at a time.
+        results.append((kind, digest, line_count, [finding_to_row(finding) for finding in findings], text))
+    return results
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    # Semgrep may already be running on a background thread; a child forked from a process
+    # with live threads can deadlock on a lock one of them held, so workers never fork it.
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Imported once in the server, so each worker starts with the scanner already loaded.
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def _run_pool(work: list[tuple[str, str, int, bool, str, bool]], jobs: int, ruleset: Ruleset) -> list[tuple]:
+    batch_size = max(16, min(512, len(work) // (jobs * 4) + 1))
+    batches = [work[start:start + batch_size] for start in range(0, len(work), batch_size)]
+    results: list[tuple] = []
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(batches)),
+        mp_context=_pool_context(),
+        initializer=_init_worker,
+        initargs=(ruleset,),
+    ) as executor:
+        for batch_result in executor.map(_scan_batch, batches):
+            for kind, digest, line_count, rows, text in batch_result:
+                results.append((kind, digest, line_count, [finding_from_row(row) for row in rows], text))
+    return results
+
+
+def scan_files(
+    index: FileIndex,
+    max_file_size_mb: int = 5,
+    cache: ScanCache | None = None,
+    jobs: int = 1,
+    ruleset: Ruleset | None = None,
+    stats: FileScanStats | None = None,
+) -> list[FileScan]:
+    if ruleset is None:
+        ruleset = default_ruleset()
+    if stats is None:
+        stats = FileScanStats()
+    max_size = max_file_size_mb * 1024 * 1024
+    slots: list[FileScan | None] = []
+    pending: list[tuple[int, FileInfo]] = []
+
+    for info in index.scan_targets:
+        if info.size_bytes > max_size:
+            stats.skipped_large += 1
+            continue
+        cached = cache.lookup(info) if cache is not None else None
+        if cached is not None:
+            stats.cache_hits += 1
+            if not cached.binary:
+                slots.append(FileScan(info=info, line_count=cached.line_count, findings=cached.findings))
+            continue
+        pending.append((len(slots), info))
+        slots.append(None)
+
+    work = [
+        (
+            str(info.path),
+            info.relative_path.as_posix(),
+            info.size_bytes,
+            cache is not None,
+            cache.known_digest(info) if cache is not None else "",
+            index.wants_text(info.relative_path.as_posix()),
+        )
+        for _, info in pending
+    ]
+
+    results: list[tuple] | None = None
+    if jobs > 1 and len(work) >= PARALLEL_MIN_FILES:
+        try:
+            results = _run_pool(work, jobs, ruleset)
+        except (OSError, BrokenProcessPool):
+            results = None
+    if results is None:
+        results = [_scan_one(*item, ruleset) for item in work]
+
+    for (slot, info), (kind, digest, line_count, findings, text) in zip(pending, results):
+        if kind == _UNREADABLE:
+            stats.unreadable += 1
+            continue
+        if text is not None:
+            index.remember_text(info.relative_path.as_posix(), text)
+        stats.files_read += 1
+        stats.bytes_read += info.size_bytes
+        if kind == _UNCHANGED and cache is not None:
+            cached = cache.lookup_digest(info, digest)
+            if cached is not None:
+                stats.cache_hits += 1
+                if not cached.binary:
+                    slots[slot] = FileScan(info=info, line_count=cached.line_count, findings=cached.findings)
+                continue
+            kind, digest, line_count, findings, _ = _scan_one(
+                str(info.path), info.relative_path.as_posix(), info.size_bytes, True, "", False, ruleset
+            )
+            if kind == _UNREADABLE:
+                stats.unreadable += 1
+                continue
+            stats.bytes_read += info.size_bytes
+        if kind == _BINARY:
+            stats.binary_files += 1
+        if cache is not None:
+            cache.store(info, digest, kind == _BINARY, line_count, findings)
+        if kind == _TEXT:
+            slots[slot] = FileScan(info=info, line_count=line_count, findings=findings)
+
+    return [scan for scan in slots if scan is not None]
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+import mmap
 import os
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterator
+from typing import Iterator, Union
 
-DEFAULT_IGNORES = {".git", "node_modules", "dist", "build", ".venv", "__pycache__", "reports"}
+DEFAULT_IGNORES = {".git", "node_modules", "dist", "build", ".venv", "__pycache__", "reports", ".guardian-cache"}
+
+BINARY_SNIFF_BYTES = 4096
+MMAP_MIN_BYTES = 1024 * 1024
+_COUNT_CHUNK_BYTES = 1024 * 1024
+
+FileBuffer = Union[bytes, mmap.mmap]
 
 
 @dataclass(frozen=True)
@@ -13,19 +21,44 @@ class FileInfo:
     path: Path
     relative_path: Path
     size_bytes: int
+    mtime_ns: int = 0
 
 
 def should_skip_dir(name: str) -> bool:
     return name in DEFAULT_IGNORES
 
 
+def is_binary_buffer(buffer: FileBuffer) -> bool:
+    return buffer.find(b"\x00", 0, BINARY_SNIFF_BYTES) != -1
+
+
 def is_probably_binary(path: Path) -> bool:
     try:
         with path.open("rb") as handle:
-            chunk = handle.read(4096)
+            chunk = handle.read(BINARY_SNIFF_BYTES)
     except OSError:
         return True
-    return b"\x00" in chunk
+    return is_binary_buffer(chunk)
+
+
+@contextmanager
+def open_file_buffer(path: Path | str, size_bytes: int) -> Iterator[FileBuffer]:
+    with open(path, "rb") as handle:
+        mapped: mmap.mmap | None = None
+        if size_bytes >= MMAP_MIN_BYTES:
+            try:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                mapped = None
+
+        if mapped is None:
+            yield handle.read()
+            return
+
+        try:
+            yield mapped
+        finally:
+            mapped.close()
 
 
 def iter_project_files(root: Path, max_file_size_mb: int = 5) -> Iterator[FileInfo]:
@@ -65,22 +98,56 @@ def iter_project_files(root: Path, max_file_size_mb: int = 5) -> Iterator[FileIn
             except ValueError:
                 continue
 
-            yield FileInfo(path=full_path, relative_path=rel, size_bytes=stat.st_size)
+            yield FileInfo(path=full_path, relative_path=rel, size_bytes=stat.st_size, mtime_ns=stat.st_mtime_ns)
 
 
-def safe_read_text(path: Path) -> str:
-    for encoding in ("utf-8", "utf-8-sig", "latin-1"):
+def decode_text(data: bytes) -> str:
+    # utf-8-sig would only differ from utf-8 on success, so it is never worth a retry.
+    for encoding in ("utf-8", "latin-1"):
         try:
-            return path.read_text(encoding=encoding, errors="strict")
+            text = data.decode(encoding, errors="strict")
         except UnicodeDecodeError:
             continue
-        except OSError:
-            return ""
+        # Match Path.read_text universal newline handling.
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
     return ""
 
 
+def safe_read_text(path: Path) -> str:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return ""
+    return decode_text(data)
+
+
 def count_lines(text: str) -> int:
     if not text:
         return 0
     return text.count("\n") + 1
 
+
+def count_buffer_lines(buffer: FileBuffer) -> int:
+    # Same result as count_lines(decode_text(...)): \r\n and lone \r each end one line.
+    size = len(buffer)
+    if not size:
+        return 0
+
+    if isinstance(buffer, bytes):
+        chunks: Iterator[bytes] = iter((buffer,))
+    else:
+        chunks = (buffer[start:start + _COUNT_CHUNK_BYTES] for start in range(0, size, _COUNT_CHUNK_BYTES))
+
+    newlines = 0
+    previous_cr = False
+    for chunk in chunks:
+        newlines += chunk.count(b"\n")
+        if previous_cr and chunk.startswith(b"\n"):
+            newlines -= 1
+        if b"\r" in chunk:
+            newlines += chunk.count(b"\r") - chunk.count(b"\r\n")
+        previous_cr = chunk.endswith(b"\r")
+
+    return newlines + 1
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+
+class GitEnumerationError(RuntimeError):
+    pass
+
+
+def _run_git(root: Path, args: list[str]) -> bytes:
+    git_bin = shutil.which("git")
+    if not git_bin:
+        raise GitEnumerationError("git no esta instalado; no se puede usar --git/--changed-since.")
+
+    # Never let repository config run helpers (e.g. core.fsmonitor) on an untrusted checkout.
+    command = [git_bin, "-c", "core.fsmonitor=false", "-C", str(root), *args]
+    try:
+        completed = subprocess.run(command, capture_output=True, timeout=120)
+    except OSError as exc:
+        raise GitEnumerationError(f"git no pudo ejecutarse: {exc}") from exc
+    except subprocess.TimeoutExpired as exc:
+        raise GitEnumerationError("git excedio el tiempo limite al listar archivos.") from exc
+
+    if completed.returncode != 0:
+        detail = completed.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        message = detail[-1] if detail else f"exit code {completed.returncode}"
+        raise GitEnumerationError(f"git fallo en {root}: {message}")
+    return completed.stdout
+
+
+def _split_paths(raw: bytes) -> list[str]:
+    return [os.fsdecode(item) for item in raw.split(b"\0") if item]
+
+
+def list_git_files(root: Path) -> list[str]:
+    return _split_paths(_run_git(root, ["ls-files", "-z", "--cached"]))
+
+
+def list_changed_files(root: Path, ref: str) -> list[str]:
+    if not ref or ref.startswith("-"):
+        raise GitEnumerationError(f"Referencia git invalida para --changed-since: {ref!r}")
+
+    base = _run_git(root, ["merge-base", ref, "HEAD"]).decode("utf-8", errors="replace").strip()
+    if not base:
+        raise GitEnumerationError(f"No se encontro merge-base entre {ref} y HEAD.")
+
+    # Compare against the working tree so uncommitted edits are scanned too; deletions have nothing to scan.
+    changed = _split_paths(_run_git(root, ["diff", "--name-only", "-z", "--relative", "--diff-filter=ACMRT", base]))
+    # New files not yet added are changes too (a pre-commit scan must see them); ignored ones are not.
+    untracked = _split_paths(_run_git(root, ["ls-files", "-z", "--others", "--exclude-standard"]))
+    seen = set(changed)
+    return changed + [path for path in untracked if path not in seen]
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+_CHUNK_CHARS = 1 << 16
+# A single array item larger than this is treated as corrupt output instead of buffered.
+MAX_ITEM_CHARS = 16 * 1024 * 1024
+
+_STRUCTURAL = re.compile(r'["\\\[\]{}]')
+_SCALAR_END = re.compile(r"[,}\]\s]")
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+    def __init__(self, handle: TextIO) -> None:
+        self.handle = handle
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.handle.read(_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        # Consumed text is dropped on every refill, so the buffer only holds the current item.
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"JSON invalido: se esperaba {char!r}")
+        self.pos += 1
+
+    def decode(self) -> Any:
+        if self.peek() not in '"{[':
+            # Numbers and literals are not self-delimiting: "12" may be the start of "12.5".
+            while _SCALAR_END.search(self.buffer, self.pos) is None and self.fill():
+                pass
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if len(self.buffer) - self.pos > MAX_ITEM_CHARS or not self.fill():
+                    raise ValueError("JSON invalido o truncado") from None
+                continue
+            self.pos = end
+            return value
+
+    def skip(self) -> None:
+        first = self.peek()
+        if first == '"':
+            self.decode()
+            return
+        if first not in "{[":
+            # Numbers and literals: everything up to the next delimiter.
+            while True:
+                match = _SCALAR_END.search(self.buffer, self.pos)
+                if match is not None:
+                    self.pos = match.start()
+                    return
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    return
+
+        depth = 0
+        in_string = False
+        while True:
+            match = _STRUCTURAL.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    raise ValueError("JSON invalido o truncado")
+                continue
+            char = match.group()
+            self.pos = match.end()
+            if in_string:
+                if char == "\\":
+                    if self.pos >= len(self.buffer) and not self.fill():
+                        raise ValueError("JSON invalido o truncado")
+                    self.pos += 1
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return
+
+
+def iter_array_items(handle: TextIO, key: str) -> Iterator[Any]:
+    # Yields the items of the array under `key` in a top-level JSON object one at a time,
+    # skipping the other members without materializing them.
+    reader = _Reader(handle)
+    if reader.peek() == "":
+        return
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.decode()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.decode()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError("JSON invalido: se esperaba ',' o ']'")
+        else:
+            reader.skip()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError("JSON invalido: se esperaba ',' o '}'")
@@ -4,7 +4,8 @@ from collections import Counter
 from dataclasses import dataclass
 from pathlib import Path
 
-from .filesystem import count_lines, iter_project_files, safe_read_text
+from .file_index import FileIndex, build_file_index
+from .file_scan import FileScan, scan_files
 
 
 @dataclass(frozen=True)
@@ -16,42 +17,37 @@ class Metrics:
     ci_detected: list[str]
     missing_lockfiles: list[str]
     unpinned_dependency_files: list[str]
+    # "changed" when only the files of --changed-since were scanned: the file counts and
+    # LOC above then cover those files, and repo_total_files counts the whole repo.
+    scope: str = "full"
+    repo_total_files: int | None = None
 
 
-def _detect_test_dirs(root: Path) -> list[str]:
+def _detect_test_dirs(index: FileIndex) -> list[str]:
     matches: list[str] = []
     names = {"test", "tests", "spec", "specs", "__tests__"}
 
-    for path in root.rglob("*"):
-        if not path.is_dir():
-            continue
-        name = path.name.lower()
+    for relative in index.directories:
+        name = relative.rsplit("/", 1)[-1].lower()
         if name in names or name.endswith("_test"):
-            try:
-                matches.append(str(path.relative_to(root)).replace("\\", "/"))
-            except ValueError:
-                continue
+            matches.append(relative)
 
     return sorted(set(matches))
 
 
-def _detect_ci(root: Path) -> list[str]:
+def _detect_ci(index: FileIndex) -> list[str]:
     found: list[str] = []
 
-    workflows = root / ".github" / "workflows"
-    if workflows.exists() and workflows.is_dir():
-        for file_path in workflows.glob("*"):
-            if file_path.is_file():
-                found.append(str(file_path.relative_to(root)).replace("\\", "/"))
+    for info in index.files_in_dir(".github/workflows"):
+        found.append(info.relative_path.as_posix())
 
-    gitlab = root / ".gitlab-ci.yml"
-    if gitlab.exists() and gitlab.is_file():
-        found.append(str(gitlab.relative_to(root)).replace("\\", "/"))
+    if index.has_file(".gitlab-ci.yml"):
+        found.append(".gitlab-ci.yml")
 
     return sorted(set(found))
 
 
-def _detect_dependency_risks(root: Path) -> tuple[list[str], list[str]]:
+def _detect_dependency_risks(index: FileIndex) -> tuple[list[str], list[str]]:
     manifest_to_lock = {
         "package.json": ["package-lock.json", "pnpm-lock.yaml", "yarn.lock"],
         "pyproject.toml": ["poetry.lock", "pdm.lock", "uv.lock", "requirements.txt"],
@@ -64,14 +60,13 @@ def _detect_dependency_risks(root: Path) -> tuple[list[str], list[str]]:
     unpinned: list[str] = []
 
     for manifest, lockfiles in manifest_to_lock.items():
-        manifest_path = root / manifest
-        if not manifest_path.exists():
+        if not index.has_file(manifest):
             continue
 
-        if not any((root / lockfile).exists() for lockfile in lockfiles):
+        if not any(index.exists(lockfile) for lockfile in lockfiles):
             missing_lockfiles.append(manifest)
 
-        content = safe_read_text(manifest_path)
+        content = index.read_text(manifest)
         for line in content.splitlines():
             raw = line.strip().strip(",")
             if not raw:
@@ -84,9 +79,8 @@ def _detect_dependency_risks(root: Path) -> tuple[list[str], list[str]]:
                 unpinned.append(manifest)
                 break
 
-    requirements = root / "requirements.txt"
-    if requirements.exists() and requirements.is_file():
-        for line in safe_read_text(requirements).splitlines():
+    if index.has_file("requirements.txt"):
+        for line in index.read_text("requirements.txt").splitlines():
             item = line.strip()
             if not item or item.startswith("#"):
                 continue
@@ -97,21 +91,29 @@ def _detect_dependency_risks(root: Path) -> tuple[list[str], list[str]]:
     return sorted(set(missing_lockfiles)), sorted(set(unpinned))
 
 
-def collect_metrics(root: Path) -> Metrics:
-    root = root.resolve()
+def collect_metrics(
+    root: Path,
+    index: FileIndex | None = None,
+    file_scans: list[FileScan] | None = None,
+) -> Metrics:
+    if index is None:
+        index = build_file_index(root)
+    if file_scans is None:
+        file_scans = scan_files(index)
+
     ext_counter: Counter[str] = Counter()
     total = 0
     loc = 0
 
-    for info in iter_project_files(root):
+    for scan in file_scans:
         total += 1
-        ext = info.path.suffix.lower() or "<noext>"
+        ext = scan.info.path.suffix.lower() or "<noext>"
         ext_counter[ext] += 1
-        loc += count_lines(safe_read_text(info.path))
+        loc += scan.line_count
 
-    test_dirs = _detect_test_dirs(root)
-    ci_detected = _detect_ci(root)
-    missing_lockfiles, unpinned = _detect_dependency_risks(root)
+    test_dirs = _detect_test_dirs(index)
+    ci_detected = _detect_ci(index)
+    missing_lockfiles, unpinned = _detect_dependency_risks(index)
 
     return Metrics(
         total_files=total,
@@ -121,4 +123,6 @@ def collect_metrics(root: Path) -> Metrics:
         ci_detected=ci_detected,
         missing_lockfiles=missing_lockfiles,
         unpinned_dependency_files=unpinned,
+        scope="full" if index.targets is None else "changed",
+        repo_total_files=None if index.targets is None else len(index.files),
     )
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import re
+from typing import Iterable
+
+GITIGNORE_NAME = ".gitignore"
+
+
+def _translate_glob(body: str) -> str:
+    parts: list[str] = []
+    index = 0
+    length = len(body)
+
+    while index < length:
+        char = body[index]
+        if char == "*":
+            if body.startswith("**", index):
+                at_start = index == 0 or body[index - 1] == "/"
+                at_end = index + 2 == length or body[index + 2] == "/"
+                if at_start and at_end:
+                    if index + 2 == length:
+                        parts.append(".*")
+                        index += 2
+                    else:
+                        # "**/" matches zero or more leading directories.
+                        parts.append("(?:.*/)?")
+                        index += 3
+                    continue
+            parts.append("[^/]*")
+            while index < length and body[index] == "*":
+                index += 1
+            continue
+        if char == "?":
+            parts.append("[^/]")
+        elif char == "[":
+            start = index + 1
+            if start < length and body[start] in "!^":
+                start += 1
+            if start < length and body[start] == "]":
+                start += 1
+            close = body.find("]", start)
+            if close == -1:
+                parts.append(re.escape(char))
+            else:
+                inner = body[index + 1:close]
+                if inner[:1] in ("!", "^"):
+                    inner = "^" + inner[1:]
+                parts.append(f"[{inner.replace(chr(92), chr(92) * 2)}]")
+                index = close
+        elif char == "\\" and index + 1 < length:
+            index += 1
+            parts.append(re.escape(body[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+
+    return "".join(parts)
+
+
+def _compile_pattern(line: str) -> tuple[re.Pattern[str], bool, bool] | None:
+    raw = line.rstrip("\n").rstrip("\r")
+    # Trailing spaces are ignored unless escaped.
+    while raw.endswith(" ") and not raw.endswith("\\ "):
+        raw = raw[:-1]
+    if not raw or raw.startswith("#"):
+        return None
+
+    negated = raw.startswith("!")
+    if negated:
+        raw = raw[1:]
+    elif raw.startswith(("\\!", "\\#")):
+        raw = raw[1:]
+
+    dir_only = raw.endswith("/")
+    raw = raw.rstrip("/")
+    if not raw:
+        return None
+
+    anchored = "/" in raw
+    raw = raw.lstrip("/")
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(f"{prefix}{_translate_glob(raw)}"), negated, dir_only
+
+
+class IgnoreRules:
+    def __init__(self, patterns: Iterable[str], base: str = "") -> None:
+        self.base = f"{base}/" if base else ""
+        self._rules: list[tuple[re.Pattern[str], bool, bool]] = []
+        for pattern in patterns:
+            compiled = _compile_pattern(pattern)
+            if compiled is not None:
+                self._rules.append(compiled)
+
+        # Without negations the last-match-wins scan collapses into one alternation per kind.
+        self._simple = not any(negated for _, negated, _ in self._rules)
+        self._any_path: re.Pattern[str] | None = None
+        self._dir_path: re.Pattern[str] | None = None
+        if self._simple:
+            any_sources = [regex.pattern for regex, _, dir_only in self._rules if not dir_only]
+            dir_sources = [regex.pattern for regex, _, dir_only in self._rules if dir_only]
+            if any_sources:
+                self._any_path = re.compile("|".join(f"(?:{source})" for source in any_sources))
+            if dir_sources:
+                self._dir_path = re.compile("|".join(f"(?:{source})" for source in dir_sources))
+
+    def __bool__(self) -> bool:
+        return bool(self._rules)
+
+    def match(self, relative: str, is_dir: bool) -> bool | None:
+        if self.base:
+            if not relative.startswith(self.base):
+                return None
+            relative = relative[len(self.base):]
+
+        if self._simple:
+            if self._any_path is not None and self._any_path.fullmatch(relative):
+                return True
+            if is_dir and self._dir_path is not None and self._dir_path.fullmatch(relative):
+                return True
+            return None
+
+        for regex, negated, dir_only in reversed(self._rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(relative):
+                return not negated
+        return None
+
+
+def load_gitignore(text: str, base: str = "") -> IgnoreRules:
+    return IgnoreRules(text.splitlines(), base=base)
+
+
+class PathFilter:
+    def __init__(
+        self,
+        excludes: Iterable[str] = (),
+        includes: Iterable[str] = (),
+        respect_gitignore: bool = False,
+    ) -> None:
+        self.excludes = IgnoreRules(excludes)
+        self.includes = IgnoreRules(includes)
+        self.respect_gitignore = respect_gitignore
+
+    def is_excluded(self, relative: str, is_dir: bool, gitignores: tuple[IgnoreRules, ...] = ()) -> bool:
+        if self.excludes and self.excludes.match(relative, is_dir):
+            return True
+        # Deeper .gitignore files take precedence over the ones above them.
+        for rules in reversed(gitignores):
+            decision = rules.match(relative, is_dir)
+            if decision is not None:
+                return decision
+        return False
+
+    def is_included(self, relative: str) -> bool:
+        if not self.includes:
+            return True
+        if self.includes.match(relative, False):
+            return True
+        parts = relative.split("/")
+        return any(self.includes.match("/".join(parts[:depth]), True) for depth in range(1, len(parts)))
+
+    def accepts_path(self, relative: str) -> bool:
+        # For flat file lists (git mode): a file is dropped if any ancestor directory would have been pruned.
+        # Includes are not applied here; they only narrow the scan targets (FileIndex.scan_targets).
+        parts = relative.split("/")
+        for depth in range(1, len(parts)):
+            if self.is_excluded("/".join(parts[:depth]), True):
+                return False
+        return not self.is_excluded(relative, False)
@@ -3,31 +3,33 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+from .file_index import FileIndex, build_file_index
 
-def _safe_json(path: Path) -> dict:
+
+def _safe_json(text: str) -> dict:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return json.loads(text)
     except Exception:
         return {}
 
 
-def _has_any(root: Path, names: list[str]) -> list[str]:
+def _has_any(index: FileIndex, names: list[str]) -> list[str]:
     found: list[str] = []
     for name in names:
-        p = root / name
-        if p.exists():
+        if index.exists(name):
             found.append(name)
     return found
 
 
-def detect_project_profile(root: Path) -> dict[str, object]:
-    root = root.resolve()
+def detect_project_profile(root: Path, index: FileIndex | None = None) -> dict[str, object]:
+    if index is None:
+        index = build_file_index(root)
     signals: list[str] = []
 
-    package_json = root / "package.json"
-    pyproject = root / "pyproject.toml"
-    requirements = root / "requirements.txt"
-    pubspec = root / "pubspec.yaml"
+    has_package_json = index.has_file("package.json")
+    has_pyproject = index.has_file("pyproject.toml")
+    has_requirements = index.has_file("requirements.txt")
+    has_pubspec = index.exists("pubspec.yaml")
 
     profile_name = "generic"
 
@@ -40,33 +42,34 @@ def detect_project_profile(root: Path) -> dict[str, object]:
         ".github/copilot-instructions.yml",
         "COPILOT_INSTRUCTIONS.md",
     ]
-    signals.extend(_has_any(root, agent_files))
+    signals.extend(_has_any(index, agent_files))
 
-    pkg = _safe_json(package_json) if package_json.exists() else {}
+    pkg = _safe_json(index.read_text("package.json")) if has_package_json else {}
     deps = set()
     if pkg:
         signals.append("package.json")
         for block in ("dependencies", "devDependencies", "peerDependencies"):
             deps.update((pkg.get(block) or {}).keys())
 
-    if pyproject.exists():
+    if has_pyproject:
         signals.append("pyproject.toml")
-    if requirements.exists():
+    if has_requirements:
         signals.append("requirements.txt")
 
-    if pubspec.exists() or (root / "android").exists() or (root / "ios").exists():
+    if has_pubspec or index.exists("android") or index.exists("ios"):
         profile_name = "mobile"
-        if pubspec.exists():
+        if has_pubspec:
             signals.append("pubspec.yaml")
-        if (root / "android").exists():
+        if index.exists("android"):
             signals.append("android/")
-        if (root / "ios").exists():
+        if index.exists("ios"):
             signals.append("ios/")
 
-    tf_files = list(root.rglob("*.tf"))
-    k8s_files = list(root.rglob("*k8s*.yml")) + list(root.rglob("*k8s*.yaml"))
-    docker_files = list(root.rglob("Dockerfile"))
-    if profile_name == "generic" and (tf_files or k8s_files or len(docker_files) >= 2 or (root / "docker-compose.yml").exists()):
+    tf_files = index.match_name("*.tf")
+    k8s_files = index.match_name("*k8s*.yml") + index.match_name("*k8s*.yaml")
+    docker_files = index.match_name("Dockerfile")
+    has_compose = index.exists("docker-compose.yml")
+    if profile_name == "generic" and (tf_files or k8s_files or len(docker_files) >= 2 or has_compose):
         profile_name = "infra"
         if tf_files:
             signals.append("terraform")
@@ -74,7 +77,7 @@ def detect_project_profile(root: Path) -> dict[str, object]:
             signals.append("k8s manifests")
         if docker_files:
             signals.append("Dockerfile")
-        if (root / "docker-compose.yml").exists():
+        if has_compose:
             signals.append("docker-compose.yml")
 
     web_frameworks = {"vite", "next", "astro", "react", "vue", "svelte"}
@@ -82,10 +85,10 @@ def detect_project_profile(root: Path) -> dict[str, object]:
     backend_python_markers = ["fastapi", "flask", "django"]
 
     py_text = ""
-    if pyproject.exists():
-        py_text += pyproject.read_text(encoding="utf-8", errors="ignore").lower()
-    if requirements.exists():
-        py_text += "\n" + requirements.read_text(encoding="utf-8", errors="ignore").lower()
+    if has_pyproject:
+        py_text += index.read_text("pyproject.toml").lower()
+    if has_requirements:
+        py_text += "\n" + index.read_text("requirements.txt").lower()
 
     if profile_name == "generic" and deps.intersection(web_frameworks):
         profile_name = "web"
@@ -96,10 +99,10 @@ def detect_project_profile(root: Path) -> dict[str, object]:
             profile_name = "backend"
             signals.append("backend framework")
 
-    src_exists = (root / "src").exists()
-    docs_exists = (root / "docs").exists()
+    src_exists = index.exists("src")
+    docs_exists = index.exists("docs")
     entrypoints = ["main.py", "app.py", "server.py", "index.js", "main.ts", "manage.py"]
-    has_entrypoint = any((root / ep).exists() for ep in entrypoints)
+    has_entrypoint = any(index.exists(ep) for ep in entrypoints)
     if profile_name == "generic" and src_exists and docs_exists and not has_entrypoint:
         profile_name = "library"
         signals.extend(["src/", "docs/"])
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import ast
+import sys
+from typing import Any
+
+from .filesystem import decode_text
+
+# Semgrep rules from rulesets/semgrep-basic.yml that this module reproduces, by rule id
+# and the exact pattern it implements. A rule with the same id but another pattern is
+# left to semgrep.
+NATIVE_PATTERNS = {
+    "python-dangerous-eval": "eval($X)",
+    "python-shell-true": "subprocess.$F(..., shell=True, ...)",
+}
+# Stands in for the semgrep version in the cache fingerprint: what ast accepts and reports
+# depends on the interpreter, so results cached under one Python are not reused by another.
+NATIVE_CHECKS_VERSION = "native-py{}.{}".format(*sys.version_info[:2])
+
+
+def native_python_rules(config_rules: list[dict[str, Any]]) -> list[dict[str, Any]] | None:
+    # Returns the config's Python rules when every one of them has a native implementation,
+    # None otherwise (Python files then stay with semgrep).
+    python_rules = [
+        rule for rule in config_rules if "python" in [str(language).lower() for language in rule.get("languages") or []]
+    ]
+    for rule in python_rules:
+        expected = NATIVE_PATTERNS.get(str(rule.get("id")))
+        if expected is None or rule.get("patterns") != [{"pattern": expected}]:
+            return None
+    return python_rules
+
+
+def _subprocess_names(tree: ast.Module) -> tuple[set[str], set[str]]:
+    # Names bound to the subprocess module and to functions imported from it, so
+    # `import subprocess as sp` and `from subprocess import run` match like semgrep does.
+    modules = {"subprocess"}
+    functions: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == "subprocess":
+                    modules.add(alias.asname or alias.name)
+        elif isinstance(node, ast.ImportFrom) and node.module == "subprocess" and node.level == 0:
+            for alias in node.names:
+                if alias.name != "*":
+                    functions.add(alias.asname or alias.name)
+    return modules, functions
+
+
+def _is_dangerous_eval(node: ast.Call) -> bool:
+    return (
+        isinstance(node.func, ast.Name)
+        and node.func.id == "eval"
+        and len(node.args) == 1
+        and not isinstance(node.args[0], ast.Starred)
+        and not node.keywords
+    )
+
+
+def _is_shell_true(node: ast.Call, modules: set[str], functions: set[str]) -> bool:
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        if not (isinstance(func.value, ast.Name) and func.value.id in modules):
+            return False
+    elif not (isinstance(func, ast.Name) and func.id in functions):
+        return False
+    return any(
+        keyword.arg == "shell" and isinstance(keyword.value, ast.Constant) and keyword.value.value is True
+        for keyword in node.keywords
+    )
+
+
+def check_python_source(data: bytes, rule_ids: set[str]) -> list[tuple[str, int, str]]:
+    # Returns (rule_id, line, matched source lines), the fields semgrep reports for a match.
+    check_eval = "python-dangerous-eval" in rule_ids and b"eval" in data
+    check_shell = "python-shell-true" in rule_ids and b"shell" in data and b"subprocess" in data
+    if not check_eval and not check_shell:
+        # A match needs these words in the source; most files are skipped without parsing.
+        return []
+    try:
+        tree = ast.parse(data)
+    except (SyntaxError, ValueError):
+        # Semgrep skips files it cannot parse as well.
+        return []
+
+    modules, functions = _subprocess_names(tree) if check_shell else (set(), set())
+    lines: list[str] | None = None
+    matches: list[tuple[str, int, str]] = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        if check_eval and _is_dangerous_eval(node):
+            rule_id = "python-dangerous-eval"
+        elif check_shell and _is_shell_true(node, modules, functions):
+            rule_id = "python-shell-true"
+        else:
+            continue
+        if lines is None:
+            lines = decode_text(data).split("\n")
+        end = node.end_lineno or node.lineno
+        matches.append((rule_id, node.lineno, "\n".join(lines[node.lineno - 1 : end]).strip()))
+    matches.sort(key=lambda item: (item[1], item[0]))
+    return matches
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
 from pathlib import Path
+from typing import TextIO
 
 from guardian import __version__
 
 from .metrics import Metrics
-from .rules import ScanResult, max_severity
+from .rules import Finding, ScanResult, max_severity
 from .rules_engine import severity_counter
+from .timing import PhaseTimer
+
+NDJSON_FILENAME = "scan.findings.ndjson"
+_WRITE_BUFFER = 1024 * 1024
 
 
 def _score(scan_result: ScanResult) -> str:
@@ -19,6 +26,21 @@ def _score(scan_result: ScanResult) -> str:
     return "OK"
 
 
+def _finding_item(finding: Finding) -> dict[str, object]:
+    item: dict[str, object] = {
+        "id": finding.rule_id,
+        "severity": finding.severity,
+        "confidence": finding.confidence,
+        "file": finding.file_path,
+        "line": finding.line,
+        "evidence": finding.evidence,
+        "recommendation": finding.recommendation,
+    }
+    if finding.source_rule_id:
+        item["source_rule_id"] = finding.source_rule_id
+    return item
+
+
 def _json_payload(
     project_path: Path,
     metrics: Metrics,
@@ -26,24 +48,13 @@ def _json_payload(
     fail_on: str,
     expected_exit_code: int,
     project_profile: dict[str, object] | None,
+    performance: dict[str, object] | None = None,
 ) -> dict:
     summary = severity_counter(scan_result.findings)
-    findings_payload: list[dict[str, object]] = []
-    for finding in scan_result.findings:
-        item: dict[str, object] = {
-            "id": finding.rule_id,
-            "severity": finding.severity,
-            "confidence": finding.confidence,
-            "file": finding.file_path,
-            "line": finding.line,
-            "evidence": finding.evidence,
-            "recommendation": finding.recommendation,
-        }
-        if finding.source_rule_id:
-            item["source_rule_id"] = finding.source_rule_id
-        findings_payload.append(item)
-
-    return {
+    # Findings stay a lazy iterator so the writers can encode them one at a time.
+    findings_payload = (_finding_item(finding) for finding in scan_result.findings)
+
+    payload = {
         "tool": {
             "name": "ai-dev-guardian",
             "version": __version__,
@@ -73,77 +84,115 @@ def _json_payload(
         },
         "warnings": scan_result.warnings,
     }
+    if metrics.scope != "full":
+        # Only partial scans are marked, so a full scan's output stays as it was.
+        payload["metrics"]["scope"] = metrics.scope
+        payload["metrics"]["repo_total_files"] = metrics.repo_total_files
+    if performance is not None:
+        payload["performance"] = performance
+    return payload
 
 
-def _markdown_report(
+def _markdown_lines(
     project_path: Path,
     metrics: Metrics,
     scan_result: ScanResult,
     fail_on: str,
     expected_exit_code: int,
     project_profile: dict[str, object] | None,
-) -> str:
+) -> Iterator[str]:
     summary = severity_counter(scan_result.findings)
     score = _score(scan_result)
     max_found = max_severity(scan_result.findings)
     semgrep_info = scan_result.integrations.get("semgrep", {})
     profile = project_profile or {"name": "generic", "signals": []}
 
-    lines: list[str] = []
-    lines.append("# Guardian Scan Report")
-    lines.append("")
-    lines.append("## Resumen Ejecutivo")
-    lines.append(f"- Proyecto: `{project_path}`")
-    lines.append(f"- Tool: `ai-dev-guardian {__version__}`")
-    lines.append(f"- Score: **{score}**")
-    lines.append(f"- Archivos analizados: **{metrics.total_files}**")
-    lines.append(f"- LOC estimadas: **{metrics.estimated_loc}**")
-    lines.append("")
-    lines.append("## Project Profile")
-    lines.append(f"- name: `{profile.get('name', 'generic')}`")
-    lines.append(f"- signals: {profile.get('signals', [])}")
-    lines.append("")
-    lines.append("## CI Status")
-    lines.append(f"- fail_on: `{fail_on}`")
-    lines.append(f"- max_severity: `{max_found}`")
-    lines.append(f"- expected_exit_code: `{expected_exit_code}`")
-    lines.append("")
-    lines.append("## Security Summary")
-    lines.append(f"- CRITICAL: {summary['CRITICAL']}")
-    lines.append(f"- HIGH: {summary['HIGH']}")
-    lines.append(f"- MEDIUM: {summary['MEDIUM']}")
-    lines.append(f"- LOW: {summary['LOW']}")
-    lines.append("")
-    lines.append("## Semgrep")
-    lines.append(f"- enabled: {semgrep_info.get('enabled', False)}")
-    lines.append(f"- available: {semgrep_info.get('available', False)}")
-    lines.append(f"- findings_count: {semgrep_info.get('findings_count', 0)}")
-    lines.append("")
-    lines.append("## Hallazgos de Seguridad")
-    lines.append("| ID | Severidad | Confidence | Archivo | Linea | Evidencia | Recomendacion |")
-    lines.append("|---|---|---|---|---:|---|---|")
+    yield "# Guardian Scan Report"
+    yield ""
+    yield "## Resumen Ejecutivo"
+    yield f"- Proyecto: `{project_path}`"
+    yield f"- Tool: `ai-dev-guardian {__version__}`"
+    yield f"- Score: **{score}**"
+    if metrics.scope != "full":
+        yield (
+            f"- Alcance: **parcial** (solo archivos cambiados; {metrics.total_files} de "
+            f"{metrics.repo_total_files} archivos del repo)"
+        )
+    yield f"- Archivos analizados: **{metrics.total_files}**"
+    yield f"- LOC estimadas: **{metrics.estimated_loc}**"
+    yield ""
+    yield "## Project Profile"
+    yield f"- name: `{profile.get('name', 'generic')}`"
+    yield f"- signals: {profile.get('signals', [])}"
+    yield ""
+    yield "## CI Status"
+    yield f"- fail_on: `{fail_on}`"
+    yield f"- max_severity: `{max_found}`"
+    yield f"- expected_exit_code: `{expected_exit_code}`"
+    yield ""
+    yield "## Security Summary"
+    yield f"- CRITICAL: {summary['CRITICAL']}"
+    yield f"- HIGH: {summary['HIGH']}"
+    yield f"- MEDIUM: {summary['MEDIUM']}"
+    yield f"- LOW: {summary['LOW']}"
+    yield ""
+    yield "## Semgrep"
+    yield f"- enabled: {semgrep_info.get('enabled', False)}"
+    yield f"- available: {semgrep_info.get('available', False)}"
+    yield f"- findings_count: {semgrep_info.get('findings_count', 0)}"
+    yield ""
+    yield "## Hallazgos de Seguridad"
+    yield "| ID | Severidad | Confidence | Archivo | Linea | Evidencia | Recomendacion |"
+    yield "|---|---|---|---|---:|---|---|"
 
     for finding in scan_result.findings:
         line_value = "" if finding.line is None else str(finding.line)
         evidence = finding.evidence.replace("|", "\\|")
         recommendation = finding.recommendation.replace("|", "\\|")
-        lines.append(
+        yield (
             f"| {finding.rule_id} | {finding.severity} | {finding.confidence} | `{finding.file_path}` | {line_value} | {evidence} | {recommendation} |"
         )
 
-    lines.append("")
+    yield ""
     if scan_result.warnings:
-        lines.append("## Warnings")
+        yield "## Warnings"
         for warning in scan_result.warnings:
-            lines.append(f"- {warning}")
-        lines.append("")
+            yield f"- {warning}"
+        yield ""
 
-    lines.append("## Recomendaciones Prioritarias")
-    lines.append("1. Eliminar y rotar credenciales detectadas en codigo y archivos sensibles versionados.")
-    lines.append("2. Endurecer pipelines CI/CD: permisos minimos y sin ejecucion remota insegura.")
-    lines.append("3. Fijar dependencias y lockfiles para builds reproducibles.")
+    yield "## Recomendaciones Prioritarias"
+    yield "1. Eliminar y rotar credenciales detectadas en codigo y archivos sensibles versionados."
+    yield "2. Endurecer pipelines CI/CD: permisos minimos y sin ejecucion remota insegura."
+    yield "3. Fijar dependencias y lockfiles para builds reproducibles."
 
-    return "\n".join(lines) + "\n"
+
+def _write_json_value(handle: TextIO, value: object, indent: str) -> None:
+    if isinstance(value, Iterator):
+        # Streamed arrays: same layout as json.dumps(indent=2), one element in memory at a time.
+        inner = indent + "  "
+        wrote = False
+        for item in value:
+            handle.write(",\n" if wrote else "[\n")
+            handle.write(inner + json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n" + inner))
+            wrote = True
+        handle.write(f"\n{indent}]" if wrote else "[]")
+        return
+    # JSON strings never contain raw newlines, so re-indenting nested lines is safe.
+    handle.write(json.dumps(value, indent=2, ensure_ascii=False).replace("\n", "\n" + indent))
+
+
+def _write_json_stream(handle: TextIO, payload: dict[str, object]) -> None:
+    handle.write("{")
+    for position, (key, value) in enumerate(payload.items()):
+        handle.write(("\n" if position == 0 else ",\n") + "  " + json.dumps(key, ensure_ascii=False) + ": ")
+        _write_json_value(handle, value, "  ")
+    handle.write("\n}\n" if payload else "}\n")
+
+
+def _tee_ndjson(items: Iterable[dict[str, object]], handle: TextIO) -> Iterator[dict[str, object]]:
+    for item in items:
+        handle.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+        yield item
 
 
 def write_reports(
@@ -154,14 +203,31 @@ def write_reports(
     fail_on: str,
     expected_exit_code: int,
     project_profile: dict[str, object] | None = None,
+    performance: dict[str, object] | None = None,
+    timer: PhaseTimer | None = None,
+    findings_ndjson: bool = False,
 ) -> None:
+    timer = timer or PhaseTimer()
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    payload = _json_payload(path, metrics, scan_result, fail_on, expected_exit_code, project_profile)
-    (out_dir / "scan.json").write_text(
-        json.dumps(payload, indent=2, ensure_ascii=False) + "\n",
-        encoding="utf-8",
-    )
-
-    markdown = _markdown_report(path, metrics, scan_result, fail_on, expected_exit_code, project_profile)
-    (out_dir / "scan.md").write_text(markdown, encoding="utf-8")
+    # scan.md goes first so its cost is part of the timings embedded in scan.json;
+    # serialising scan.json itself is the only work left out of them.
+    with timer.phase("report"):
+        with (out_dir / "scan.md").open("w", encoding="utf-8", buffering=_WRITE_BUFFER) as handle:
+            for line in _markdown_lines(path, metrics, scan_result, fail_on, expected_exit_code, project_profile):
+                handle.write(line + "\n")
+
+    if performance is not None:
+        performance = {**performance, **timer.as_dict()}
+    payload = _json_payload(path, metrics, scan_result, fail_on, expected_exit_code, project_profile, performance)
+
+    ndjson_path = out_dir / NDJSON_FILENAME
+    with ExitStack() as stack:
+        handle = stack.enter_context((out_dir / "scan.json").open("w", encoding="utf-8", buffering=_WRITE_BUFFER))
+        if findings_ndjson:
+            sidecar = stack.enter_context(ndjson_path.open("w", encoding="utf-8", buffering=_WRITE_BUFFER))
+            payload["security_findings"] = _tee_ndjson(payload["security_findings"], sidecar)
+        _write_json_stream(handle, payload)
+    if not findings_ndjson and ndjson_path.exists():
+        # Never leave a sidecar from an older run next to a newer scan.json.
+        ndjson_path.unlink()
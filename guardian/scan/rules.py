@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import sys
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Iterable
+from operator import attrgetter
 
 
 class Severity(str, Enum):
@@ -31,11 +34,17 @@ def severity_gte(current: str, threshold: str) -> bool:
     return SEVERITY_ORDER.get(normalize_severity(current), 0) >= SEVERITY_ORDER.get(normalize_severity(threshold), 0)
 
 
+def finding_severities(findings: Iterable["Finding"]) -> Iterable[str]:
+    if isinstance(findings, FindingTable):
+        return findings.severities()
+    return (finding.severity for finding in findings)
+
+
 def max_severity(findings: Iterable["Finding"]) -> str:
     best = 0
     best_name = "NONE"
-    for finding in findings:
-        sev = normalize_severity(finding.severity)
+    for severity in finding_severities(findings):
+        sev = normalize_severity(severity)
         rank = SEVERITY_ORDER.get(sev, 0)
         if rank > best:
             best = rank
@@ -43,7 +52,7 @@ def max_severity(findings: Iterable["Finding"]) -> str:
     return best_name
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Finding:
     rule_id: str
     severity: str
@@ -55,20 +64,143 @@ class Finding:
     source_rule_id: str | None = None
 
 
+def finding_to_row(finding: Finding) -> list[object]:
+    return [
+        finding.rule_id,
+        finding.severity,
+        finding.confidence,
+        finding.file_path,
+        finding.line,
+        finding.evidence,
+        finding.recommendation,
+        finding.source_rule_id,
+    ]
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def finding_from_row(row: list) -> Finding:
+    # Rows come back from JSON or worker pickles as fresh strings; share the repeated ones.
+    return Finding(
+        rule_id=_intern(row[0]),
+        severity=_intern(row[1]),
+        confidence=_intern(row[2]),
+        file_path=_intern(row[3]),
+        line=row[4],
+        evidence=row[5],
+        recommendation=_intern(row[6]),
+        source_rule_id=_intern(row[7]),
+    )
+
+
+class FindingTable(Sequence[Finding]):
+    # Column store: rule metadata and file paths are stored once and referenced by index,
+    # evidence lives in one UTF-8 buffer. Finding objects are only built while iterating.
+    __slots__ = ("_meta", "_meta_ids", "_files", "_file_ids", "_meta_col", "_file_col", "_lines", "_evidence", "_offsets")
+
+    def __init__(self, findings: Iterable[Finding] = ()) -> None:
+        self._meta: list[tuple[str, str, str, str, str | None]] = []
+        self._meta_ids: dict[tuple[str, str, str, str, str | None], int] = {}
+        self._files: list[str] = []
+        self._file_ids: dict[str, int] = {}
+        self._meta_col = array("I")
+        self._file_col = array("I")
+        self._lines = array("q")
+        self._evidence = bytearray()
+        self._offsets = array("Q", [0])
+        for finding in findings:
+            self.append(finding)
+
+    def append(self, finding: Finding) -> None:
+        meta = (finding.rule_id, finding.severity, finding.confidence, finding.recommendation, finding.source_rule_id)
+        meta_id = self._meta_ids.get(meta)
+        if meta_id is None:
+            meta_id = self._meta_ids[meta] = len(self._meta)
+            self._meta.append(meta)
+        file_id = self._file_ids.get(finding.file_path)
+        if file_id is None:
+            file_id = self._file_ids[finding.file_path] = len(self._files)
+            self._files.append(finding.file_path)
+
+        self._meta_col.append(meta_id)
+        self._file_col.append(file_id)
+        # Line numbers are 1-based, so -1 can stand for "no line".
+        self._lines.append(-1 if finding.line is None else finding.line)
+        self._evidence += finding.evidence.encode("utf-8", "surrogatepass")
+        self._offsets.append(len(self._evidence))
+
+    def _build(self, index: int) -> Finding:
+        rule_id, severity, confidence, recommendation, source_rule_id = self._meta[self._meta_col[index]]
+        line = self._lines[index]
+        return Finding(
+            rule_id=rule_id,
+            severity=severity,
+            confidence=confidence,
+            file_path=self._files[self._file_col[index]],
+            line=None if line == -1 else line,
+            evidence=self._evidence[self._offsets[index]:self._offsets[index + 1]].decode("utf-8", "surrogatepass"),
+            recommendation=recommendation,
+            source_rule_id=source_rule_id,
+        )
+
+    def __len__(self) -> int:
+        return len(self._meta_col)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self._build(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("FindingTable index out of range")
+        return self._build(index)
+
+    def __iter__(self) -> Iterator[Finding]:
+        for index in range(len(self)):
+            yield self._build(index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(left == right for left, right in zip(self, other))
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def severities(self) -> list[str]:
+        return [self._meta[meta_id][1] for meta_id in self._meta_col]
+
+
 @dataclass(frozen=True)
 class ScanResult:
-    findings: list[Finding]
+    findings: Sequence[Finding]
     warnings: list[str]
     integrations: dict[str, dict] = field(default_factory=dict)
 
 
+def severity_rank(severity: str) -> int:
+    # Findings are normalized when produced, so the plain lookup is the common path.
+    rank = SEVERITY_ORDER.get(severity)
+    if rank is None:
+        rank = SEVERITY_ORDER.get(normalize_severity(severity), 0)
+    return rank
+
+
+def _line_key(finding: Finding) -> int:
+    return finding.line or 0
+
+
+def _rank_key(finding: Finding) -> int:
+    return -severity_rank(finding.severity)
+
+
 def sort_findings(findings: Iterable[Finding]) -> list[Finding]:
-    return sorted(
-        findings,
-        key=lambda finding: (
-            -SEVERITY_ORDER.get(normalize_severity(finding.severity), 0),
-            finding.rule_id,
-            finding.file_path,
-            finding.line or 0,
-        ),
-    )
+    # Stable sorts from the least to the most significant key give the same order as a single
+    # (rank, rule_id, file_path, line) key without building a tuple per finding.
+    ordered = list(findings)
+    ordered.sort(key=_line_key)
+    ordered.sort(key=attrgetter("file_path"))
+    ordered.sort(key=attrgetter("rule_id"))
+    ordered.sort(key=_rank_key)
+    return ordered
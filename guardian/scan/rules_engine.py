@@ -1,13 +1,28 @@
 from __future__ import annotations
 
 from collections import Counter
+from concurrent.futures import Future
+from dataclasses import replace
+from itertools import chain
 from pathlib import Path
+from typing import Iterable
 
 from .ci_checks import scan_ci_checks
+from .file_index import FileIndex, build_file_index
+from .file_scan import FileScan, scan_files
 from .metrics import Metrics
-from .rules import Finding, ScanResult, normalize_severity, sort_findings
-from .security import scan_security_findings
-from .semgrep_integration import run_semgrep_scan
+from .rules import (
+    SEVERITY_ORDER,
+    Finding,
+    FindingTable,
+    ScanResult,
+    finding_severities,
+    normalize_severity,
+    sort_findings,
+)
+from .ruleset import Ruleset
+from .semgrep_integration import SEMGREP_SHARD_TIMEOUT_S, SemgrepResult, start_semgrep_scan
+from .timing import PhaseTimer
 
 
 def _dependency_findings(metrics: Metrics) -> list[Finding]:
@@ -46,9 +61,31 @@ def run_security_scan(
     root: Path,
     metrics: Metrics | None = None,
     with_semgrep: bool = False,
+    index: FileIndex | None = None,
+    file_scans: list[FileScan] | None = None,
+    ruleset: Ruleset | None = None,
+    timer: PhaseTimer | None = None,
+    semgrep_shards: int | None = None,
+    semgrep_timeout: float = SEMGREP_SHARD_TIMEOUT_S,
+    jobs: int | None = None,
+    semgrep: Future[SemgrepResult] | None = None,
 ) -> ScanResult:
-    findings: list[Finding] = []
-    warnings: list[str] = []
+    timer = timer or PhaseTimer()
+    if index is None:
+        index = build_file_index(root)
+    if with_semgrep and semgrep is None:
+        semgrep = start_semgrep_scan(
+            root,
+            targets=index.scan_targets,
+            shards=semgrep_shards,
+            shard_timeout=semgrep_timeout,
+            jobs=jobs,
+        )
+    if file_scans is None:
+        file_scans = scan_files(index, ruleset=ruleset)
+
+    findings: list[Iterable[Finding]] = [scan.findings for scan in file_scans]
+    warnings: list[str] = list(ruleset.warnings) if ruleset is not None else []
     integrations: dict[str, dict] = {
         "semgrep": {
             "enabled": bool(with_semgrep),
@@ -57,38 +94,52 @@ def run_security_scan(
         }
     }
 
-    findings.extend(scan_security_findings(root))
-    findings.extend(scan_ci_checks(root))
+    with timer.phase("ci_checks"):
+        findings.append(scan_ci_checks(root, index=index))
 
     if metrics is not None:
-        findings.extend(_dependency_findings(metrics))
+        findings.append(_dependency_findings(metrics))
 
-    if with_semgrep:
-        semgrep_findings, semgrep_warnings, semgrep_info = run_semgrep_scan(root)
-        findings.extend(semgrep_findings)
+    if semgrep is not None:
+        # Only the wait for the background run is timed here.
+        with timer.phase("semgrep"):
+            semgrep_findings, semgrep_warnings, semgrep_info = semgrep.result()
+        findings.append(semgrep_findings)
         warnings.extend(semgrep_warnings)
         integrations["semgrep"] = semgrep_info
 
-    dedup: dict[tuple[str, str, int | None, str], Finding] = {}
+    with timer.phase("consolidate"):
+        unique = _dedup_findings(chain.from_iterable(findings), index)
+        table = FindingTable(sort_findings(unique))
+
+    return ScanResult(findings=table, warnings=warnings, integrations=integrations)
+
+
+def _dedup_findings(findings: Iterable[Finding], index: FileIndex) -> list[Finding]:
+    # Same identity (rule, file, line, evidence): the last finding wins, at the first one's position.
+    unique: list[Finding] = []
+    slots: dict[tuple[str, str, int | None, str], int] = {}
+    only_targets = index.targets is not None
+
     for finding in findings:
-        normalized = normalize_severity(finding.severity)
-        fixed = Finding(
-            rule_id=finding.rule_id,
-            severity=normalized,
-            confidence=finding.confidence,
-            file_path=finding.file_path,
-            line=finding.line,
-            evidence=finding.evidence,
-            recommendation=finding.recommendation,
-            source_rule_id=finding.source_rule_id,
-        )
-        dedup[(fixed.rule_id, fixed.file_path, fixed.line, fixed.evidence)] = fixed
+        if only_targets and not index.is_target(finding.file_path):
+            continue
+        if finding.severity not in SEVERITY_ORDER:
+            finding = replace(finding, severity=normalize_severity(finding.severity))
+
+        identity = (finding.rule_id, finding.file_path, finding.line, finding.evidence)
+        position = slots.get(identity)
+        if position is None:
+            slots[identity] = len(unique)
+            unique.append(finding)
+        else:
+            unique[position] = finding
 
-    return ScanResult(findings=sort_findings(dedup.values()), warnings=warnings, integrations=integrations)
+    return unique
 
 
-def severity_counter(findings: list[Finding]) -> dict[str, int]:
-    counts = Counter(normalize_severity(finding.severity) for finding in findings)
+def severity_counter(findings: Iterable[Finding]) -> dict[str, int]:
+    counts = Counter(normalize_severity(severity) for severity in finding_severities(findings))
     return {
         "CRITICAL": counts.get("CRITICAL", 0),
         "HIGH": counts.get("HIGH", 0),
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from dataclasses import asdict, dataclass
+from importlib import resources
+from pathlib import Path
+from typing import Iterable
+
+from .rules import SEVERITY_ORDER
+from .simple_yaml import YAMLSubsetError, safe_load
+
+RULESET_FORMAT = 1
+RULESET_SCOPES = ("secret", "ci")
+
+
+def packaged_ruleset_path(name: str) -> Path:
+    # Installed packages carry rulesets/ as guardian/rulesets package data; a source checkout
+    # (or an editable install) keeps it at the repository root.
+    packaged = Path(str(resources.files("guardian") / "rulesets" / name))
+    if packaged.is_file():
+        return packaged
+    return Path(__file__).resolve().parents[2] / "rulesets" / name
+
+
+DEFAULT_RULESET_PATH = packaged_ruleset_path("security.yml")
+_DEFAULT_CONFIDENCE = "MEDIUM"
+_DEFAULT_RECOMMENDATION = "Revisa el hallazgo y remueve el secreto o patron riesgoso."
+
+
+class RulesetError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PatternRule:
+    rule_id: str
+    pattern: str
+    severity: str
+    confidence: str
+    recommendation: str
+    anchors: tuple[str, ...]
+    ignore_case: bool
+    scope: str = "secret"
+
+
+# Used only when rulesets/security.yml cannot be found; a test keeps it equal to the YAML.
+BUILTIN_RULES: tuple[PatternRule, ...] = (
+    PatternRule("SEC-001", r"BEGIN PRIVATE KEY", "CRITICAL", "HIGH",
+                "Remueve llaves privadas y rota credenciales.", ("BEGIN PRIVATE KEY",), False),
+    PatternRule("SEC-002", r"AKIA[0-9A-Z]{16}", "CRITICAL", "HIGH",
+                "Revoca la clave AWS y usa secretos fuera del repo.", ("AKIA",), False),
+    PatternRule("SEC-003", r"ghp_[A-Za-z0-9]{20,}|github_pat_[A-Za-z0-9_]{20,}", "CRITICAL", "HIGH",
+                "Revoca token GitHub y evita hardcodear secretos.", ("ghp_", "github_pat_"), False),
+    PatternRule("SEC-004", r"xoxb-[0-9A-Za-z-]{20,}", "HIGH", "HIGH",
+                "Revoca token de Slack y usa variables seguras.", ("xoxb-",), False),
+    PatternRule("SEC-005", r"AIza[0-9A-Za-z_-]{35}", "HIGH", "HIGH",
+                "Regenera API key de Google y elimina la exposicion.", ("AIza",), False),
+    PatternRule("SEC-006",
+                r"(?i)(jwt|token|auth|authorization|bearer|secret)[^\n\r]{0,40}[:=][^\n\r]*?"
+                r"(eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,})",
+                "HIGH", "MEDIUM", "No hardcodees JWT; usa emision dinamica.", ("eyj",), True),
+    PatternRule("CI-001", r"\bpull_request_target\b", "HIGH", "HIGH",
+                "Evita pull_request_target sin controles estrictos.", ("pull_request_target",), False, "ci"),
+    PatternRule("CI-002", r"\bwrite-all\b|\bcontents:\s*write\b", "HIGH", "MEDIUM",
+                "Reduce permisos de token CI al minimo.", ("write-all", "contents"), False, "ci"),
+    PatternRule("CI-003", r"curl\s+[^\n\r]*\|\s*(bash|sh)\b", "CRITICAL", "HIGH",
+                "Evita curl|bash y valida integridad con checksum.", ("curl",), False, "ci"),
+    PatternRule("CI-004",
+                r"(?i)echo\s+[^\n\r]*\$(?:[A-Za-z_][A-Za-z0-9_]*(TOKEN|SECRET|KEY|PASSWORD|PASS|CRED)[A-Za-z0-9_]*)",
+                "MEDIUM", "MEDIUM", "No imprimas variables sensibles en logs.", ("echo",), True, "ci"),
+)
+
+
+class CompiledRule:
+    __slots__ = ("rule", "rule_id", "severity", "confidence", "recommendation", "anchors", "ignore_case", "_regex")
+
+    def __init__(self, rule: PatternRule) -> None:
+        self.rule = rule
+        self.rule_id = rule.rule_id
+        self.severity = rule.severity
+        self.confidence = rule.confidence
+        self.recommendation = rule.recommendation
+        self.ignore_case = rule.ignore_case
+        self.anchors = tuple(anchor.lower() for anchor in rule.anchors) if rule.ignore_case else rule.anchors
+        self._regex: re.Pattern[str] | None = None
+
+    @property
+    def regex(self) -> re.Pattern[str]:
+        # Compiled on first candidate line: rules whose anchors never appear cost nothing.
+        if self._regex is None:
+            self._regex = re.compile(self.rule.pattern)
+        return self._regex
+
+
+AnchorBytes = tuple[tuple[bytes, ...], tuple[bytes, ...], "re.Pattern[bytes] | None", bool]
+
+
+def _anchor_bytes(rules: Iterable[CompiledRule]) -> AnchorBytes:
+    exact: list[bytes] = []
+    folded: list[bytes] = []
+    unanchored = False
+    for rule in rules:
+        if not rule.anchors:
+            unanchored = True
+        elif rule.ignore_case:
+            folded.extend(anchor.encode("ascii") for anchor in rule.anchors)
+        else:
+            exact.extend(anchor.encode("ascii") for anchor in rule.anchors)
+    pattern = re.compile(b"|".join(re.escape(anchor) for anchor in folded), re.IGNORECASE) if folded else None
+    return tuple(exact), tuple(folded), pattern, unanchored
+
+
+class Ruleset:
+    def __init__(self, rules: Iterable[PatternRule], digest: str, warnings: list[str] | None = None) -> None:
+        self.rules = tuple(rules)
+        self.digest = digest
+        self.warnings = list(warnings or [])
+        self.secret_rules = tuple(CompiledRule(rule) for rule in self.rules if rule.scope == "secret")
+        self.ci_rules = tuple(CompiledRule(rule) for rule in self.rules if rule.scope == "ci")
+        self.all_rules = self.secret_rules + self.ci_rules
+        self.secret_anchor_bytes = _anchor_bytes(self.secret_rules)
+        self.all_anchor_bytes = _anchor_bytes(self.all_rules)
+
+    def __reduce__(self):
+        # Worker processes rebuild their own lazily compiled tables.
+        return (Ruleset, (self.rules, self.digest, self.warnings))
+
+
+def _rule_from_mapping(item: object, source: str) -> PatternRule | None:
+    if not isinstance(item, dict):
+        raise RulesetError(f"{source}: cada regla debe ser un mapa clave/valor.")
+    rule_id = item.get("id")
+    if not isinstance(rule_id, str) or not rule_id.strip():
+        raise RulesetError(f"{source}: regla sin 'id'.")
+    pattern = item.get("pattern")
+    if pattern is None:
+        # Structural rules (e.g. baseline.yml) are implemented in code, not as patterns.
+        return None
+    if not isinstance(pattern, str) or not pattern:
+        raise RulesetError(f"{source}: la regla {rule_id} tiene un 'pattern' invalido.")
+
+    severity = str(item.get("severity") or "").strip().upper()
+    if severity not in SEVERITY_ORDER:
+        raise RulesetError(f"{source}: la regla {rule_id} tiene severidad invalida: {item.get('severity')!r}")
+    confidence = str(item.get("confidence") or _DEFAULT_CONFIDENCE).strip().upper()
+    if confidence not in SEVERITY_ORDER:
+        raise RulesetError(f"{source}: la regla {rule_id} tiene confianza invalida: {item.get('confidence')!r}")
+    scope = str(item.get("scope") or "secret").strip().lower()
+    if scope not in RULESET_SCOPES:
+        raise RulesetError(f"{source}: la regla {rule_id} tiene scope invalido: {scope!r}")
+
+    anchors = item.get("anchors") or []
+    if isinstance(anchors, str):
+        anchors = [anchors]
+    if not isinstance(anchors, list) or not all(isinstance(anchor, str) and anchor for anchor in anchors):
+        raise RulesetError(f"{source}: la regla {rule_id} tiene 'anchors' invalidos.")
+    if not all(anchor.isascii() for anchor in anchors):
+        raise RulesetError(f"{source}: la regla {rule_id} solo admite anchors ASCII.")
+
+    ignore_case = item.get("ignore_case")
+    if ignore_case is None:
+        ignore_case = pattern.startswith("(?i)")
+    try:
+        re.compile(pattern)
+    except re.error as exc:
+        raise RulesetError(f"{source}: la regla {rule_id} tiene un regex invalido: {exc}") from exc
+
+    return PatternRule(
+        rule_id=rule_id.strip(),
+        pattern=pattern,
+        severity=severity,
+        confidence=confidence,
+        recommendation=str(item.get("recommendation") or _DEFAULT_RECOMMENDATION).strip(),
+        anchors=tuple(anchors),
+        ignore_case=bool(ignore_case),
+        scope=scope,
+    )
+
+
+def parse_ruleset(text: str, source: str = "<ruleset>") -> list[PatternRule]:
+    try:
+        payload = safe_load(text)
+    except YAMLSubsetError as exc:
+        raise RulesetError(f"{source}: YAML invalido: {exc}") from exc
+    if not isinstance(payload, dict) or not isinstance(payload.get("rules"), list):
+        raise RulesetError(f"{source}: se esperaba una lista 'rules'.")
+
+    rules: list[PatternRule] = []
+    for item in payload["rules"]:
+        rule = _rule_from_mapping(item, source)
+        if rule is not None:
+            rules.append(rule)
+    return rules
+
+
+def _merge(packs: Iterable[list[PatternRule]]) -> list[PatternRule]:
+    # Later packs override earlier rules with the same id, keeping the original position.
+    merged: dict[str, PatternRule] = {}
+    for rules in packs:
+        for rule in rules:
+            merged[rule.rule_id] = rule
+    return list(merged.values())
+
+
+def _cache_path(cache_dir: Path, digest: str) -> Path:
+    return cache_dir / f"rules-{digest[:32]}.json"
+
+
+def _load_cached_rules(cache_dir: Path, digest: str) -> list[PatternRule] | None:
+    try:
+        payload = json.loads(_cache_path(cache_dir, digest).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("digest") != digest:
+        return None
+    try:
+        return [
+            PatternRule(**{**item, "anchors": tuple(item["anchors"])})
+            for item in payload["rules"]
+        ]
+    except (KeyError, TypeError):
+        return None
+
+
+def _store_cached_rules(cache_dir: Path, digest: str, rules: list[PatternRule]) -> None:
+    payload = {"digest": digest, "rules": [asdict(rule) for rule in rules]}
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".rules-", suffix=".tmp", dir=str(cache_dir))
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_name, _cache_path(cache_dir, digest))
+    except OSError:
+        # The compiled-rule cache is an optimisation only.
+        pass
+
+
+_LOADED: dict[str, Ruleset] = {}
+
+
+def load_ruleset(
+    extra_packs: Iterable[Path] = (),
+    cache_dir: Path | None = None,
+    default_path: Path | None = None,
+) -> Ruleset:
+    default_path = default_path or DEFAULT_RULESET_PATH
+    warnings: list[str] = []
+    sources: list[tuple[str, str | None]] = []
+
+    try:
+        sources.append((str(default_path), default_path.read_text(encoding="utf-8")))
+    except OSError:
+        warnings.append(f"No se encontro {default_path.name}; se usan las reglas internas.")
+        sources.append(("<builtin>", None))
+    for pack in extra_packs:
+        try:
+            sources.append((str(pack), pack.read_text(encoding="utf-8")))
+        except OSError as exc:
+            raise RulesetError(f"No se pudo leer el paquete de reglas {pack}: {exc}") from exc
+
+    hasher = hashlib.sha256(f"ruleset:{RULESET_FORMAT}".encode("utf-8"))
+    for _, text in sources:
+        hasher.update(b"\0")
+        hasher.update(text.encode("utf-8") if text is not None else repr(BUILTIN_RULES).encode("utf-8"))
+    digest = hasher.hexdigest()
+
+    loaded = _LOADED.get(digest)
+    if loaded is not None:
+        return loaded
+
+    rules = _load_cached_rules(cache_dir, digest) if cache_dir is not None else None
+    if rules is None:
+        rules = _merge(
+            list(BUILTIN_RULES) if text is None else parse_ruleset(text, source)
+            for source, text in sources
+        )
+        if cache_dir is not None:
+            _store_cached_rules(cache_dir, digest, rules)
+
+    ruleset = Ruleset(rules, digest, warnings)
+    _LOADED[digest] = ruleset
+    return ruleset
+
+
+def default_ruleset() -> Ruleset:
+    return load_ruleset()
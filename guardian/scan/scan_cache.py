@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from guardian import __version__
+
+from .filesystem import FileBuffer, FileInfo
+from .rules import Finding, finding_from_row, finding_to_row
+
+CACHE_VERSION = 1
+CACHE_FILENAME = "scan-cache.json"
+DEFAULT_CACHE_DIRNAME = ".guardian-cache"
+
+# Modules whose source defines the per-file rules; editing any of them invalidates the cache.
+_RULE_MODULES = ("security.py", "ruleset.py", "masking.py", "filesystem.py")
+
+
+def content_digest(data: FileBuffer) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def rules_fingerprint(ruleset_digest: str = "") -> str:
+    # ruleset_digest covers the YAML rule packs; the module sources cover the matching code.
+    digest = hashlib.sha256(f"{__version__}:{CACHE_VERSION}:{ruleset_digest}".encode("utf-8"))
+    module_dir = Path(__file__).resolve().parent
+    for name in _RULE_MODULES:
+        try:
+            digest.update((module_dir / name).read_bytes())
+        except OSError:
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedFile:
+    __slots__ = ("size", "mtime_ns", "digest", "binary", "line_count", "findings")
+
+    def __init__(
+        self,
+        size: int,
+        mtime_ns: int,
+        digest: str,
+        binary: bool,
+        line_count: int,
+        findings: list[Finding],
+    ) -> None:
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.binary = binary
+        self.line_count = line_count
+        self.findings = findings
+
+
+class ScanCache:
+    def __init__(self, cache_dir: Path, fingerprint: str | None = None) -> None:
+        self.cache_dir = cache_dir
+        self.fingerprint = fingerprint or rules_fingerprint()
+        self._previous: dict[str, list] = {}
+        self._current: dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> Path:
+        return self.cache_dir / CACHE_FILENAME
+
+    def load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(payload, dict):
+            return
+        if payload.get("version") != CACHE_VERSION or payload.get("rules") != self.fingerprint:
+            return
+        files = payload.get("files")
+        if isinstance(files, dict):
+            self._previous = files
+
+    def _row(self, relative: str) -> list | None:
+        row = self._previous.get(relative)
+        if not isinstance(row, list) or len(row) != 6:
+            return None
+        return row
+
+    def _hit(self, relative: str, row: list) -> CachedFile | None:
+        size, mtime_ns, digest, binary, line_count, findings = row
+        try:
+            entry = CachedFile(size, mtime_ns, digest, bool(binary), line_count, [finding_from_row(item) for item in findings])
+        except (IndexError, TypeError):
+            return None
+        self._current[relative] = row
+        self.hits += 1
+        return entry
+
+    def lookup(self, info: FileInfo) -> CachedFile | None:
+        relative = info.relative_path.as_posix()
+        row = self._row(relative)
+        if row is None or row[0] != info.size_bytes or row[1] != info.mtime_ns:
+            return None
+        return self._hit(relative, row)
+
+    def known_digest(self, info: FileInfo) -> str:
+        row = self._row(info.relative_path.as_posix())
+        return str(row[2]) if row is not None else ""
+
+    def lookup_digest(self, info: FileInfo, digest: str) -> CachedFile | None:
+        relative = info.relative_path.as_posix()
+        row = self._row(relative)
+        if row is None or row[2] != digest:
+            return None
+        # Same content with a new mtime (e.g. fresh checkout): refresh metadata only.
+        return self._hit(relative, [info.size_bytes, info.mtime_ns] + row[2:])
+
+    def store(self, info: FileInfo, digest: str, binary: bool, line_count: int, findings: list[Finding]) -> None:
+        self.misses += 1
+        self._current[info.relative_path.as_posix()] = [
+            info.size_bytes,
+            info.mtime_ns,
+            digest,
+            binary,
+            line_count,
+            [finding_to_row(finding) for finding in findings],
+        ]
+
+    def save(self, keep_unvisited: bool = False) -> None:
+        files = {**self._previous, **self._current} if keep_unvisited else self._current
+        payload = {
+            "version": CACHE_VERSION,
+            "rules": self.fingerprint,
+            "files": files,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".scan-cache-", suffix=".tmp", dir=str(self.cache_dir))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_name, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
 import re
+from bisect import bisect_right
 from pathlib import Path
+from typing import Iterable
 
-from .filesystem import iter_project_files, safe_read_text
+from .filesystem import FileBuffer, decode_text
 from .masking import mask_evidence
 from .rules import Finding
+from .ruleset import CompiledRule, Ruleset, default_ruleset
+
+
+def _finding_path(rel: Path) -> str:
+    return str(rel).replace("\\", "/")
 
 
 def _new_finding(
     rule_id: str,
     severity: str,
     confidence: str,
-    rel: Path,
+    file_path: str,
     line: int | None,
     evidence: str,
     recommendation: str,
@@ -21,7 +28,7 @@ def _new_finding(
         rule_id=rule_id,
         severity=severity,
         confidence=confidence,
-        file_path=str(rel).replace("\\", "/"),
+        file_path=file_path,
         line=line,
         evidence=mask_evidence(evidence.strip()[:240]),
         recommendation=recommendation,
@@ -48,71 +55,120 @@ def _is_doc_example(line: str, rule_id: str) -> bool:
     return False
 
 
-def _scan_line_patterns(text: str, rel: Path) -> list[Finding]:
+# Same boundaries as str.splitlines, so line numbers match a per-line scan.
+_LINE_BREAK = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+def _buffer_has_anchor(buffer: FileBuffer, is_ci_file: bool, ruleset: Ruleset) -> bool:
+    exact, folded, folded_pattern, unanchored = ruleset.all_anchor_bytes if is_ci_file else ruleset.secret_anchor_bytes
+    if unanchored:
+        return True
+    if any(buffer.find(anchor) != -1 for anchor in exact):
+        return True
+    if folded_pattern is None:
+        return False
+    if isinstance(buffer, bytes):
+        # ASCII-only lowering is exact here: anchors are ASCII and no other byte folds onto them.
+        lowered = buffer.lower()
+        return any(anchor in lowered for anchor in folded)
+    return folded_pattern.search(buffer) is not None
+
+
+def _has_anchor(text: str, lowered: str, rule: CompiledRule) -> bool:
+    if not rule.anchors:
+        return True
+    haystack = lowered if rule.ignore_case else text
+    return any(anchor in haystack for anchor in rule.anchors)
+
+
+def _anchor_offsets(text: str, rules: tuple[CompiledRule, ...]) -> list[int] | None:
+    offsets: list[int] = []
+    lowered: str | None = None
+
+    for rule in rules:
+        if not rule.anchors:
+            # Unanchored rules have to look at every line.
+            return None
+        if rule.ignore_case:
+            if lowered is None:
+                lowered = text.lower()
+            if not any(anchor in lowered for anchor in rule.anchors):
+                continue
+            for anchor in rule.anchors:
+                offsets.extend(match.start() for match in re.finditer(re.escape(anchor), text, re.IGNORECASE))
+            continue
+        for anchor in rule.anchors:
+            position = text.find(anchor)
+            while position != -1:
+                offsets.append(position)
+                position = text.find(anchor, position + 1)
+
+    return offsets
+
+
+def _candidate_lines(text: str, offsets: list[int] | None) -> list[tuple[int, str]]:
+    starts = [0]
+    starts.extend(match.end() for match in _LINE_BREAK.finditer(text))
+
+    if offsets is None:
+        # A trailing line break does not open another line (str.splitlines semantics).
+        line_indexes: Iterable[int] = range(len(starts) - 1 if len(starts) > 1 and starts[-1] == len(text) else len(starts))
+    else:
+        line_indexes = sorted({bisect_right(starts, offset) - 1 for offset in offsets})
+    candidates: list[tuple[int, str]] = []
+    for line_index in line_indexes:
+        begin = starts[line_index]
+        end = starts[line_index + 1] if line_index + 1 < len(starts) else len(text)
+        line = text[begin:end]
+        if line.endswith("\r\n"):
+            line = line[:-2]
+        elif line and _LINE_BREAK.fullmatch(line[-1]):
+            line = line[:-1]
+        candidates.append((line_index + 1, line))
+    return candidates
+
+
+def _scan_line_patterns(text: str, rel: Path, ruleset: Ruleset | None = None) -> list[Finding]:
     findings: list[Finding] = []
+    if ruleset is None:
+        ruleset = default_ruleset()
+
+    is_ci_file = _is_ci_path(rel)
+    # One path string shared by every finding of this file.
+    file_path = _finding_path(rel)
+    rules = ruleset.all_rules if is_ci_file else ruleset.secret_rules
+
+    offsets = _anchor_offsets(text, rules)
+    if offsets is not None and not offsets:
+        return findings
+
+    for line_number, line in _candidate_lines(text, offsets):
+        lowered = line.lower()
 
-    secret_patterns: list[tuple[str, str, str, str, str]] = [
-        (r"BEGIN PRIVATE KEY", "SEC-001", "CRITICAL", "HIGH", "Remueve llaves privadas y rota credenciales."),
-        (r"AKIA[0-9A-Z]{16}", "SEC-002", "CRITICAL", "HIGH", "Revoca la clave AWS y usa secretos fuera del repo."),
-        (
-            r"ghp_[A-Za-z0-9]{20,}|github_pat_[A-Za-z0-9_]{20,}",
-            "SEC-003",
-            "CRITICAL",
-            "HIGH",
-            "Revoca token GitHub y evita hardcodear secretos.",
-        ),
-        (r"xoxb-[0-9A-Za-z-]{20,}", "SEC-004", "HIGH", "HIGH", "Revoca token de Slack y usa variables seguras."),
-        (r"AIza[0-9A-Za-z_-]{35}", "SEC-005", "HIGH", "HIGH", "Regenera API key de Google y elimina la exposicion."),
-        (
-            r"(?i)(jwt|token|auth|authorization|bearer|secret)[^\n\r]{0,40}[:=][^\n\r]*?(eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,})",
-            "SEC-006",
-            "HIGH",
-            "MEDIUM",
-            "No hardcodees JWT; usa emision dinamica.",
-        ),
-    ]
-
-    ci_patterns: list[tuple[str, str, str, str, str]] = [
-        (r"\bpull_request_target\b", "CI-001", "HIGH", "HIGH", "Evita pull_request_target sin controles estrictos."),
-        (r"\bwrite-all\b|\bcontents:\s*write\b", "CI-002", "HIGH", "MEDIUM", "Reduce permisos de token CI al minimo."),
-        (r"curl\s+[^\n\r]*\|\s*(bash|sh)\b", "CI-003", "CRITICAL", "HIGH", "Evita curl|bash y valida integridad con checksum."),
-        (
-            r"(?i)echo\s+[^\n\r]*\$(?:[A-Za-z_][A-Za-z0-9_]*(TOKEN|SECRET|KEY|PASSWORD|PASS|CRED)[A-Za-z0-9_]*)",
-            "CI-004",
-            "MEDIUM",
-            "MEDIUM",
-            "No imprimas variables sensibles en logs.",
-        ),
-    ]
-
-    is_ci_file = str(rel).endswith((".yml", ".yaml", ".gitlab-ci.yml"))
-
-    for line_number, line in enumerate(text.splitlines(), start=1):
         if not _looks_like_pattern_definition(line):
-            for pattern, rule_id, severity, confidence, recommendation in secret_patterns:
-                match = re.search(pattern, line)
+            for rule in ruleset.secret_rules:
+                if not _has_anchor(line, lowered, rule):
+                    continue
+                match = rule.regex.search(line)
                 if not match:
                     continue
-                if _is_doc_example(line, rule_id):
+                if _is_doc_example(line, rule.rule_id):
                     continue
 
-                evidence = line
-                if rule_id == "SEC-001":
-                    evidence = "BEGIN PRIVATE KEY"
-                elif match.lastindex:
-                    evidence = match.group(match.lastindex)
-                else:
-                    evidence = match.group(0)
-
+                evidence = match.group(match.lastindex) if match.lastindex else match.group(0)
                 findings.append(
-                    _new_finding(rule_id, severity, confidence, rel, line_number, evidence, recommendation)
+                    _new_finding(
+                        rule.rule_id, rule.severity, rule.confidence, file_path, line_number, evidence, rule.recommendation
+                    )
                 )
 
         if is_ci_file:
-            for pattern, rule_id, severity, confidence, recommendation in ci_patterns:
-                if re.search(pattern, line):
+            for rule in ruleset.ci_rules:
+                if _has_anchor(line, lowered, rule) and rule.regex.search(line):
                     findings.append(
-                        _new_finding(rule_id, severity, confidence, rel, line_number, line, recommendation)
+                        _new_finding(
+                            rule.rule_id, rule.severity, rule.confidence, file_path, line_number, line, rule.recommendation
+                        )
                     )
 
     return findings
@@ -140,23 +196,31 @@ def _scan_sensitive_files(rel: Path) -> list[Finding]:
 
     if name in sensitive_exact:
         rule_id, severity, confidence, recommendation = sensitive_exact[name]
-        findings.append(_new_finding(rule_id, severity, confidence, rel, None, str(rel), recommendation))
+        findings.append(_new_finding(rule_id, severity, confidence, _finding_path(rel), None, str(rel), recommendation))
 
     if suffix in sensitive_extensions:
         rule_id, severity, confidence, recommendation = sensitive_extensions[suffix]
-        findings.append(_new_finding(rule_id, severity, confidence, rel, None, str(rel), recommendation))
+        findings.append(_new_finding(rule_id, severity, confidence, _finding_path(rel), None, str(rel), recommendation))
 
     return findings
 
 
-def scan_security_findings(root: Path) -> list[Finding]:
-    findings: list[Finding] = []
+def _is_ci_path(rel: Path) -> bool:
+    return str(rel).endswith((".yml", ".yaml", ".gitlab-ci.yml"))
 
-    for file_info in iter_project_files(root):
-        rel = file_info.relative_path
-        findings.extend(_scan_sensitive_files(rel))
-        content = safe_read_text(file_info.path)
-        if content:
-            findings.extend(_scan_line_patterns(content, rel))
 
+def scan_file_buffer(rel: Path, buffer: FileBuffer, ruleset: Ruleset | None = None) -> list[Finding]:
+    findings = _scan_sensitive_files(rel)
+    if ruleset is None:
+        ruleset = default_ruleset()
+    if len(buffer) and _buffer_has_anchor(buffer, _is_ci_path(rel), ruleset):
+        findings.extend(_scan_line_patterns(decode_text(buffer[:]), rel, ruleset))
     return findings
+
+
+def scan_file_text(rel: Path, content: str, ruleset: Ruleset | None = None) -> list[Finding]:
+    findings = _scan_sensitive_files(rel)
+    if content:
+        findings.extend(_scan_line_patterns(content, rel, ruleset))
+    return findings
+
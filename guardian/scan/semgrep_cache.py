@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+from guardian import __version__
+
+from .filesystem import FileInfo
+from .python_checks import NATIVE_CHECKS_VERSION
+from .rules import Finding, finding_from_row, finding_to_row
+from .scan_cache import content_digest
+
+SEMGREP_CACHE_VERSION = 1
+SEMGREP_CACHE_FILENAME = "semgrep-cache.json"
+NATIVE_CACHE_FILENAME = "python-checks-cache.json"
+
+
+def _binary_stamp(semgrep_bin: str) -> list:
+    try:
+        stat = os.stat(semgrep_bin)
+    except OSError:
+        return [semgrep_bin, -1, -1]
+    return [semgrep_bin, stat.st_size, stat.st_mtime_ns]
+
+
+def _query_version(semgrep_bin: str) -> str:
+    try:
+        completed = subprocess.run([semgrep_bin, "--version"], capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    if completed.returncode != 0:
+        return ""
+    return completed.stdout.strip().splitlines()[-1].strip() if completed.stdout.strip() else ""
+
+
+def semgrep_fingerprint(config_digest: str, semgrep_version: str) -> str:
+    # The mapping code (severity, masking) shapes the stored findings as much as the rules do.
+    digest = hashlib.sha256(f"{__version__}:{SEMGREP_CACHE_VERSION}:{config_digest}:{semgrep_version}".encode("utf-8"))
+    module_dir = Path(__file__).resolve().parent
+    for name in ("semgrep_integration.py", "python_checks.py", "masking.py"):
+        try:
+            digest.update((module_dir / name).read_bytes())
+        except OSError:
+            digest.update(name.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SemgrepCache:
+    def __init__(self, cache_dir: Path, config_digest: str, filename: str = SEMGREP_CACHE_FILENAME) -> None:
+        self.cache_dir = cache_dir
+        self.config_digest = config_digest
+        self.filename = filename
+        self.fingerprint = ""
+        self.binary: list = []
+        self.version = ""
+        self._previous: dict[str, list] = {}
+        self._current: dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def path(self) -> Path:
+        return self.cache_dir / self.filename
+
+    @property
+    def enabled(self) -> bool:
+        # Without a known semgrep version an upgrade could not invalidate the entries.
+        return bool(self.version)
+
+    def load(self, semgrep_bin: str | None) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            payload = None
+        if not isinstance(payload, dict) or payload.get("version") != SEMGREP_CACHE_VERSION:
+            payload = {}
+
+        # `semgrep --version` costs a full semgrep startup; it is only asked again when the
+        # binary on PATH changed since the last run.
+        cached_version = payload.get("semgrep_version")
+        if semgrep_bin is None:
+            self.binary, self.version = [], NATIVE_CHECKS_VERSION
+        elif payload.get("binary") == _binary_stamp(semgrep_bin) and isinstance(cached_version, str) and cached_version:
+            self.binary, self.version = _binary_stamp(semgrep_bin), cached_version
+        else:
+            self.binary, self.version = _binary_stamp(semgrep_bin), _query_version(semgrep_bin)
+        if not self.enabled:
+            return
+
+        self.fingerprint = semgrep_fingerprint(self.config_digest, self.version)
+        files = payload.get("files")
+        if payload.get("rules") == self.fingerprint and isinstance(files, dict):
+            self._previous = files
+
+    def lookup(self, info: FileInfo) -> tuple[list[Finding] | None, str, bytes | None]:
+        # Returns (findings, digest, data); findings is None on a miss, digest is "" if
+        # unreadable, and data holds the contents when they had to be read for the digest.
+        if not self.enabled:
+            return None, "", None
+        relative = info.relative_path.as_posix()
+        row = self._previous.get(relative)
+        valid = isinstance(row, list) and len(row) == 4
+        data: bytes | None = None
+        if valid and row[0] == info.size_bytes and row[1] == info.mtime_ns:
+            digest = str(row[2])
+        else:
+            try:
+                data = info.path.read_bytes()
+            except OSError:
+                return None, "", None
+            digest = content_digest(data)
+        if not valid or row[2] != digest:
+            return None, digest, data
+        try:
+            findings = [finding_from_row(item) for item in row[3]]
+        except (IndexError, TypeError):
+            return None, digest, data
+        self._current[relative] = [info.size_bytes, info.mtime_ns, digest, row[3]]
+        self.hits += 1
+        return findings, digest, data
+
+    def store(self, info: FileInfo, digest: str, findings: list[Finding]) -> None:
+        self.misses += 1
+        if not digest:
+            return
+        self._current[info.relative_path.as_posix()] = [
+            info.size_bytes,
+            info.mtime_ns,
+            digest,
+            [finding_to_row(finding) for finding in findings],
+        ]
+
+    def save(self, keep_unvisited: bool = False) -> None:
+        if not self.enabled:
+            return
+        files = {**self._previous, **self._current} if keep_unvisited else self._current
+        payload = {
+            "version": SEMGREP_CACHE_VERSION,
+            "rules": self.fingerprint,
+            "binary": self.binary,
+            "semgrep_version": self.version,
+            "files": files,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".semgrep-cache-", suffix=".tmp", dir=str(self.cache_dir))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                json.dump(payload, handle, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_name, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
@@ -1,13 +1,58 @@
 from __future__ import annotations
 
-import json
+import hashlib
+import heapq
 import shutil
 import subprocess
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Iterable
 
-from .filesystem import DEFAULT_IGNORES
+from .file_scan import default_jobs
+from .filesystem import DEFAULT_IGNORES, FileInfo
+from .json_stream import iter_array_items
 from .masking import mask_evidence
 from .rules import Finding
+from .ruleset import packaged_ruleset_path
+from .python_checks import check_python_source, native_python_rules
+from .scan_cache import content_digest
+from .semgrep_cache import NATIVE_CACHE_FILENAME, SemgrepCache
+from .simple_yaml import YAMLSubsetError, safe_load
+
+SemgrepResult = tuple[list[Finding], list[str], dict[str, object]]
+
+SEMGREP_SHARD_TIMEOUT_S = 180.0
+# Past this many results a rule is noise; the rest are counted and dropped unparsed.
+SEMGREP_MAX_RESULTS_PER_RULE = 1000
+# Each semgrep process parses the rules and starts its own engine (about a second); below
+# this many files per shard an extra process costs more than it saves.
+SEMGREP_MIN_FILES_PER_SHARD = 200
+# Same default as semgrep's --max-target-bytes: larger files are usually generated or
+# minified, and parsing them costs more than their findings are worth.
+NATIVE_MAX_TARGET_BYTES = 1_000_000
+# Keeps every shard's command line far below ARG_MAX, whatever the requested shard count.
+_MAX_SHARD_ARG_CHARS = 100_000
+
+# Extensions semgrep assigns to each language; a config using any other language sends
+# every target to semgrep and lets it decide.
+_LANGUAGE_EXTENSIONS = {
+    "python": (".py", ".pyi"),
+    "javascript": (".js", ".jsx", ".mjs", ".cjs"),
+    "js": (".js", ".jsx", ".mjs", ".cjs"),
+    "typescript": (".ts", ".tsx", ".mts", ".cts"),
+    "ts": (".ts", ".tsx", ".mts", ".cts"),
+    "go": (".go",),
+    "java": (".java",),
+    "ruby": (".rb",),
+    "php": (".php",),
+    "c": (".c", ".h"),
+    "rust": (".rs",),
+    "kotlin": (".kt", ".kts"),
+    "bash": (".sh", ".bash"),
+    "yaml": (".yml", ".yaml"),
+    "json": (".json",),
+}
 
 
 def _is_direct_security_rule(rule_id: str) -> bool:
@@ -45,7 +90,264 @@ def _confidence_from_rule(rule_id: str) -> str:
     return "HIGH" if _is_direct_security_rule(rule_id) else "MEDIUM"
 
 
-def run_semgrep_scan(root: Path) -> tuple[list[Finding], list[str], dict[str, object]]:
+def _load_config_rules(config_path: Path) -> list[dict[str, Any]] | None:
+    try:
+        payload = safe_load(config_path.read_text(encoding="utf-8"))
+    except (OSError, UnicodeDecodeError, YAMLSubsetError):
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get("rules"), list):
+        return None
+    if not all(isinstance(rule, dict) for rule in payload["rules"]):
+        return None
+    return payload["rules"]
+
+
+def _config_extensions(rules: list[dict[str, Any]] | None) -> tuple[str, ...] | None:
+    if rules is None:
+        return None
+    extensions: set[str] = set()
+    for rule in rules:
+        languages = rule.get("languages")
+        if not isinstance(languages, list):
+            return None
+        for language in languages:
+            known = _LANGUAGE_EXTENSIONS.get(str(language).lower())
+            if known is None:
+                return None
+            extensions.update(known)
+    return tuple(sorted(extensions))
+
+
+def _shard_count(targets: list[FileInfo], shards: int | None, jobs: int) -> int:
+    if not targets:
+        return 0
+    count = shards if shards is not None else max(1, len(targets) // SEMGREP_MIN_FILES_PER_SHARD)
+    if shards is None:
+        count = min(count, jobs)
+    arg_chars = sum(len(str(info.path)) + 1 for info in targets)
+    count = max(count, -(-arg_chars // _MAX_SHARD_ARG_CHARS))
+    return min(count, len(targets))
+
+
+def plan_semgrep_shards(targets: list[FileInfo], count: int) -> list[list[FileInfo]]:
+    # Largest file first into the lightest shard, so shards finish at about the same time.
+    heap: list[tuple[int, int]] = [(0, index) for index in range(count)]
+    shards: list[list[FileInfo]] = [[] for _ in range(count)]
+    for info in sorted(targets, key=lambda item: (-item.size_bytes, item.relative_path.as_posix())):
+        load, index = heapq.heappop(heap)
+        shards[index].append(info)
+        heapq.heappush(heap, (load + max(1, info.size_bytes), index))
+    for shard in shards:
+        shard.sort(key=lambda item: item.relative_path.as_posix())
+    return [shard for shard in shards if shard]
+
+
+def _run_shard(
+    command: list[str],
+    timeout: float,
+    root: Path,
+    max_per_rule: int,
+    rule_ids: frozenset[str],
+) -> tuple[list[Finding] | None, str | None, dict[str, int]]:
+    # Returns (findings, reason the shard produced nothing, results dropped per rule).
+    # stdout goes to a temporary file and is parsed one result at a time, so a noisy
+    # ruleset never holds its whole output in memory.
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8", errors="replace") as output:
+        try:
+            completed = subprocess.run(command, stdout=output, stderr=subprocess.DEVNULL, timeout=timeout)
+        except OSError as exc:
+            return None, f"no pudo ejecutarse: {exc}", {}
+        except subprocess.TimeoutExpired:
+            return None, "excedio el tiempo limite", {}
+
+        if completed.returncode not in (0, 1):
+            return None, "devolvio un error", {}
+
+        output.seek(0)
+        dropped: dict[str, int] = {}
+        try:
+            findings = _read_results(iter_array_items(output, "results"), root, max_per_rule, dropped, rule_ids)
+        except ValueError:
+            return None, "devolvio salida no JSON", {}
+    return findings, None, dropped
+
+
+_SINGLE_RUN_WARNINGS = {
+    "excedio el tiempo limite": "Semgrep excedio el tiempo limite y fue omitido.",
+    "devolvio un error": "Semgrep devolvio un error y fue omitido en este scan.",
+    "devolvio salida no JSON": "Semgrep devolvio salida no JSON; no se incorporaron hallazgos.",
+}
+
+
+def _shard_warning(reason: str, position: int, total: int, timeout: float) -> str:
+    if total == 1:
+        return _SINGLE_RUN_WARNINGS.get(reason, f"Semgrep {reason}")
+    if reason == "excedio el tiempo limite":
+        reason = f"{reason} ({timeout:g}s)"
+    return f"Semgrep shard {position}/{total} {reason}; se conservan los hallazgos de los demas shards."
+
+
+def _build_finding(
+    source_rule_id: str,
+    raw_severity: str | None,
+    file_path: str,
+    line: int | None,
+    lines: str,
+    message: str,
+    fix: str,
+) -> Finding:
+    evidence_raw = lines if lines else message
+    return Finding(
+        rule_id=f"SG-{source_rule_id}",
+        severity=_map_semgrep_severity(raw_severity, source_rule_id),
+        confidence=_confidence_from_rule(source_rule_id),
+        file_path=file_path,
+        line=line,
+        evidence=mask_evidence(evidence_raw)[:240],
+        recommendation=fix or "Revisar y corregir el patron detectado por semgrep.",
+        source_rule_id=source_rule_id,
+    )
+
+
+def _normalize_check_id(check_id: str, rule_ids: frozenset[str]) -> str:
+    # Semgrep prefixes check_id with the config file's directory as a dotted path
+    # ("rulesets.python-dangerous-eval", or the whole absolute path), which depends on where
+    # guardian is installed; findings use the rule id from the config, like the native checks.
+    if check_id in rule_ids:
+        return check_id
+    matches = [rule_id for rule_id in rule_ids if check_id.endswith(f".{rule_id}")]
+    return max(matches, key=len) if matches else check_id
+
+
+def _finding_from_result(item: dict[str, Any], source_rule_id: str, resolved_root: Path) -> Finding:
+    extra = item.get("extra", {}) or {}
+    start = item.get("start", {}) or {}
+    semgrep_path = Path(str(item.get("path") or ""))
+    try:
+        file_path = str(semgrep_path.resolve().relative_to(resolved_root)).replace("\\", "/")
+    except Exception:
+        file_path = str(semgrep_path).replace("\\", "/")
+
+    return _build_finding(
+        source_rule_id,
+        extra.get("severity"),
+        file_path,
+        int(start["line"]) if isinstance(start.get("line"), int) else None,
+        str(extra.get("lines") or "").strip(),
+        str(extra.get("message") or "Semgrep finding"),
+        str(extra.get("fix") or ""),
+    )
+
+
+def _run_native_checks(
+    targets: list[FileInfo],
+    rules: list[dict[str, Any]],
+    cache: SemgrepCache | None,
+) -> list[Finding]:
+    rule_ids = {str(rule["id"]) for rule in rules}
+    by_id = {str(rule["id"]): rule for rule in rules}
+    # Identical files (vendored copies, generated stubs) are parsed once per content hash.
+    parsed: dict[str, list[tuple[str, int, str]]] = {}
+    findings: list[Finding] = []
+    for item in targets:
+        cached, digest, data = cache.lookup(item) if cache is not None else (None, "", None)
+        if cached is not None:
+            findings.extend(cached)
+            continue
+        if data is None:
+            # No cache, or a stat match on an unusable entry: the cache did not read the file.
+            try:
+                data = item.path.read_bytes()
+            except OSError:
+                continue
+        digest = digest or content_digest(data)
+        matches = parsed.get(digest)
+        if matches is None:
+            matches = check_python_source(data, rule_ids)
+            parsed[digest] = matches
+        relative = item.relative_path.as_posix()
+        file_findings = [
+            _build_finding(
+                rule_id,
+                by_id[rule_id].get("severity"),
+                relative,
+                line,
+                lines,
+                str(by_id[rule_id].get("message") or "Semgrep finding"),
+                str(by_id[rule_id].get("fix") or ""),
+            )
+            for rule_id, line, lines in matches
+        ]
+        if cache is not None:
+            cache.store(item, digest, file_findings)
+        findings.extend(file_findings)
+    return findings
+
+
+def _read_results(
+    results: Iterable[Any],
+    root: Path,
+    max_per_rule: int,
+    dropped: dict[str, int],
+    rule_ids: frozenset[str],
+) -> list[Finding]:
+    findings: list[Finding] = []
+    kept: dict[str, int] = {}
+    resolved_root = root.resolve()
+    for index, item in enumerate(results, start=1):
+        if not isinstance(item, dict):
+            continue
+        source_rule_id = _normalize_check_id(str(item.get("check_id") or f"anonymous-{index:03d}"), rule_ids)
+        if kept.get(source_rule_id, 0) >= max_per_rule:
+            # Counted, never mapped: the raw result is released right away.
+            dropped[source_rule_id] = dropped.get(source_rule_id, 0) + 1
+            continue
+        kept[source_rule_id] = kept.get(source_rule_id, 0) + 1
+        findings.append(_finding_from_result(item, source_rule_id, resolved_root))
+    return findings
+
+
+def _cap_per_rule(findings: list[Finding], max_per_rule: int, dropped: dict[str, int]) -> list[Finding]:
+    # Each shard is capped on its own; this applies the same cap to the merged list.
+    kept: dict[str, int] = {}
+    capped: list[Finding] = []
+    for finding in findings:
+        source_rule_id = finding.source_rule_id or finding.rule_id
+        if kept.get(source_rule_id, 0) >= max_per_rule:
+            dropped[source_rule_id] = dropped.get(source_rule_id, 0) + 1
+            continue
+        kept[source_rule_id] = kept.get(source_rule_id, 0) + 1
+        capped.append(finding)
+    return capped
+
+
+def _save_cache(cache: SemgrepCache | None, keep_unvisited: bool, warnings: list[str]) -> None:
+    if cache is None or not cache.enabled:
+        return
+    try:
+        cache.save(keep_unvisited=keep_unvisited)
+    except OSError as exc:
+        warnings.append(f"No se pudo guardar la cache de semgrep en {cache.cache_dir}: {exc}")
+
+
+def run_semgrep_scan(
+    root: Path,
+    targets: list[FileInfo] | None = None,
+    shards: int | None = None,
+    shard_timeout: float = SEMGREP_SHARD_TIMEOUT_S,
+    jobs: int | None = None,
+    cache_dir: Path | None = None,
+    keep_unvisited: bool = False,
+    max_results_per_rule: int = SEMGREP_MAX_RESULTS_PER_RULE,
+    native_python: bool = True,
+) -> SemgrepResult:
+    if shards is not None and shards <= 0:
+        raise ValueError("--semgrep-shards debe ser mayor a 0")
+    if shard_timeout <= 0:
+        raise ValueError("--semgrep-timeout debe ser mayor a 0")
+    if max_results_per_rule <= 0:
+        raise ValueError("--semgrep-max-per-rule debe ser mayor a 0")
+
     info: dict[str, object] = {
         "enabled": True,
         "available": False,
@@ -54,83 +356,167 @@ def run_semgrep_scan(root: Path) -> tuple[list[Finding], list[str], dict[str, ob
     warnings: list[str] = []
     findings: list[Finding] = []
 
+    config_path = packaged_ruleset_path("semgrep-basic.yml")
+    config_rules = _load_config_rules(config_path)
+    rule_ids = frozenset(str(rule["id"]) for rule in config_rules or [] if rule.get("id"))
+
+    # Python rules with a native implementation run in-process on guardian's own file list;
+    # Python files then never reach semgrep.
+    native_rules: list[dict[str, Any]] | None = None
+    if native_python and targets is not None and config_rules is not None:
+        native_rules = native_python_rules(config_rules) or None
+    python_extensions = _LANGUAGE_EXTENSIONS["python"]
+
     semgrep_bin = shutil.which("semgrep")
-    if not semgrep_bin:
+    if not semgrep_bin and native_rules is None:
         warnings.append("Semgrep no esta instalado; se omite integracion --with-semgrep.")
         return findings, warnings, info
+    if not semgrep_bin:
+        warnings.append("Semgrep no esta instalado; solo se ejecutan los checks nativos de Python.")
+    else:
+        info["available"] = True
+        if not config_path.exists():
+            warnings.append("No se encontro rulesets/semgrep-basic.yml; se omite integracion semgrep.")
+            return findings, warnings, info
 
-    info["available"] = True
+    config_digest = hashlib.sha256(config_path.read_bytes()).hexdigest() if cache_dir is not None else ""
+    jobs = jobs or default_jobs()
+    cache: SemgrepCache | None = None
+    planned: list[list[FileInfo]] = []
+    digests: dict[str, str] = {}
+    commands: list[list[str]] = []
+    if semgrep_bin:
+        command = [
+            semgrep_bin,
+            "--config",
+            str(config_path),
+            "--json",
+            "--quiet",
+            "--disable-version-check",
+        ]
+        for ignored in sorted(DEFAULT_IGNORES):
+            command.extend(["--exclude", ignored])
 
-    tool_root = Path(__file__).resolve().parents[2]
-    config_path = tool_root / "rulesets" / "semgrep-basic.yml"
-    if not config_path.exists():
-        warnings.append("No se encontro rulesets/semgrep-basic.yml; se omite integracion semgrep.")
-        return findings, warnings, info
+        if targets is None:
+            # No file list from guardian: semgrep walks the root itself in a single run.
+            commands = [command + [str(root)]]
+        else:
+            if native_rules is not None:
+                semgrep_rules = [rule for rule in config_rules or [] if rule not in native_rules]
+                extensions = _config_extensions(semgrep_rules)
+                selected = [item for item in targets if item.path.suffix.lower() not in python_extensions]
+            else:
+                extensions = _config_extensions(config_rules)
+                selected = list(targets)
+            selected = [item for item in selected if extensions is None or item.path.suffix.lower() in extensions]
+            info["targets"] = len(selected)
+            if cache_dir is not None and selected:
+                cache = SemgrepCache(cache_dir, config_digest=config_digest)
+                cache.load(semgrep_bin)
 
-    command = [
-        semgrep_bin,
-        "--config",
-        str(config_path),
-        "--json",
-        "--quiet",
-        "--disable-version-check",
-    ]
-    for ignored in sorted(DEFAULT_IGNORES):
-        command.extend(["--exclude", ignored])
-    command.append(str(root))
+            pending: list[FileInfo] = []
+            for item in selected:
+                cached, digest, _ = cache.lookup(item) if cache is not None else (None, "", None)
+                if cached is not None:
+                    findings.extend(cached)
+                    continue
+                pending.append(item)
+                digests[item.relative_path.as_posix()] = digest
 
-    try:
-        completed = subprocess.run(command, capture_output=True, text=True, timeout=180)
-    except OSError as exc:
-        warnings.append(f"Semgrep no pudo ejecutarse: {exc}")
-        return findings, warnings, info
-    except subprocess.TimeoutExpired:
-        warnings.append("Semgrep excedio el tiempo limite y fue omitido.")
-        return findings, warnings, info
+            planned = plan_semgrep_shards(pending, _shard_count(pending, shards, jobs))
+            # Shards already run side by side; semgrep's own workers split what is left.
+            per_shard_jobs = str(max(1, jobs // max(1, len(planned))))
+            commands = [command + ["--jobs", per_shard_jobs] + [str(item.path) for item in shard] for shard in planned]
+            info["shards"] = len(commands)
 
-    if completed.returncode not in (0, 1):
-        warnings.append("Semgrep devolvio un error y fue omitido en este scan.")
-        return findings, warnings, info
-
-    payload_text = completed.stdout.strip()
-    if not payload_text:
-        info["findings_count"] = 0
-        return findings, warnings, info
+    with ThreadPoolExecutor(max_workers=max(1, min(len(commands), jobs))) as executor:
+        futures = [
+            executor.submit(_run_shard, shard, shard_timeout, root, max_results_per_rule, rule_ids)
+            for shard in commands
+        ]
+        if native_rules is not None and targets is not None:
+            # Runs while the semgrep shards are busy in their own processes.
+            python_targets = [item for item in targets if item.path.suffix.lower() in python_extensions]
+            native_targets = [item for item in python_targets if item.size_bytes <= NATIVE_MAX_TARGET_BYTES]
+            native_cache: SemgrepCache | None = None
+            if cache_dir is not None and native_targets:
+                native_cache = SemgrepCache(cache_dir, config_digest=config_digest, filename=NATIVE_CACHE_FILENAME)
+                native_cache.load(None)
+            native_findings = _run_native_checks(native_targets, native_rules, native_cache)
+            findings.extend(native_findings)
+            info["native_python"] = {
+                "files": len(native_targets),
+                "skipped_large": len(python_targets) - len(native_targets),
+                "findings_count": len(native_findings),
+            }
+            _save_cache(native_cache, keep_unvisited, warnings)
+        outcomes = [future.result() for future in futures]
 
-    try:
-        payload = json.loads(payload_text)
-    except json.JSONDecodeError:
-        warnings.append("Semgrep devolvio salida no JSON; no se incorporaron hallazgos.")
-        return findings, warnings, info
+    failed = 0
+    dropped: dict[str, int] = {}
+    for position, (shard_findings, reason, shard_dropped) in enumerate(outcomes, start=1):
+        if reason is not None or shard_findings is None:
+            failed += 1
+            warnings.append(_shard_warning(reason or "", position, len(outcomes), shard_timeout))
+            continue
+        findings.extend(shard_findings)
+        for source_rule_id, count in shard_dropped.items():
+            dropped[source_rule_id] = dropped.get(source_rule_id, 0) + count
+        if cache is not None and not shard_dropped:
+            # Files of a failed or truncated shard are left out, so the next run retries them.
+            by_file: dict[str, list[Finding]] = {}
+            for finding in shard_findings:
+                by_file.setdefault(finding.file_path, []).append(finding)
+            for item in planned[position - 1]:
+                relative = item.relative_path.as_posix()
+                cache.store(item, digests[relative], by_file.get(relative, []))
+    if semgrep_bin and targets is not None:
+        info["failed_shards"] = failed
 
-    for index, item in enumerate(payload.get("results", []), start=1):
-        source_rule_id = str(item.get("check_id") or f"anonymous-{index:03d}")
-        extra = item.get("extra", {}) or {}
-        start = item.get("start", {}) or {}
-        semgrep_path = Path(str(item.get("path") or ""))
-        try:
-            file_path = str(semgrep_path.resolve().relative_to(root.resolve())).replace("\\", "/")
-        except Exception:
-            file_path = str(semgrep_path).replace("\\", "/")
-
-        rule_id = f"SG-{source_rule_id}"
-        message = str(extra.get("message") or "Semgrep finding")
-        lines = str(extra.get("lines") or "").strip()
-        evidence_raw = lines if lines else message
-        recommendation = str(extra.get("fix") or "Revisar y corregir el patron detectado por semgrep.")
-
-        findings.append(
-            Finding(
-                rule_id=rule_id,
-                severity=_map_semgrep_severity(extra.get("severity"), source_rule_id),
-                confidence=_confidence_from_rule(source_rule_id),
-                file_path=file_path,
-                line=int(start["line"]) if isinstance(start.get("line"), int) else None,
-                evidence=mask_evidence(evidence_raw)[:240],
-                recommendation=recommendation,
-                source_rule_id=source_rule_id,
-            )
+    findings = _cap_per_rule(findings, max_results_per_rule, dropped)
+    for source_rule_id in sorted(dropped):
+        warnings.append(
+            f"Semgrep: {dropped[source_rule_id]} resultados de {source_rule_id} superaron el limite de "
+            f"{max_results_per_rule} por regla y se omitieron."
         )
+    if dropped:
+        info["truncated_results"] = sum(dropped.values())
+
+    if cache is not None and cache.enabled:
+        info["cache_hits"] = cache.hits
+        info["cache_misses"] = cache.misses
+    _save_cache(cache, keep_unvisited, warnings)
 
     info["findings_count"] = len(findings)
     return findings, warnings, info
+
+
+def start_semgrep_scan(
+    root: Path,
+    targets: list[FileInfo] | None = None,
+    shards: int | None = None,
+    shard_timeout: float = SEMGREP_SHARD_TIMEOUT_S,
+    jobs: int | None = None,
+    cache_dir: Path | None = None,
+    keep_unvisited: bool = False,
+    max_results_per_rule: int = SEMGREP_MAX_RESULTS_PER_RULE,
+    native_python: bool = True,
+) -> Future[SemgrepResult]:
+    # Semgrep does its work in child processes; this thread only waits on them, so the
+    # caller's own scanning overlaps with it until Future.result() at consolidation.
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="semgrep")
+    try:
+        return executor.submit(
+            run_semgrep_scan,
+            root,
+            targets=targets,
+            shards=shards,
+            shard_timeout=shard_timeout,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            keep_unvisited=keep_unvisited,
+            max_results_per_rule=max_results_per_rule,
+            native_python=native_python,
+        )
+    finally:
+        executor.shutdown(wait=False)
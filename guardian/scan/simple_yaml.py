@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+try:  # Optional: PyYAML handles the full YAML spec when installed.
+    import yaml as _yaml
+except ImportError:  # pragma: no cover - depends on environment
+    _yaml = None
+
+
+class YAMLSubsetError(ValueError):
+    pass
+
+
+# Plain scalars PyYAML resolves to numbers (YAML 1.1 decimal, octal and float forms).
+_INT = re.compile(r"[-+]?(?:0|[1-9][0-9_]*)")
+_OCTAL = re.compile(r"[-+]?0[0-7_]+")
+_FLOAT = re.compile(r"[-+]?(?:[0-9][0-9_]*\.[0-9_]*|\.[0-9_]+)(?:[eE][-+][0-9]+)?")
+_ESCAPE = re.compile(r"\\(?:x[0-9A-Fa-f]{2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)", re.DOTALL)
+_SIMPLE_ESCAPES = {
+    "0": "\0",
+    "a": "\a",
+    "b": "\b",
+    "t": "\t",
+    "\t": "\t",
+    "n": "\n",
+    "v": "\v",
+    "f": "\f",
+    "r": "\r",
+    "e": "\x1b",
+    " ": " ",
+    '"': '"',
+    "/": "/",
+    "\\": "\\",
+    "N": "\x85",
+    "_": "\xa0",
+    "L": "\u2028",
+    "P": "\u2029",
+}
+
+
+def _unescape(body: str) -> str:
+    # Decodes the escapes YAML defines for double-quoted strings on the text itself, so
+    # non-ASCII characters pass through untouched.
+    def replace(match: re.Match[str]) -> str:
+        code = match.group()[1:]
+        if len(code) > 1:
+            return chr(int(code[1:], 16))
+        if code not in _SIMPLE_ESCAPES:
+            raise YAMLSubsetError(f"Escape YAML invalido: \\{code}")
+        return _SIMPLE_ESCAPES[code]
+
+    return _ESCAPE.sub(replace, body)
+
+
+def _strip_comment(line: str) -> str:
+    quote: str | None = None
+    for index, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"') and (index == 0 or line[index - 1] in " \t:[,-"):
+            quote = char
+        elif char == "#" and (index == 0 or line[index - 1] in " \t"):
+            return line[:index].rstrip()
+    return line.rstrip()
+
+
+def _split_flow(body: str) -> list[str]:
+    items: list[str] = []
+    current: list[str] = []
+    quote: str | None = None
+    for char in body:
+        if quote:
+            current.append(char)
+            if char == quote:
+                quote = None
+            continue
+        if char in ("'", '"'):
+            quote = char
+            current.append(char)
+        elif char == ",":
+            items.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        items.append("".join(current))
+    return items
+
+
+def _scalar(raw: str) -> Any:
+    value = raw.strip()
+    if not value:
+        return None
+    if value.startswith("'") and value.endswith("'") and len(value) >= 2:
+        return value[1:-1].replace("''", "'")
+    if value.startswith('"') and value.endswith('"') and len(value) >= 2:
+        return _unescape(value[1:-1])
+    if value.startswith("[") and value.endswith("]"):
+        return [_scalar(item) for item in _split_flow(value[1:-1])]
+    lowered = value.lower()
+    if lowered in ("true", "yes", "on"):
+        return True
+    if lowered in ("false", "no", "off"):
+        return False
+    if lowered in ("null", "~"):
+        return None
+    if _INT.fullmatch(value):
+        return int(value.replace("_", ""))
+    if _OCTAL.fullmatch(value):
+        return int(value.replace("_", ""), 8)
+    if _FLOAT.fullmatch(value):
+        try:
+            return float(value.replace("_", ""))
+        except ValueError:
+            return value
+    return value
+
+
+def _split_key(text: str, line_number: int) -> tuple[str, str]:
+    key, separator, rest = text.partition(":")
+    if not separator or (rest and not rest.startswith((" ", "\t"))):
+        raise YAMLSubsetError(f"Linea {line_number}: se esperaba 'clave: valor'")
+    return _scalar(key), rest.strip()
+
+
+class _Parser:
+    def __init__(self, text: str) -> None:
+        self.lines: list[tuple[int, int, str]] = []
+        for number, raw in enumerate(text.splitlines(), start=1):
+            stripped = _strip_comment(raw)
+            if not stripped.strip() or stripped.strip() in ("---", "..."):
+                continue
+            if "\t" in stripped[: len(stripped) - len(stripped.lstrip())]:
+                raise YAMLSubsetError(f"Linea {number}: usa espacios para indentar, no tabs")
+            indent = len(stripped) - len(stripped.lstrip(" "))
+            self.lines.append((number, indent, stripped.strip()))
+        self.position = 0
+
+    def parse(self) -> Any:
+        if not self.lines:
+            return None
+        value = self._block(self.lines[0][1])
+        if self.position < len(self.lines):
+            raise YAMLSubsetError(f"Linea {self.lines[self.position][0]}: indentacion inesperada")
+        return value
+
+    def _block(self, indent: int) -> Any:
+        _, line_indent, text = self.lines[self.position]
+        if line_indent == indent and (text == "-" or text.startswith("- ")):
+            return self._sequence(indent)
+        return self._mapping(indent)
+
+    def _nested(self, parent_indent: int) -> Any:
+        if self.position < len(self.lines) and self.lines[self.position][1] > parent_indent:
+            return self._block(self.lines[self.position][1])
+        return None
+
+    def _sequence(self, indent: int) -> list[Any]:
+        items: list[Any] = []
+        while self.position < len(self.lines):
+            number, line_indent, text = self.lines[self.position]
+            if line_indent != indent or not (text == "-" or text.startswith("- ")):
+                break
+            content = text[1:].strip()
+            if not content:
+                self.position += 1
+                items.append(self._nested(indent))
+                continue
+            if ":" in content and not content.startswith(("'", '"', "[")) and _looks_like_key(content):
+                # "- key: value" opens a mapping whose other keys align with "key".
+                self.lines[self.position] = (number, indent + 2, content)
+                items.append(self._mapping(indent + 2))
+                continue
+            self.position += 1
+            items.append(_scalar(content))
+        return items
+
+    def _mapping(self, indent: int) -> dict[str, Any]:
+        mapping: dict[str, Any] = {}
+        while self.position < len(self.lines):
+            number, line_indent, text = self.lines[self.position]
+            if line_indent < indent:
+                break
+            if line_indent > indent:
+                raise YAMLSubsetError(f"Linea {number}: indentacion inesperada")
+            if text.startswith("- "):
+                break
+            key, rest = _split_key(text, number)
+            self.position += 1
+            if rest:
+                mapping[key] = _scalar(rest)
+            elif self.position < len(self.lines) and self.lines[self.position][1] == indent and self.lines[self.position][2].startswith("- "):
+                # Block sequences may sit at the same indentation as their key.
+                mapping[key] = self._sequence(indent)
+            else:
+                mapping[key] = self._nested(indent)
+        return mapping
+
+
+def _looks_like_key(content: str) -> bool:
+    key, _, rest = content.partition(":")
+    return bool(key.strip()) and (not rest or rest.startswith((" ", "\t")))
+
+
+def safe_load(text: str) -> Any:
+    if _yaml is not None:
+        try:
+            return _yaml.safe_load(text)
+        except _yaml.YAMLError as exc:
+            raise YAMLSubsetError(str(exc)) from exc
+    return _Parser(text).parse()
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def _cpu_seconds() -> float:
+    # Children only count once reaped, which happens when a worker pool shuts down inside the phase.
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
+
+
+class PhaseTimer:
+    def __init__(self) -> None:
+        self.phases: dict[str, dict[str, float]] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall_start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        try:
+            yield
+        finally:
+            # Repeated phases accumulate.
+            record = self.phases.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0})
+            record["wall_s"] += time.perf_counter() - wall_start
+            record["cpu_s"] += _cpu_seconds() - cpu_start
+
+    @property
+    def total_wall_s(self) -> float:
+        return sum(record["wall_s"] for record in self.phases.values())
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "phases": {
+                name: {"wall_s": round(record["wall_s"], 6), "cpu_s": round(record["cpu_s"], 6)}
+                for name, record in self.phases.items()
+            },
+            "total_wall_s": round(self.total_wall_s, 6),
+            "total_cpu_s": round(sum(record["cpu_s"] for record in self.phases.values()), 6),
+        }
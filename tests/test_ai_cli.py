@@ -1,14 +1,24 @@
 from __future__ import annotations
 
 import json
+import os
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from unittest.mock import patch
 
-from guardian.ai.provider import AIProviderResponse
+from guardian.ai.formatter import StreamingMarkdownWriter, group_findings
+from guardian.bench.ai_bench import run_ai_benchmark
+from guardian.bench.fake_ollama import FakeOllamaConfig
+from guardian.ai.ollama_provider import OllamaProvider
+from guardian.ai.prompts import approx_tokens, build_ai_prompt, build_reduce_prompt
+from guardian.ai.provider import AIProviderError, AIProviderRequest, AIProviderResponse
+from guardian.ai.response_cache import ResponseCache
 from guardian.cli import run_ai
 
 
@@ -34,7 +44,87 @@ class _CapturingProvider:
         )
 
 
+class _ConcurrentProvider:
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate(self, request):
+        with self._lock:
+            self.prompts.append(request.prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self._lock:
+            self.in_flight -= 1
+            part = len(self.prompts)
+        return AIProviderResponse(text=f"## Quick wins\n- Accion parcial {part}\n")
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 with chunked streaming, like Ollama, so clients can keep connections alive.
+    protocol_version = "HTTP/1.1"
+    chunks: list[dict] = []
+    requests: list[dict] = []
+    clients: list[tuple] = []
+    failures: int = 0
+
+    def _send(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        request = json.loads(body)
+        handler = type(self)
+        handler.requests.append(request)
+        handler.clients.append(self.client_address)
+
+        if handler.failures > 0:
+            handler.failures -= 1
+            self._send(503, b'{"error": "server busy"}')
+            return
+        if not request.get("stream"):
+            text = "".join(chunk.get("response", "") for chunk in self.chunks)
+            self._send(200, json.dumps({"response": text, "done": True}).encode("utf-8"))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in self.chunks:
+            line = json.dumps(chunk).encode("utf-8") + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
 class AICliTests(unittest.TestCase):
+    def _start_fake_ollama(self, chunks: list[dict], failures: int = 0) -> str:
+        handler = type(
+            "Handler",
+            (_FakeOllamaHandler,),
+            {"chunks": chunks, "requests": [], "clients": [], "failures": failures},
+        )
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.fake_handler = handler
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+
     def _build_scan_payload(self, profile_name: str = "generic") -> dict:
         return {
             "tool": {"name": "ai-dev-guardian", "version": "0.2.2"},
@@ -159,7 +249,8 @@ class AICliTests(unittest.TestCase):
                 with patch("guardian.cli._select_provider", return_value=provider):
                     run_ai(scan=scan_path, out=out_path, provider="ollama", model="llama3.1:8b", max_findings=25)
 
-                prompt = provider.last_request.prompt.lower()
+                request = provider.last_request
+                prompt = f"{request.system}\n{request.prompt}".lower()
                 self.assertNotIn("qa", prompt)
                 self.assertNotIn("apex", prompt)
 
@@ -181,6 +272,309 @@ class AICliTests(unittest.TestCase):
             self.assertIn("ci_hardening", ai_payload)
             self.assertIn("manual_checks", ai_payload)
 
+    def test_ai_streams_ollama_tokens_into_outputs(self) -> None:
+        chunks = [{"response": piece, "done": False} for piece in ("## Quick wins\n", "- Rotar ", "credenciales\n")]
+        chunks.append({"response": "", "done": True, "eval_count": 3, "eval_duration": 1_500_000_000})
+        base_url = self._start_fake_ollama(chunks)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+            scan_path.write_text(json.dumps(self._build_scan_payload()), encoding="utf-8")
+
+            exit_code = run_ai(scan=scan_path, out=out_path, model="llama3.1:8b", base_url=base_url)
+
+            self.assertEqual(exit_code, 0)
+            self.assertTrue(self.fake_handler.requests[0]["stream"])
+            self.assertIn("- Rotar credenciales", out_path.read_text(encoding="utf-8"))
+
+            ai_payload = json.loads(out_path.with_suffix(".json").read_text(encoding="utf-8"))
+            self.assertEqual(ai_payload["quick_wins"], ["Rotar credenciales"])
+            performance = ai_payload["performance"]
+            self.assertTrue(performance["stream"])
+            self.assertEqual(performance["eval_count"], 3)
+            self.assertEqual(performance["tokens_per_second"], 2.0)
+            self.assertGreaterEqual(performance["time_to_first_token_s"], 0)
+
+    def test_ai_stream_error_keeps_partial_markdown(self) -> None:
+        base_url = self._start_fake_ollama(
+            [{"response": "Analisis parcial\n", "done": False}, {"error": "model ran out of memory"}]
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+            scan_path.write_text(json.dumps(self._build_scan_payload()), encoding="utf-8")
+
+            with self.assertRaises(AIProviderError):
+                run_ai(scan=scan_path, out=out_path, base_url=base_url)
+
+            content = out_path.read_text(encoding="utf-8")
+            self.assertIn("# AI Analysis Report", content)
+            self.assertIn("Analisis parcial", content)
+            self.assertIn("Generacion interrumpida", content)
+            self.assertFalse(out_path.with_suffix(".json").exists())
+
+    def test_streaming_writer_redacts_tokens_split_across_chunks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_path = Path(tmp) / "ai.md"
+            writer = StreamingMarkdownWriter(out_path, model="m", provider="ollama", project_profile={})
+            secret = "ghp_" + "A1b2C3d4" * 5
+            for piece in ("filler line\n" * 80 + "token " + secret[:6], secret[6:] + "\n", "tail\n" * 200):
+                writer.feed(piece)
+            writer.abort("test")
+
+            content = out_path.read_text(encoding="utf-8")
+            self.assertNotIn(secret, content)
+            self.assertIn("ghp_****", content)
+
+    def test_ai_response_cache_skips_provider_until_refresh(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+            cache_dir = tmp_path / "cache"
+            scan_path.write_text(json.dumps(self._build_scan_payload()), encoding="utf-8")
+
+            first = _CapturingProvider()
+            with patch("guardian.cli._select_provider", return_value=first):
+                run_ai(scan=scan_path, out=out_path, cache_dir=cache_dir)
+            self.assertIsNotNone(first.last_request)
+            first_markdown = out_path.read_text(encoding="utf-8")
+
+            second = _CapturingProvider()
+            with patch("guardian.cli._select_provider", return_value=second):
+                run_ai(scan=scan_path, out=out_path, cache_dir=cache_dir)
+            self.assertIsNone(second.last_request)
+            self.assertEqual(out_path.read_text(encoding="utf-8"), first_markdown)
+            self.assertTrue(json.loads(out_path.with_suffix(".json").read_text(encoding="utf-8"))["performance"]["cache_hit"])
+
+            with patch("guardian.cli._select_provider", return_value=second):
+                run_ai(scan=scan_path, out=out_path, model="other:1b", cache_dir=cache_dir)
+            self.assertIsNotNone(second.last_request)
+
+            refreshed = _CapturingProvider()
+            with patch("guardian.cli._select_provider", return_value=refreshed):
+                run_ai(scan=scan_path, out=out_path, cache_dir=cache_dir, refresh=True)
+            self.assertIsNotNone(refreshed.last_request)
+
+    def test_response_cache_evicts_least_recently_used(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(Path(tmp), max_bytes=3500)
+            for index, key in enumerate(("a" * 64, "b" * 64, "c" * 64)):
+                cache.store(key, AIProviderResponse(text="x" * 1000))
+                entry = cache.directory / f"{key}.json"
+                os.utime(entry, ns=(index * 10**9, index * 10**9))
+            # Touching "a" makes "b" the eviction candidate.
+            self.assertIsNotNone(cache.lookup("a" * 64))
+            cache.store("d" * 64, AIProviderResponse(text="x" * 1000))
+
+            self.assertIsNotNone(cache.lookup("a" * 64))
+            self.assertIsNone(cache.lookup("b" * 64))
+            self.assertIsNotNone(cache.lookup("d" * 64))
+
+    def test_ai_map_reduce_covers_all_groups_with_bounded_concurrency(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+
+            payload = self._build_scan_payload()
+            payload["security_findings"] = [
+                {
+                    "id": f"SEC-{100 + i}",
+                    "severity": "HIGH",
+                    "confidence": "HIGH",
+                    "file": f"src/module_{i}.py",
+                    "line": i + 1,
+                    "evidence": "token=****",
+                    "recommendation": "Rotar",
+                }
+                for i in range(40)
+            ]
+            scan_path.write_text(json.dumps(payload), encoding="utf-8")
+
+            provider = _ConcurrentProvider()
+            with patch("guardian.cli._select_provider", return_value=provider):
+                run_ai(
+                    scan=scan_path,
+                    out=out_path,
+                    max_findings=5,
+                    map_reduce=True,
+                    concurrency=2,
+                    chunk_tokens=400,
+                )
+
+            ai_payload = json.loads(out_path.with_suffix(".json").read_text(encoding="utf-8"))
+            map_stats = ai_payload["performance"]["map_reduce"]
+            self.assertGreater(map_stats["chunks"], 2)
+            self.assertEqual(len(provider.prompts), map_stats["chunks"] + 1)
+            self.assertLessEqual(provider.max_in_flight, 2)
+            self.assertEqual(len(ai_payload["grouped_findings"]), 40)
+
+            map_prompts = "".join(provider.prompts[:-1])
+            for i in range(40):
+                self.assertIn(f"SEC-{100 + i}", map_prompts)
+            reduce_prompt = provider.prompts[-1]
+            self.assertIn("partial_analyses", reduce_prompt)
+            self.assertIn("Accion parcial", reduce_prompt)
+
+    def test_ollama_provider_reuses_connections_and_retries_5xx(self) -> None:
+        base_url = self._start_fake_ollama(
+            [{"response": "ok", "done": False}, {"response": "", "done": True}],
+            failures=1,
+        )
+        provider = OllamaProvider(base_url=base_url, retries=2, backoff_s=0.01)
+        self.addCleanup(provider.close)
+
+        first = provider.generate(AIProviderRequest(model="m", prompt="p", stream=True))
+        second = provider.generate(AIProviderRequest(model="m", prompt="p"))
+
+        self.assertEqual(first.text, "ok")
+        self.assertEqual(first.stats["attempts"], 2)
+        self.assertEqual(second.stats["attempts"], 1)
+        self.assertEqual(len(self.fake_handler.requests), 3)
+        # One keep-alive connection serves the failed attempt, the retry and the next request.
+        self.assertEqual(len(set(self.fake_handler.clients)), 1)
+
+        summary = provider.metrics.summary()
+        self.assertEqual(summary["requests"], 2)
+        self.assertEqual(summary["retries"], 1)
+        self.assertIn("latency_p95_s", summary)
+
+    def test_ollama_provider_gives_up_after_retries(self) -> None:
+        base_url = self._start_fake_ollama([{"response": "ok", "done": True}], failures=5)
+        provider = OllamaProvider(base_url=base_url, retries=1, backoff_s=0.01)
+        self.addCleanup(provider.close)
+
+        with self.assertRaises(AIProviderError) as ctx:
+            provider.generate(AIProviderRequest(model="m", prompt="p"))
+        self.assertIn("HTTP 503", str(ctx.exception))
+        self.assertEqual(len(self.fake_handler.requests), 2)
+
+    def test_prompt_drops_raw_findings_covered_by_groups(self) -> None:
+        payload = self._build_scan_payload()
+        payload["security_findings"] = [
+            {"id": "SEC-017", "severity": "MEDIUM", "file": f"db/sql_{i}.sql", "line": None, "evidence": "x"}
+            for i in range(15)
+        ]
+        grouped = group_findings(payload["security_findings"])
+
+        prompt = build_ai_prompt(payload, max_findings=25, grouped_findings=grouped)
+
+        self.assertNotIn("\n  ", prompt.text)
+        data = json.loads(prompt.prompt.rsplit("\n", 2)[-2])
+        # sql_0..4 are group examples: one sample stays; sql_5..14 are not listed anywhere else.
+        self.assertEqual([item["file"] for item in data["security_findings"]][:2], ["db/sql_0.sql", "db/sql_5.sql"])
+        self.assertEqual(len(data["security_findings"]), 11)
+
+    def test_prompt_trims_to_token_budget_in_priority_order(self) -> None:
+        payload = self._build_scan_payload()
+        severities = ["CRITICAL"] * 5 + ["HIGH"] * 20 + ["LOW"] * 40
+        payload["security_findings"] = [
+            {"id": f"SEC-{i:03d}", "severity": severity, "file": f"src/f{i}.py", "line": i, "evidence": "t****"}
+            for i, severity in enumerate(severities)
+        ]
+        grouped = group_findings(payload["security_findings"])
+
+        prompt = build_ai_prompt(payload, max_findings=100, grouped_findings=grouped, max_prompt_tokens=1500)
+
+        self.assertLessEqual(approx_tokens(prompt.text), 1500)
+        data = json.loads(prompt.prompt.rsplit("\n", 2)[-2])
+        kept = {group["rule_id"] for group in data["grouped_findings"]}
+        self.assertTrue({f"SEC-{i:03d}" for i in range(5)} <= kept)
+        omitted = data["omitted_findings_by_severity"]
+        self.assertEqual(sum(omitted.values()) + len(kept), 65)
+        self.assertIn("LOW", omitted)
+        self.assertIn("omitted_findings_by_severity cuenta", prompt.prompt)
+
+    def test_reduce_prompt_trims_partials_to_token_budget(self) -> None:
+        payload = self._build_scan_payload()
+        payload["security_findings"] = [
+            {"id": f"SEC-{i:03d}", "severity": "HIGH", "file": f"src/f{i}.py", "line": i, "evidence": "t****"}
+            for i in range(30)
+        ]
+        grouped = group_findings(payload["security_findings"])
+        partials = [f"Parte {i}: " + "riesgo detallado en el modulo. " * 400 for i in range(8)]
+        partials.append("Parte corta")
+
+        prompt = build_reduce_prompt(payload, grouped, partials, max_prompt_tokens=3000)
+
+        self.assertGreater(approx_tokens(build_reduce_prompt(payload, grouped, partials).text), 20000)
+        self.assertLessEqual(approx_tokens(prompt.text), 3000)
+        data = json.loads(prompt.prompt.rsplit("\n", 2)[-2])
+        kept = data["partial_analyses"]
+        self.assertEqual(len(kept), 9)
+        for i in range(8):
+            self.assertTrue(kept[i].startswith(f"Parte {i}: riesgo"))
+            self.assertTrue(kept[i].endswith(" [...]"))
+        self.assertEqual(kept[8], "Parte corta")
+        self.assertEqual(len(data["grouped_findings"]), 30)
+        self.assertIn("se recortaron por el limite de contexto", prompt.prompt)
+
+    def test_ollama_request_carries_system_keep_alive_and_options(self) -> None:
+        base_url = self._start_fake_ollama([{"response": "ok", "done": True}])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+
+            for profile in ("generic", "web"):
+                payload = self._build_scan_payload(profile_name=profile)
+                scan_path.write_text(json.dumps(payload), encoding="utf-8")
+                run_ai(scan=scan_path, out=out_path, base_url=base_url, keep_alive="1h", num_ctx=4096, num_predict=512)
+
+        first, second = self.fake_handler.requests
+        self.assertEqual(first["keep_alive"], "1h")
+        self.assertEqual(first["options"], {"num_ctx": 4096, "num_predict": 512})
+        self.assertIn("Estructura obligatoria", first["system"])
+        self.assertNotIn("Estructura obligatoria", first["prompt"])
+        # Only the data part differs between scans; the instructions stay a reusable prefix.
+        self.assertEqual(first["system"], second["system"])
+        self.assertNotEqual(first["prompt"], second["prompt"])
+
+    def test_ollama_keep_alive_seconds_are_sent_as_numbers(self) -> None:
+        base_url = self._start_fake_ollama([{"response": "ok", "done": True}])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            scan_path = tmp_path / "scan.json"
+            out_path = tmp_path / "ai.md"
+            scan_path.write_text(json.dumps(self._build_scan_payload()), encoding="utf-8")
+
+            for keep_alive in ("-1", "300", "1h30m"):
+                run_ai(scan=scan_path, out=out_path, base_url=base_url, keep_alive=keep_alive)
+            with self.assertRaises(ValueError):
+                run_ai(scan=scan_path, out=out_path, base_url=base_url, keep_alive="forever")
+
+        self.assertEqual([request["keep_alive"] for request in self.fake_handler.requests], [-1, 300, "1h30m"])
+
+    def test_ai_benchmark_against_fake_ollama(self) -> None:
+        config = FakeOllamaConfig(first_token_latency_s=0, tokens_per_s=0, response_tokens=30, error_rate=0.3)
+
+        result = run_ai_benchmark(config, requests=6, concurrency=2, findings=50, retries=3)
+
+        self.assertEqual(result["ok"] + result["errors"], 6)
+        self.assertGreater(result["ok"], 0)
+        # Every injected failure is retried, so only successful runs add requests beyond them.
+        self.assertEqual(result["server_requests"], result["ok"] + result["injected_errors"])
+        self.assertGreater(result["requests_per_s"], 0)
+        self.assertLessEqual(result["latency_s"]["p50"], result["latency_s"]["p99"])
+        self.assertIn("p90", result["ttft_s"])
+
+    def test_ai_benchmark_map_reduce_fans_out_requests(self) -> None:
+        config = FakeOllamaConfig(first_token_latency_s=0, tokens_per_s=0, response_tokens=20)
+
+        result = run_ai_benchmark(
+            config, requests=2, findings=200, rules=40, map_reduce=True, chunk_tokens=400, stream=False
+        )
+
+        self.assertEqual(result["ok"], 2)
+        self.assertGreater(result["server_requests"], 2 * 3)
+
 
 if __name__ == "__main__":
     unittest.main()